@@ -0,0 +1 @@
+# Benchmarks of the parser (task1) and the interpreter (task2) on generated programs, see __main__.py.
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import json
+import platform
+import argparse
+import tempfile
+import subprocess
+from benchmarks.workloads import WORKLOADS, generate, is_parsed, to_xml
+from benchmarks.results import (DEFAULT_THRESHOLD, summarize, save_results, load_results, compare,
+                                print_results, print_comparison)
+
+HELP_MESSAGE = """Times the parser, the XML loading and the interpreter on generated programs.
+Run from the root of the repository:
+python3 -m benchmarks --output results.json
+python3 -m benchmarks --baseline baseline.json --threshold 0.1"""
+
+STAGES_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stages.py')
+# Stages in the order they run, each one reads the files the one before wrote
+STAGES = ('parse', 'load', 'start')
+
+
+def run_stage(stage: str, paths: list, repeat: int) -> dict:
+    process = subprocess.run([sys.executable, STAGES_SCRIPT, stage, str(repeat), *paths],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{stage} stage failed:\n{process.stderr}")
+    return json.loads(process.stdout)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(STAGES_SCRIPT)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(workloads: list, scale: float, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        sources = {}
+        programs = {}
+        for name in workloads:
+            source = generate(name, scale)
+            programs[name] = os.path.join(directory, name + '.xml')
+            if is_parsed(name):
+                # The parse stage writes the XML
+                sources[name] = os.path.join(directory, name + '.ippecode')
+                with open(sources[name], 'w', encoding='utf-8') as file:
+                    file.write(source)
+            else:
+                with open(programs[name], 'w', encoding='utf-8') as file:
+                    file.write(to_xml(source))
+        timings = {
+            'parse': run_stage('parse', list(sources.values()), repeat) if sources else {},
+            'load': run_stage('load', list(programs.values()), repeat),
+            'start': run_stage('start', list(programs.values()), repeat),
+        }
+    return {
+        'environment': {
+            'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'machine': platform.machine(), 'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'scale': scale,
+        'repeat': repeat,
+        'workloads': {
+            name: {stage: summarize(timings[stage][sources[name] if stage == 'parse' else programs[name]])
+                   for stage in STAGES if stage != 'parse' or name in sources}
+            for name in workloads
+        },
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=HELP_MESSAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS),
+                        help='workloads to run, all of them by default')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='size of the generated programs relative to the default sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every stage, the fastest one is compared')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown relative to the baseline reported as a regression, 0.1 is 10%%')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    results = run_benchmarks(args.workloads, args.scale, args.repeat)
+    print_results(results)
+    if args.output:
+        save_results(args.output, results)
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        if baseline.get('scale') != results['scale']:
+            print(f"warning: the baseline was run at scale {baseline.get('scale')}, not {results['scale']}")
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        sys.exit(1 if any(row[5] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
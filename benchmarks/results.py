@@ -0,0 +1,53 @@
+import json
+import statistics
+
+# Relative slowdown of the fastest run reported as a regression
+DEFAULT_THRESHOLD = 0.10
+# Seconds a measurement must also slow down by, stages taking a fraction of a millisecond are mostly noise
+NOISE_FLOOR = 0.001
+
+
+def summarize(runs: list) -> dict:
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+        file.write('\n')
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    # (workload, stage, baseline seconds, current seconds, ratio, regressed) of every measurement in both.
+    # The fastest runs are compared, they are the least disturbed by the rest of the machine.
+    rows = []
+    for workload, stages in current['workloads'].items():
+        for stage, timing in stages.items():
+            base = baseline['workloads'].get(workload, {}).get(stage)
+            if base is None:
+                continue
+            ratio = timing['min'] / base['min'] if base['min'] else float('inf')
+            regressed = ratio > 1 + threshold and timing['min'] - base['min'] > NOISE_FLOOR
+            rows.append((workload, stage, base['min'], timing['min'], ratio, regressed))
+    return rows
+
+
+def print_results(results: dict) -> None:
+    print(f"{'workload':<15} {'stage':<6} {'min ms':>10} {'median ms':>10}")
+    for workload, stages in results['workloads'].items():
+        for stage, timing in stages.items():
+            print(f"{workload:<15} {stage:<6} {timing['min'] * 1000:>10.1f} {timing['median'] * 1000:>10.1f}")
+
+
+def print_comparison(rows: list, threshold: float) -> None:
+    print(f"\n{'workload':<15} {'stage':<6} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for workload, stage, base, current, ratio, regressed in rows:
+        mark = '  REGRESSION' if regressed else ''
+        print(f"{workload:<15} {stage:<6} {base * 1000:>12.1f} {current * 1000:>12.1f} {ratio - 1:>+8.1%}{mark}")
+    regressions = sum(1 for row in rows if row[5])
+    print(f"{regressions} of {len(rows)} measurements slower than the baseline by more than {threshold:.0%}")
@@ -0,0 +1,60 @@
+# Runs one stage of the benchmarks over the given files and prints the seconds of every run as JSON.
+# Executed in a child process: task1 and task2 both have an exception_handler module, so the parser and the
+# interpreter are never imported by the same process.
+#   python stages.py parse REPEAT SOURCE...        Parser.run, the XML is written next to the source
+#   python stages.py load REPEAT PROGRAM...        decoding the XML with load_program
+#   python stages.py start REPEAT PROGRAM...       Interpreter.start, printing to os.devnull
+import os
+import sys
+import json
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_runs(run, repeat: int) -> list:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def parse_stage(paths: list, repeat: int) -> dict:
+    sys.path.insert(0, os.path.join(ROOT, 'task1'))
+    from parser import Parser
+
+    def parse(path):
+        code = Parser(path, path.removesuffix('.ippecode') + '.xml').run()
+        if code != 0:
+            raise RuntimeError(f"{path} did not parse, code {code}")
+    return {path: time_runs(lambda: parse(path), repeat) for path in paths}
+
+
+def load_stage(paths: list, repeat: int) -> dict:
+    sys.path.insert(0, os.path.join(ROOT, 'task2'))
+    from decoder import load_program
+    return {path: time_runs(lambda: load_program(path), repeat) for path in paths}
+
+
+def start_stage(paths: list, repeat: int) -> dict:
+    sys.path.insert(0, os.path.join(ROOT, 'task2'))
+    from interpreter import Interpreter
+
+    def start(path):
+        with open(os.devnull, 'w', encoding='utf-8') as output:
+            Interpreter(path, [], output).start()
+    return {path: time_runs(lambda: start(path), repeat) for path in paths}
+
+
+STAGES = {'parse': parse_stage, 'load': load_stage, 'start': start_stage}
+
+
+def main():
+    stage, repeat, paths = sys.argv[1], int(sys.argv[2]), sys.argv[3:]
+    json.dump(STAGES[stage](paths, repeat), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Generated IPPeCode sources, each stressing one part of the parser or the interpreter. size is the number
+# of loop iterations, the recursion depth or the number of lines.
+import re
+from xml.sax.saxutils import escape
+
+INTEGER = re.compile(r'[+-]?\d+')
+# Opcodes whose only operand is src1, the first operand of the others is dst
+SOURCE_ONLY = ('PRINT', 'PRINTLN', 'PUSH')
+
+
+def arithmetic(size: int) -> str:
+    # Tight loop of integer arithmetic, the accumulator stays small
+    return f"""#arithmetic
+MOV i 0
+MOV acc 1
+LABEL @loop
+ADD acc acc i
+MUL t acc 3
+DIV t t 2
+SUB acc t acc
+ADD i i 1
+JUMPIFLT @loop i {size}
+PRINTLN acc
+"""
+
+
+def recursion(size: int) -> str:
+    # CALL nested size deep, then as many RETURNs
+    return f"""#recursion
+MOV n {size}
+MOV depth 0
+CALL @down
+PRINTLN depth
+JUMP @end
+LABEL @down
+JUMPIFEQ @base n 0
+SUB n n 1
+ADD depth depth 1
+CALL @down
+LABEL @base
+RETURN
+LABEL @end
+"""
+
+
+def stack(size: int) -> str:
+    # PUSH/POP of integers and strings
+    return f"""#stack
+MOV i 0
+LABEL @loop
+PUSH i
+PUSH "item"
+PUSH 7
+POP a
+POP b
+POP c
+ADD i c 1
+JUMPIFLT @loop i {size}
+PRINTLN a
+PRINTLN b
+"""
+
+
+def strings(size: int) -> str:
+    # CONCAT, GETAT, LEN and conversions, the built string is reset before it grows long
+    return f"""#strings
+MOV s "abcdefghijklmnopqrstuvwxyz"
+MOV t ""
+MOV i 0
+LABEL @loop
+DIV q i 26
+MUL q q 26
+SUB k i q
+GETAT c s k
+CONCAT t t c
+INTSTR n k
+CONCAT t t n
+LEN l t
+JUMPIFLT @keep l 100
+MOV t ""
+LABEL @keep
+ADD i i 1
+JUMPIFLT @loop i {size}
+PRINTLN t
+"""
+
+
+def output(size: int) -> str:
+    # PRINT/PRINTLN of integers and strings on every iteration
+    return f"""#output
+MOV i 0
+LABEL @loop
+PRINT i
+PRINT "-"
+PRINTLN "line_of_output"
+ADD i i 1
+JUMPIFLT @loop i {size}
+"""
+
+
+def straight_line(size: int) -> str:
+    # A long source without jumps, mostly measures the tokenizer and the XML
+    lines = ["#straight_line", "MOV x 0", 'MOV s "text"']
+    body = ["ADD x x 1", "SUB y x 2  # comment", "MUL z y 3", 'MOV t "with#inside"', "DIV n z 7",
+            "PRINT n", "PUSH z", "POP w", "# a comment line", ""]
+    for i in range(size):
+        lines.append(body[i % len(body)])
+    lines.append("PRINTLN x")
+    return '\n'.join(lines) + '\n'
+
+
+def to_xml(source: str) -> str:
+    # XML of a simple source, for the instructions the parser does not know: no comments and no string
+    # literals with spaces
+    lines = [line.split() for line in source.splitlines()[1:] if line.strip()]
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', f'<program name="{source.splitlines()[0][1:]}">']
+    for order, (opcode, *operands) in enumerate(lines, 1):
+        tags = ('src1',) if opcode in SOURCE_ONLY else ('dst', 'src1', 'src2')
+        elements = ''.join(f'<{tag} type="{operand_type(operand)}">{escape(operand.strip(chr(34)))}</{tag}>'
+                           for tag, operand in zip(tags, operands))
+        xml.append(f'  <tac opcode="{opcode}" order="{order}">{elements}</tac>')
+    xml.append('</program>')
+    return '\n'.join(xml) + '\n'
+
+
+def operand_type(operand: str) -> str:
+    if operand.startswith('@'):
+        return 'label'
+    if operand.startswith('"'):
+        return 'string'
+    if INTEGER.fullmatch(operand):
+        return 'integer'
+    return 'variable'
+
+
+# Workload name: (source generator, size at scale 1, whether the parser can parse the source). The
+# others are translated to XML directly and not timed by the parse stage. The parser splits a line on
+# whitespace, so the parsed sources have no string literals with spaces.
+WORKLOADS = {
+    'arithmetic': (arithmetic, 100000, True),
+    'recursion': (recursion, 50000, True),
+    'stack': (stack, 50000, True),
+    'strings': (strings, 50000, False),
+    'output': (output, 100000, True),
+    'straight_line': (straight_line, 100000, True),
+}
+
+
+def generate(name: str, scale: float) -> str:
+    generator, size, _ = WORKLOADS[name]
+    return generator(max(1, int(size * scale)))
+
+
+def is_parsed(name: str) -> bool:
+    return WORKLOADS[name][2]
@@ -0,0 +1,18 @@
+import unittest
+from benchmarks.__main__ import STAGES, run_benchmarks
+from benchmarks.workloads import WORKLOADS, is_parsed
+
+
+# Run from the root of the repository: python3 -m unittest benchmarks.workloads_test
+class WorkloadTest(unittest.TestCase):
+    def test_every_workload_runs_every_stage(self):
+        # A stage that fails, e.g. a source the parser rejects, raises RuntimeError
+        results = run_benchmarks(list(WORKLOADS), 0.001, 1)
+        for name in WORKLOADS:
+            with self.subTest(workload=name):
+                expected = [stage for stage in STAGES if stage != 'parse' or is_parsed(name)]
+                self.assertEqual(list(results['workloads'][name]), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import contextlib
+import importlib.util
+from lexical_tokenizer import LexicalTokenizer
+
+HELP_MESSAGE = """Measures the throughput of the lexical tokenizer on a generated IPPeCode source.
+To compare with another version of the tokenizer, e.g. from an older checkout, use:
+python3 benchmark_tokenizer.py --reference <path to lexical_tokenizer.py>"""
+
+# Lines the generated source is made of, {} are replaced by a random number
+LINES = [
+    'MOV counter{} 0',
+    'ADD counter{} counter{} 1  # increment',
+    'SUB x{} 100 counter{}',
+    'MUL x{} x{} -3',
+    'DIV x{} x{} 7',
+    'PRINT "value#{}"',
+    'PRINTLN x{}',
+    'LABEL @loop{}',
+    'JUMPIFLT @loop{} counter{} 1000',
+    'JUMPIFEQ @end{} "a{}" "b"',
+    'CALL @function{}',
+    'RETURN',
+    'PUSH "text\\n{}"',
+    'POP y{}',
+    'READINT z{}',
+    '# comment line {}',
+    '',
+]
+
+
+def generate_source(line_count: int, seed: int = 0) -> str:
+    generator = random.Random(seed)
+    lines = ['# Generated benchmark program']
+    for _ in range(line_count - 1):
+        line = generator.choice(LINES)
+        lines.append(line.format(*[generator.randrange(1000) for _ in range(line.count('{}'))]))
+    return '\n'.join(lines)
+
+
+def load_module(path: str):
+    # The reference module imports its neighbouring modules, so its directory is searched first
+    directory = os.path.dirname(os.path.abspath(path))
+    sys.path.insert(0, directory)
+    try:
+        spec = importlib.util.spec_from_file_location('reference_' + os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(directory)
+    return module
+
+
+def measure(tokenizer_class, source_code: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        # Older tokenizers print a line for every operation, which is not what is measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            tokenizer_class(source_code).tokenize()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, seconds: float, line_count: int) -> None:
+    print(f"{name:<10} {seconds:8.3f} s  {line_count / seconds:12,.0f} lines/s")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=HELP_MESSAGE)
+    parser.add_argument('--lines', type=int, default=100000, help='number of lines of the generated source')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each tokenizer, the fastest one is reported')
+    parser.add_argument('--reference', help='lexical_tokenizer.py to compare the current tokenizer with')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    source_code = generate_source(args.lines)
+    current = measure(LexicalTokenizer, source_code, args.repeat)
+    report('current', current, args.lines)
+    if args.reference:
+        reference = measure(load_module(args.reference).LexicalTokenizer, source_code, args.repeat)
+        report('reference', reference, args.lines)
+        print(f"speedup    {reference / current:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import time
+import argparse
+from lexical_tokenizer import LexicalTokenizer
+from xml_generator import generate_xml
+from benchmark_tokenizer import generate_source, load_module, report
+
+HELP_MESSAGE = """Measures how fast the XML representation of a generated IPPeCode source is generated.
+To compare with another version of the generator, e.g. from an older checkout, use:
+python3 benchmark_xml_generator.py --reference <path to xml_generator.py>"""
+
+
+def measure(generate, tokens: list, name_of_program: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate(tokens, name_of_program)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=HELP_MESSAGE)
+    parser.add_argument('--lines', type=int, default=100000, help='number of lines of the generated source')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each generator, the fastest one is reported')
+    parser.add_argument('--reference', help='xml_generator.py to compare the current generator with')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    lexical_tokenizer = LexicalTokenizer(generate_source(args.lines))
+    name_of_program = lexical_tokenizer.tokenize()
+    tokens = lexical_tokenizer.tokens
+    current = measure(generate_xml, tokens, name_of_program, args.repeat)
+    report('current', current, args.lines)
+    if args.reference:
+        reference = measure(load_module(args.reference).generate_xml, tokens, name_of_program, args.repeat)
+        report('reference', reference, args.lines)
+        print(f"speedup    {reference / current:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import io
+import unittest
+import contextlib
+from lexical_tokenizer import LexicalTokenizer
+from exception_handler import ExceptionHandler
+
+
+def tokenize(source: str) -> list:
+    tokenizer = LexicalTokenizer(source)
+    tokenizer.tokenize()
+    return [(token.token_type.value, token.token_value) for token in tokenizer.tokens]
+
+
+class CommentTest(unittest.TestCase):
+    def test_comment_after_instruction(self):
+        self.assertEqual(tokenize('PRINT x # comment "quoted"'), [('opcode', 'PRINT'), ('variable', 'x')])
+
+    def test_hash_inside_string(self):
+        self.assertEqual(tokenize('PRINT "a#b" # comment'), [('opcode', 'PRINT'), ('string', 'a#b')])
+
+    def test_escaped_backslash_before_closing_quote(self):
+        self.assertEqual(tokenize('PRINT "a\\\\" # comment'), [('opcode', 'PRINT'), ('string', 'a\\\\')])
+
+    def test_comment_line(self):
+        self.assertEqual(tokenize('# name\nRETURN'), [('opcode', 'RETURN')])
+
+
+# Words are split on whitespace also inside quotes, a string literal cannot contain spaces
+class ErrorCodeTest(unittest.TestCase):
+    def assert_error(self, source: str, error_code: int) -> None:
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(ExceptionHandler) as raised:
+            tokenize(source)
+        self.assertEqual(raised.exception.error_code, error_code)
+
+    def test_string_with_space(self):
+        self.assert_error('MOV a "sp ace"', 12)
+
+    def test_unterminated_string_with_hash(self):
+        self.assert_error('PRINT "unterminated # c', 12)
+
+    def test_unterminated_string_before_another(self):
+        self.assert_error('READINT "unterminated "l<t"', 12)
+
+    def test_unknown_opcode(self):
+        self.assert_error('FOO x', 11)
+
+    def test_bad_operand_kind(self):
+        self.assert_error('MOV @label 1', 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,26 @@
+import os
 import sys
+import glob
+import time
 import argparse
-from tkinter import E
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from lexical_tokenizer import LexicalTokenizer
 from exception_handler import ExceptionHandler
-from xml_generator import generate_xml
+from xml_generator import generate_xml, XmlWriter
 
 HELP_MESSAGE = """The script parses 3AC PL IPPeCode, checks its syntax and generates XML representation of the code.
 To run the script, use the following command:
-python3 parser.py <source> <output>"""
+python3 parser.py <source> <output>
+To parse many sources, each to an .xml and .rc file next to it, use:
+python3 parser.py --batch <directory, glob or source> [...]"""
 
 
 class Parser:
-    def __init__(self, source, output):
+    def __init__(self, source, output, stream=False):
         self.source = source
         self.output = output
+        self.stream = stream  # Write the XML while the source is read instead of building it in memory
 
     def read_source_code(self):
         if self.source == '-':
@@ -35,36 +42,135 @@ class Parser:
         with open(self.source.removesuffix('.ippecode') + '.rc', 'w', encoding='utf-8') as file:
             file.write(str(code))
 
+    def open_source_file(self):
+        try:
+            return open(self.source, "r", encoding='utf-8')
+        except Exception as e:
+            sys.stderr.write(f"Error: {e}\n")
+            sys.exit(1)
+
+    def stream_output_file(self):
+        # Written to a temporary file next to the output, which only replaces the output once the whole
+        # source is parsed, so a failed parse leaves the output as it was
+        with self.open_source_file() as source_file:
+            lexical_tokenizer = LexicalTokenizer(source_file)
+            temporary = self.output + '.tmp'
+            try:
+                with open(temporary, 'w', encoding='utf-8') as file:
+                    writer = XmlWriter(file, lexical_tokenizer.name_of_program())
+                    for instruction in lexical_tokenizer.instructions():
+                        writer.write_instruction(instruction)
+                    writer.close()
+                os.replace(temporary, self.output)
+            except UnicodeDecodeError as e:
+                os.unlink(temporary)
+                sys.stderr.write(f"Error: {e}\n")
+                sys.exit(1)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                raise
+
     def parse(self):
+        self.run()
+        sys.exit(0)
+
+    def run(self) -> int:
+        # Parses the source and writes the output and .rc files, returns the code written to the .rc file
         try:
-            source_code = self.read_source_code()
-            lexical_tokenizer = LexicalTokenizer(source_code)
-            name_of_program = lexical_tokenizer.tokenize()
-            xml_output = generate_xml(
-                lexical_tokenizer.tokens, name_of_program)
+            if self.stream:
+                self.stream_output_file()
+            else:
+                source_code = self.read_source_code()
+                lexical_tokenizer = LexicalTokenizer(source_code)
+                name_of_program = lexical_tokenizer.tokenize()
+                xml_output = generate_xml(
+                    lexical_tokenizer.tokens, name_of_program)
 
-            self.write_output_file(xml_output)
-            self.write_rc_file('0')
+                self.write_output_file(xml_output)
+            code = 0
 
         except ExceptionHandler as e:
-            self.write_rc_file(e.error_code)
+            code = e.error_code
         except Exception as e:
             sys.stderr.write(f"Error: {e}\n")
-            self.write_rc_file('19')
-        sys.exit(0)
+            code = 19
+        self.write_rc_file(code)
+        return code
+
+
+def find_sources(paths: list[str]) -> list[str]:
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(glob.glob(os.path.join(path, '**', '*.ippecode'), recursive=True)))
+        elif glob.has_magic(path):
+            sources.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            sources.append(path)
+    return sources
+
+
+def parse_file(source: str, stream: bool) -> tuple[str, int, float]:
+    # Runs in a worker process, the XML is written next to the source
+    start = time.perf_counter()
+    try:
+        code = Parser(source, source.removesuffix('.ippecode') + '.xml', stream).run()
+    except SystemExit:
+        code = 1  # The source could not be read
+    return source, code, time.perf_counter() - start
+
+
+def parse_batch(sources: list[str], workers: int, stream: bool) -> list[tuple[str, int, float]]:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [parse_file(source, stream) for source in sources]
+    with ProcessPoolExecutor(workers) as executor:
+        # Sources are handed out in chunks, a single small source takes less time than sending it
+        chunksize = max(1, len(sources) // (workers * 8))
+        return list(executor.map(parse_file, sources, [stream] * len(sources), chunksize=chunksize))
+
+
+def print_summary(results: list[tuple[str, int, float]], seconds: float):
+    codes = Counter(code for _, code, _ in results)
+    failed = [(source, code) for source, code, _ in results if code != 0]
+    print(f"Parsed {len(results)} files in {seconds:.2f} s: {codes[0]} succeeded, {len(failed)} failed")
+    for code, count in sorted(codes.items()):
+        if code != 0:
+            print(f"  code {code}: {count} files")
+    if results:
+        slowest = max(results, key=lambda result: result[2])
+        total = sum(result[2] for result in results)
+        print(f"  {total / len(results) * 1000:.1f} ms per file, slowest {slowest[0]} ({slowest[2] * 1000:.1f} ms)")
+    for source, code in failed:
+        print(f"  {source}: {code}")
 
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description=HELP_MESSAGE, add_help=True)
-    parser.add_argument('source', help='the source file to parse')
+    parser.add_argument('source', nargs='?', help='the source file to parse')
     parser.add_argument('output', nargs='?', default='out.xml',
                         help='the output file to write to')
-    return parser.parse_args()
+    parser.add_argument('--stream', action='store_true',
+                        help='write the XML while reading the source, memory use does not grow with its size')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='parse every .ippecode file in the directories, matching the globs or listed')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of processes parsing a batch, 1 parses it in this process')
+    args = parser.parse_args()
+    if args.source is None and args.batch is None:
+        parser.error('the source or --batch is required')
+    return args
 
 
 def main():
     args = parse_arguments()
-    parser = Parser(args.source, args.output)
+    if args.batch is not None:
+        start = time.perf_counter()
+        results = parse_batch(find_sources(args.batch), args.workers, args.stream)
+        print_summary(results, time.perf_counter() - start)
+        sys.exit(0)
+    parser = Parser(args.source, args.output, args.stream)
     parser.parse()
 
 
@@ -1,3 +1,5 @@
+import re
+
 """
 \"       Match double quote
 \\.      Match any backslash-escaped character except newline
@@ -29,3 +31,19 @@ INTEGER_LITERAL_REGEX = r'^[+-]?(0|[1-9]+[0-9]*)$'
         Same as variable name but starts with @
 """
 LABEL_NAME_REGEX = r'^@[a-zA-Z_$&%][\w_$&%]*$'
+
+"""
+(?P<variable>...)   Any operand, the name of the matching group is its token type
+|                   OR the other kinds in the order the operands are classified
+"""
+OPERAND_REGEX = re.compile(
+    rf'(?P<variable>{VARIABLE_NAME_REGEX})|(?P<integer>{INTEGER_LITERAL_REGEX})'
+    rf'|(?P<string>{STRING_LITERAL_REGEX})|(?P<label>{LABEL_NAME_REGEX})')
+
+"""
+"(\\.|[^"\\])*      Quoted string, may contain #, runs to the end of an unclosed line
+|                   OR
+[^"#]               Any other character before the comment
+*                   Matched from the start of the line, the match ends where its comment starts
+"""
+CODE_REGEX = re.compile(r'(?:"(?:\\.|[^"\\])*(?:"|\\?$)|[^"#])*')
@@ -16,6 +16,8 @@ class OperandType(Enum):
 
 
 class Token():
+    __slots__ = ('token_type', 'operand_type', 'token_value')
+
     def __init__(self, token_type: TokenType, operand_type: OperandType | None, token_value):
         self.token_type = token_type
         self.operand_type = operand_type
@@ -1,6 +1,6 @@
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from token_ import Token, OperandType, TokenType
+import io
+import re
+from token_ import Token, TokenType, OperandType
 
 HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
 DTD = '''<!DOCTYPE program [ 
@@ -21,42 +21,81 @@ DTD = '''<!DOCTYPE program [
   <!ENTITY gt "&gt;">
 ]>'''
 
+# References kept as they are in the output: the entities of the DTD, the predefined ones and character
+# references, so a string like "Hello&eol;World" reaches the interpreter with a newline
+REFERENCE = r'(?:language|eol|lt|gt|amp|quot|apos|#[0-9]+|#x[0-9a-fA-F]+);'
+# Characters that have to be escaped, & only when it does not start one of the references
+ESCAPE_REGEX = re.compile(rf'&(?!{REFERENCE})|[<>\r]')
+ATTRIBUTE_ESCAPE_REGEX = re.compile(rf'&(?!{REFERENCE})|[<>"\r\n\t]')
+ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', '\r': '&#13;', '\n': '&#10;', '\t': '&#9;'}
+# Element names and type attributes of the operands
+TAGS = {operand_type: operand_type.value for operand_type in OperandType}
+TYPES = {token_type: token_type.value for token_type in TokenType}
+# Values written as they are, most names, labels and integers
+PLAIN_REGEX = re.compile(r'[\w@$%+-]*')
+# Characters XML cannot contain at all
+INVALID_XML_CHARACTERS = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+
+def escape_data(data: str, attribute: bool = False) -> str:
+    if PLAIN_REGEX.fullmatch(data):
+        return data
+    invalid = INVALID_XML_CHARACTERS.search(data)
+    if invalid:
+        raise ValueError(f"character {invalid.group()!r} cannot be written to XML")
+    data = data.replace('\\n;', '$eol;')
+    pattern = ATTRIBUTE_ESCAPE_REGEX if attribute else ESCAPE_REGEX
+    return pattern.sub(lambda match: ESCAPES[match.group()], data)
+
 
 def generate_xml(tokens: list[Token], name_of_program: str) -> str:
-    program = ET.Element('program', {
-                         'name': name_of_program})
-    order: int = 0
-    for i, token in enumerate(tokens):
-        if token.token_type == TokenType.OPCODE:
-            order += 1
-            tac = ET.SubElement(
-                program, 'tac', {'opcode': token.token_value.upper(), 'order': str(order)})
-            continue
-        if token.operand_type == OperandType.DST:
-            dst = ET.SubElement(tac, 'dst', {'type': token.token_type.value})
-            dst.text = token.token_value
-        elif token.operand_type == OperandType.SRC1:
-            src1 = ET.SubElement(tac, 'src1', {'type': token.token_type.value})
-            src1.text = token.token_value
-        elif token.operand_type == OperandType.SRC2:
-            src2 = ET.SubElement(tac, 'src2', {'type': token.token_type.value})
-            src2.text = token.token_value
-
-    # Create a string representation of the XML tree
-    xml_string = ET.tostring(program, encoding='utf-8', method='xml')
-
-    # Parse the XML string with minidom
-    xml_pretty_str = minidom.parseString(xml_string).toprettyxml(indent="  ")
-
-    # Replace the default XML header with the custom one
-    xml_pretty_str = xml_pretty_str.replace(
-        '<?xml version="1.0" ?>', HEADER + '\n' + DTD)
-
-    # Replace colliding characters with their respective entities
-    xml_pretty_str = xml_pretty_str.replace('&amp;', '&')
-    xml_pretty_str = xml_pretty_str.replace('&lt;', '<')
-    xml_pretty_str = xml_pretty_str.replace('&gt;', '>')
-    xml_pretty_str = xml_pretty_str.replace('&quot;', '"')
-    xml_pretty_str = xml_pretty_str.replace('\\n;', '$eol;')
-
-    return xml_pretty_str
+    output = io.StringIO()
+    writer = XmlWriter(output, name_of_program)
+    instruction: list[Token] = []
+    for token in tokens:
+        if token.token_type == TokenType.OPCODE and instruction:
+            writer.write_instruction(instruction)
+            instruction = []
+        instruction.append(token)
+    if instruction:
+        writer.write_instruction(instruction)
+    writer.close()
+    return output.getvalue()
+
+
+# Writes the indented document one instruction at a time, so the tokens of a whole program never have to
+# be held in memory
+class XmlWriter():
+    def __init__(self, file, name_of_program: str):
+        self.file = file
+        self.name_of_program = name_of_program
+        self.order: int = 0
+
+    def write_start(self, empty: bool):
+        self.file.write(HEADER + '\n' + DTD + '\n')
+        self.file.write('<program name="' + escape_data(self.name_of_program, True) + ('"/>\n' if empty else '">\n'))
+
+    def write_instruction(self, tokens: list[Token]):
+        if self.order == 0:
+            self.write_start(False)
+        self.order += 1
+        opcode = '  <tac opcode="' + escape_data(tokens[0].token_value.upper(), True) + '" order="' + str(self.order)
+        if len(tokens) == 1:
+            self.file.write(opcode + '"/>\n')
+            return
+        lines = [opcode + '">\n']
+        for token in tokens[1:]:
+            tag = TAGS[token.operand_type]
+            start = '    <' + tag + ' type="' + TYPES[token.token_type]
+            if token.token_value:
+                lines.append(start + '">' + escape_data(token.token_value) + '</' + tag + '>\n')
+            else:
+                lines.append(start + '"/>\n')
+        lines.append('  </tac>\n')
+        self.file.write(''.join(lines))
+
+    def close(self):
+        if self.order == 0:
+            self.write_start(True)
+        else:
+            self.file.write('</program>\n')
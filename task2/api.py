@@ -0,0 +1,194 @@
+# In-process API for running programs without taci.py: nothing is read from or written to files unless asked
+# for and no .rc files are written. A program is loaded once and run any number of times, also from several
+# threads at once, every run gets its own interpreter and the loaded program is never modified.
+#
+#     program = api.load(xml_text)
+#     result = program.run(['5', 'hello'])
+#     result.exit_code, result.output
+import io
+import os
+import time
+import xml.etree.ElementTree as ET
+from typing import AsyncIterable, Awaitable, Callable, Iterable
+from exception_handler import ExceptionHandler, ErrorCodes
+from decoder import Program, load_program, decode_program
+from binary_format import MAGIC, READ_ERRORS, parse_program, is_binary_program, load_binary_program
+from optimizer import optimize_program
+from fusion import fuse_instructions
+from type_analysis import analyze_types, specialize_instructions
+from compiler import compile_program
+from interpreter import Interpreter
+from input_reader import InputReader
+from output_writer import DEFAULT_BUFFER_SIZE
+from program_cache import ProgramCache
+from limits import ExecutionLimits
+from snapshot import Snapshot
+from async_interpreter import AsyncInput, AsyncOutput, run_async
+from lanes import run_lanes
+
+# Codes of a run stopped by its limits, which can be resumed from RunResult.snapshot
+LIMIT_ERRORS = (ErrorCodes.STEP_LIMIT_ERROR, ErrorCodes.TIME_LIMIT_ERROR)
+
+
+# Outcome of one run, exit_code is what taci.py exits with and writes to the .rc file
+class RunResult:
+    def __init__(self, exit_code: int, error: ErrorCodes | None, error_message: str | None, output: str | None,
+                 input_lines: int, output_length: int, steps: int | None, seconds: float,
+                 snapshot: Snapshot | None) -> None:
+        self.exit_code = exit_code
+        self.error = error
+        self.error_message = error_message  # What taci.py writes to stderr
+        self.output = output  # Printed text, None when it went to the given output
+        self.input_lines = input_lines  # Input lines read by READINT/READSTR
+        self.output_length = output_length  # Characters printed
+        self.steps = steps  # Instructions executed, only counted when the run has limits
+        self.seconds = seconds
+        self.snapshot = snapshot  # State of a run stopped by its limits
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+    def __repr__(self) -> str:
+        return f"RunResult(exit_code={self.exit_code}, output_length={self.output_length}, seconds={self.seconds:.6f})"
+
+
+# A decoded program prepared for running: optimized, fused or compiled once when it is loaded
+class LoadedProgram:
+    def __init__(self, program: Program, optimize: bool = False, compiled: bool = False, fusion: bool = True,
+                 output_buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.program = program
+        self.optimization_report = optimize_program(program) if optimize else None
+        # Instructions that fail whenever they are executed are in type_analysis.errors
+        self.type_analysis = analyze_types(program)
+        self.compiled = compile_program(program, self.type_analysis) if compiled else None
+        instructions = fuse_instructions(program.instructions) if fusion else program.instructions
+        self.instructions = specialize_instructions(instructions, self.type_analysis)
+        self.output_buffer_size = output_buffer_size
+
+    @property
+    def name(self) -> str | None:
+        return self.program.name
+
+    def run(self, input_lines: Iterable[str] | str = (), output=None, max_steps: int | None = None,
+            time_limit: float | None = None, resume: Snapshot | None = None) -> RunResult:
+        # input_lines are used as given, a string is split into lines. Running out of input is the error of
+        # READINT/READSTR, like for taci.py reading stdin. The output is returned in the result unless an
+        # object with a write method is given to print to.
+        if isinstance(input_lines, InputReader):
+            reader = input_lines
+        else:
+            lines = input_lines.splitlines() if isinstance(input_lines, str) else input_lines
+            reader = InputReader(lines, eof_error=None)
+        captured = io.StringIO() if output is None else None
+        interpreter = self.interpreter(reader, output if output is not None else captured, max_steps, time_limit,
+                                       resume)
+        start = time.perf_counter()
+        try:
+            try:
+                interpreter.execute(self.program, self.instructions, self.compiled)
+            finally:
+                interpreter.input.close()
+                interpreter.output.close()
+        except Exception as e:
+            return self.result(interpreter, e, captured, start)
+        return self.result(interpreter, None, captured, start)
+
+    async def run_async(self, input_lines: AsyncIterable[str] | Iterable[str] | str = (),
+                        output: Callable[[str], Awaitable] | None = None, max_steps: int | None = None,
+                        time_limit: float | None = None, resume: Snapshot | None = None) -> RunResult:
+        # Like run, but READINT/READSTR await the next line of an async iterable and the printed text is
+        # awaited by the output coroutine function, so one event loop interleaves many runs. The program
+        # runs through the dispatch loop even if it was compiled.
+        if isinstance(input_lines, str):
+            input_lines = input_lines.splitlines()
+        captured = io.StringIO() if output is None else None
+        write = output
+        if write is None:
+            async def write(text: str) -> None:
+                captured.write(text)
+        interpreter = self.interpreter(AsyncInput(input_lines), AsyncOutput(write), max_steps, time_limit, resume)
+        start = time.perf_counter()
+        try:
+            try:
+                await run_async(interpreter, self.program, self.instructions)
+            finally:
+                interpreter.input.close()
+                interpreter.output.close()
+        except Exception as e:
+            return self.result(interpreter, e, captured, start)
+        return self.result(interpreter, None, captured, start)
+
+    def run_lanes(self, inputs: Iterable[Iterable[str] | str], max_steps: int | None = None) -> list:
+        # Runs the program once for every input, with the results of run in the order of the inputs. The
+        # integer work of all the runs is done at once on NumPy arrays, a run that needs more than that is
+        # run again on its own, see lanes.py. seconds of a vectorised run is the time of all of them.
+        inputs = [lines.splitlines() if isinstance(lines, str) else list(lines) for lines in inputs]
+        start = time.perf_counter()
+        lanes = run_lanes(self.program, inputs, max_steps)
+        seconds = time.perf_counter() - start
+        results = []
+        for lane, lines in enumerate(inputs):
+            if lanes.fallback[lane]:
+                results.append(self.run(lines, max_steps=max_steps))
+                continue
+            output = lanes.outputs[lane]
+            steps = lanes.steps[lane] if lanes.steps is not None else None
+            results.append(RunResult(0, None, None, output, lanes.input_lines[lane], len(output), steps, seconds,
+                                     None))
+        return results
+
+    def interpreter(self, reader: InputReader, output, max_steps: int | None, time_limit: float | None,
+                    resume: Snapshot | None) -> Interpreter:
+        limits = ExecutionLimits(max_steps, time_limit) if max_steps is not None or time_limit is not None else None
+        return Interpreter(None, reader, output, self.output_buffer_size, limits=limits, resume=resume)
+
+    def result(self, interpreter: Interpreter, exception: Exception | None, captured: io.StringIO | None,
+               start: float) -> RunResult:
+        seconds = time.perf_counter() - start
+        error = None
+        error_message = None
+        snapshot = None
+        if isinstance(exception, ExceptionHandler):
+            error = exception.error_code
+            error_message = exception.error_message
+            if error in LIMIT_ERRORS:
+                snapshot = interpreter.snapshot()
+        elif exception is not None:
+            error = ErrorCodes.INTERNAL_ERROR
+            error_message = f"Error: {exception}"
+        limits = interpreter.limits
+        return RunResult(
+            error.value if error is not None else 0, error, error_message,
+            captured.getvalue() if captured is not None else None, interpreter.input.position,
+            interpreter.output.offset, limits.steps if limits is not None else None, seconds, snapshot)
+
+
+def decode(source: bytes | str) -> Program:
+    # XML text or the bytes of an XML or binary program
+    try:
+        if isinstance(source, bytes) and source.startswith(MAGIC):
+            return parse_program(source)
+        return decode_program(ET.fromstring(source))
+    except ExceptionHandler:
+        raise
+    except (ET.ParseError, *READ_ERRORS) as exc:
+        raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from exc
+
+
+def load(source: bytes | str | os.PathLike, **options) -> LoadedProgram:
+    # A str is the XML text of the program, bytes an XML or binary program and a path-like object its file.
+    # The options are the ones of LoadedProgram. Raises ExceptionHandler if the program cannot be decoded.
+    if isinstance(source, os.PathLike):
+        return load_file(os.fspath(source), **options)
+    return LoadedProgram(decode(source), **options)
+
+
+def load_file(path: str, cache: ProgramCache | None = None, **options) -> LoadedProgram:
+    if is_binary_program(path):
+        program = load_binary_program(path)
+    elif cache is not None:
+        program = cache.load(path, load_program)
+    else:
+        program = load_program(path)
+    return LoadedProgram(program, **options)
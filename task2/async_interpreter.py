@@ -0,0 +1,118 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterable, Awaitable, Callable, Iterable
+from exception_handler import ExceptionHandler, ErrorCodes
+from input_reader import InputReader
+from limits import step_costs
+from decoder import Program, OP_READINT, OP_READSTR
+
+# Instructions executed between two yields to the event loop, so a program that does no I/O for a while
+# does not hold up the other sessions
+YIELD_INTERVAL = 1000
+
+
+async def aiter_lines(lines: Iterable[str]):
+    for line in lines:
+        yield line
+
+
+# Input of READINT/READSTR from an async iterable of lines. The lines are fetched by fill before the
+# instruction runs, the handlers of the interpreter read them like any other input.
+class AsyncInput(InputReader):
+    def __init__(self, source: AsyncIterable[str] | Iterable[str]) -> None:
+        if not hasattr(source, '__aiter__'):
+            source = aiter_lines(source)
+        super().__init__((), eof_error=None)
+        self.source = source.__aiter__()
+        self.buffered: deque = deque()
+        self.exhausted = False
+        self.skipped = 0  # Lines to skip for a resumed run, read by fill as the skip cannot wait for them
+
+    def read_line(self) -> str | None:
+        if not self.buffered:
+            return None
+        self.position += 1
+        return self.buffered.popleft()
+
+    def skip(self, count: int) -> bool:
+        self.skipped = max(count - self.position, 0)
+        self.position += self.skipped
+        return True
+
+    async def discard_skipped(self) -> None:
+        while self.skipped:
+            if await anext(self.source, None) is None:
+                raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+            self.skipped -= 1
+
+    async def fill(self) -> None:
+        if not self.buffered and not self.exhausted:
+            line = await anext(self.source, None)
+            if line is None:
+                self.exhausted = True
+            else:
+                self.buffered.append(line)
+
+    def close(self) -> None:
+        self.source = None
+
+
+# Collects what the OutputWriter of the interpreter flushes until drain passes it to an async write
+class AsyncOutput:
+    def __init__(self, write: Callable[[str], Awaitable]) -> None:
+        self.write_async = write
+        self.chunks: list = []
+
+    def write(self, text: str) -> None:
+        self.chunks.append(text)
+
+    def flush(self) -> None:
+        pass
+
+    async def drain(self) -> None:
+        if self.chunks:
+            text = ''.join(self.chunks)
+            self.chunks.clear()
+            await self.write_async(text)
+
+
+async def run_async(interpreter, program: Program, instructions: list) -> None:
+    # The dispatch loop awaiting the input before READINT/READSTR and the output after it is flushed.
+    # The interpreter reads from an AsyncInput and writes to an AsyncOutput. Compiled blocks cannot wait
+    # in the middle, so a program always runs through the dispatch loop here.
+    source = interpreter.input
+    output = interpreter.output
+    sink = output.output_file
+    try:
+        interpreter.prepare(program)
+        await source.discard_skipped()
+        dispatch = interpreter.dispatch
+        limits = interpreter.limits
+        costs = step_costs(instructions) if limits is not None else None
+        program_len = len(instructions)
+        countdown = YIELD_INTERVAL
+        while interpreter.pc < program_len:
+            instruction = instructions[interpreter.pc]
+            if limits is not None:
+                cost = costs[interpreter.pc]
+                if limits.steps + cost > limits.checkpoint and not limits.renew(cost):
+                    instruction = limits.split(instruction)
+                    cost = 1
+                limits.steps += cost
+            if instruction.opcode == OP_READINT or instruction.opcode == OP_READSTR:
+                # Show what was printed before waiting on the input
+                output.flush()
+                await sink.drain()
+                await source.fill()
+            dispatch[instruction.opcode](instruction)
+            interpreter.pc += 1
+            if sink.chunks:
+                await sink.drain()
+            countdown -= 1
+            if not countdown:
+                countdown = YIELD_INTERVAL
+                await asyncio.sleep(0)
+    finally:
+        # Whatever was printed before an error still reaches the output
+        output.flush()
+        await sink.drain()
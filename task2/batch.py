@@ -0,0 +1,166 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import signal
+import contextlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from interpreter import Interpreter
+from input_reader import InputReader
+from exception_handler import ExceptionHandler
+
+# Statuses of a case in the report
+PASSED = 'passed'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+# A program with the files next to it: optional .in input, expected .out output and expected .rc code
+class Case:
+    def __init__(self, program: str) -> None:
+        base = os.path.splitext(program)[0]
+        self.name = base
+        self.program = program
+        self.input_file = existing(base + '.in')
+        self.output_file = existing(base + '.out')
+        self.rc_file = existing(base + '.rc')
+
+
+class CaseTimeout(BaseException):
+    # Not an Exception, so nothing in the interpreter mistakes it for an error of the program
+    pass
+
+
+def existing(path: str) -> str | None:
+    return path if os.path.exists(path) else None
+
+
+def read_text(path: str | None) -> str | None:
+    if path is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def discover_cases(paths: list) -> list:
+    programs = []
+    for path in paths:
+        if os.path.isdir(path):
+            programs.extend(sorted(glob.glob(os.path.join(path, '**', '*.xml'), recursive=True)))
+        elif glob.has_magic(path):
+            programs.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            programs.append(path)
+    return [Case(program) for program in programs]
+
+
+def raise_timeout(signum, frame):
+    raise CaseTimeout()
+
+
+def run_case(case: Case, options: dict, timeout: float | None) -> dict:
+    # Runs in a worker process. The program's output and error messages are captured, the .rc next to the
+    # program is the expectation and is not written.
+    if case.input_file is not None:
+        input_reader = case.input_file
+    else:
+        # Like taci.py reading an empty stdin
+        input_reader = InputReader((), strip=True, eof_error=None)
+    output = io.StringIO()
+    errors = io.StringIO()
+    interpreter = Interpreter(case.program, input_reader, output, **options)
+    timer = timeout is not None and hasattr(signal, 'setitimer')
+    if timer:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    status = None
+    try:
+        with contextlib.redirect_stderr(errors):
+            try:
+                interpreter.start()
+                code = 0
+            except ExceptionHandler as e:
+                errors.write(e.error_message + "\n")
+                code = e.error_code.value
+            except Exception as e:
+                errors.write(f"Error: {e}\n")
+                code = 99
+    except CaseTimeout:
+        status = TIMEOUT
+        code = None
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    seconds = time.perf_counter() - start
+
+    expected_output = read_text(case.output_file)
+    expected_rc = read_text(case.rc_file)
+    expected_code = int(expected_rc) if expected_rc is not None and expected_rc.strip() else None
+    messages = []
+    if status is None:
+        if expected_code is not None and code != expected_code:
+            messages.append(f"return code {code}, expected {expected_code}")
+        if expected_output is not None and output.getvalue() != expected_output:
+            messages.append("output differs from " + case.output_file)
+        status = FAILED if messages else PASSED
+    else:
+        messages.append(f"timed out after {timeout} s")
+    return {
+        'name': case.name, 'program': case.program, 'status': status, 'time': seconds,
+        'code': code, 'expected_code': expected_code, 'output': output.getvalue(),
+        'expected_output': expected_output, 'stderr': errors.getvalue(), 'messages': messages,
+    }
+
+
+def run_batch(cases: list, options: dict, workers: int | None, timeout: float | None) -> list:
+    if workers == 1:
+        return [run_case(case, options, timeout) for case in cases]
+    with ProcessPoolExecutor(workers) as executor:
+        # Reported in the order the cases were found, whichever finishes first
+        futures = [executor.submit(run_case, case, options, timeout) for case in cases]
+        return [future.result() for future in futures]
+
+
+def summarize(results: list, seconds: float) -> dict:
+    counts = {PASSED: 0, FAILED: 0, TIMEOUT: 0}
+    for result in results:
+        counts[result['status']] += 1
+    return {'cases': len(results), **counts, 'time': seconds}
+
+
+def write_json_report(path: str, results: list, summary: dict) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'summary': summary, 'cases': results}, file, indent=2)
+        file.write('\n')
+
+
+def write_junit_report(path: str, results: list, summary: dict) -> None:
+    suite = ET.Element('testsuite', {
+        'name': 'taci', 'tests': str(summary['cases']), 'failures': str(summary[FAILED]),
+        'errors': str(summary[TIMEOUT]), 'time': f"{summary['time']:.3f}"})
+    for result in results:
+        directory, name = os.path.split(result['name'])
+        case = ET.SubElement(suite, 'testcase', {
+            'classname': directory.replace(os.sep, '.') or '.', 'name': name, 'time': f"{result['time']:.3f}"})
+        if result['status'] == FAILED:
+            failure = ET.SubElement(case, 'failure', {'message': '; '.join(result['messages'])})
+            failure.text = result['output']
+        elif result['status'] == TIMEOUT:
+            ET.SubElement(case, 'error', {'message': '; '.join(result['messages'])})
+        if result['stderr']:
+            ET.SubElement(case, 'system-err').text = result['stderr']
+    ET.indent(suite)
+    ET.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+
+
+def print_summary(results: list, summary: dict) -> None:
+    for result in results:
+        if result['status'] != PASSED:
+            print(f"{result['status'].upper()} {result['program']}: {'; '.join(result['messages'])}")
+    print(f"{summary['cases']} cases in {summary['time']:.2f} s: {summary[PASSED]} passed, "
+          f"{summary[FAILED]} failed, {summary[TIMEOUT]} timed out")
+    sys.stdout.flush()
@@ -0,0 +1,189 @@
+# Binary program format, loaded without parsing XML. All numbers are little endian:
+#   header        magic, format version, flags and the sizes of the sections below
+#   constants     pool of the integers and strings used by the program: names, labels, literals, orders
+#   variables     constant index of the name of every variable slot
+#   labels        constant index of a label name and the index of its LABEL instruction
+#   instructions  fixed width records with the opcode, fault, operand kinds and values, jump target,
+#                 source opcode and order
+# An operand value is the slot of a variable, the ErrorCodes value of an invalid operand, or a constant index.
+import sys
+import mmap
+import struct
+import argparse
+from exception_handler import ExceptionHandler, ErrorCodes
+from decoder import Program, Instruction, load_program, OPERAND_VARIABLE, OPERAND_INVALID
+from encoder import write_program
+
+MAGIC = b'3ACB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIIi')  # magic, version, flags, section sizes, name
+CONSTANT_TAG = struct.Struct('<BI')  # tag, length of the encoded value that follows
+LABEL = struct.Struct('<II')
+INSTRUCTION = struct.Struct('<BBBBBIIIiii')
+NO_OPERAND = 0xFF  # Operand kind of a missing operand
+NO_CONSTANT = 0xFFFFFFFF  # Operand value of a label operand without text
+TAG_INTEGER = 0
+TAG_STRING = 1
+ERROR_CODES = {code.value: code for code in ErrorCodes}
+# Raised while reading a truncated or corrupted binary program
+READ_ERRORS = (OSError, ValueError, struct.error, UnicodeDecodeError, IndexError, KeyError)
+
+
+class ConstantPool:
+    def __init__(self) -> None:
+        self.index: dict = {}
+        self.values: list = []
+
+    def add(self, value) -> int:
+        if value is None:
+            return -1
+        key = (type(value), value)
+        position = self.index.get(key)
+        if position is None:
+            position = self.index[key] = len(self.values)
+            self.values.append(value)
+        return position
+
+
+def is_binary_program(path) -> bool:
+    if not isinstance(path, str):
+        return False
+    try:
+        with open(path, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def dump_program(program: Program) -> bytes:
+    constants = ConstantPool()
+    records = []
+    for instruction in program.instructions:
+        kinds = []
+        values = []
+        for operand in (instruction.dst, instruction.src1, instruction.src2):
+            if operand is None:
+                kinds.append(NO_OPERAND)
+                values.append(0)
+                continue
+            kind, value = operand
+            kinds.append(kind)
+            if kind == OPERAND_INVALID:
+                values.append(value.value)
+            elif kind == OPERAND_VARIABLE:
+                values.append(value)
+            else:
+                values.append(constants.add(value) if value is not None else NO_CONSTANT)
+        records.append(INSTRUCTION.pack(
+            instruction.opcode, instruction.fault.value if instruction.fault is not None else 0,
+            *kinds, *values,
+            instruction.target if instruction.target is not None else -1,
+            constants.add(instruction.source_opcode), constants.add(instruction.order)))
+    variables = [constants.add(name) for name in program.variables]
+    labels = [LABEL.pack(constants.add(name), index) for name, index in program.labels.items()]
+    name = constants.add(program.name)
+
+    chunks = [HEADER.pack(MAGIC, VERSION, 0, len(constants.values), len(variables), len(labels),
+                          len(records), name)]
+    for value in constants.values:
+        if isinstance(value, int):
+            encoded = str(value).encode('ascii')
+            chunks.append(CONSTANT_TAG.pack(TAG_INTEGER, len(encoded)))
+        else:
+            encoded = value.encode('utf-8')
+            chunks.append(CONSTANT_TAG.pack(TAG_STRING, len(encoded)))
+        chunks.append(encoded)
+    chunks.append(struct.pack(f'<{len(variables)}I', *variables))
+    chunks.extend(labels)
+    chunks.extend(records)
+    return b''.join(chunks)
+
+
+def save_program(program: Program, path: str) -> None:
+    with open(path, 'wb') as file:
+        file.write(dump_program(program))
+
+
+def load_binary_program(path: str) -> Program:
+    try:
+        return read_binary_program(path)
+    except READ_ERRORS as exc:
+        raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from exc
+
+
+def read_binary_program(path: str) -> Program:
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return parse_program(data)
+
+
+def parse_program(data) -> Program:
+    magic, version, _, constant_count, variable_count, label_count, instruction_count, name = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a binary 3AC program of a supported version')
+    offset = HEADER.size
+
+    constants = []
+    for _ in range(constant_count):
+        tag, length = CONSTANT_TAG.unpack_from(data, offset)
+        offset += CONSTANT_TAG.size
+        encoded = data[offset:offset + length]
+        offset += length
+        constants.append(int(encoded) if tag == TAG_INTEGER else encoded.decode('utf-8'))
+
+    variables = [constants[i] for i in struct.unpack_from(f'<{variable_count}I', data, offset)]
+    offset += 4 * variable_count
+
+    labels = {}
+    for _ in range(label_count):
+        name_index, index = LABEL.unpack_from(data, offset)
+        offset += LABEL.size
+        labels[constants[name_index]] = index
+
+    end = offset + INSTRUCTION.size * instruction_count
+    instructions = []
+    for record in INSTRUCTION.iter_unpack(data[offset:end]):
+        opcode, fault, dst_kind, src1_kind, src2_kind, dst, src1, src2, target, source_opcode, order = record
+        instruction = Instruction(
+            opcode, constants[order] if order >= 0 else None,
+            read_operand(dst_kind, dst, constants), read_operand(src1_kind, src1, constants),
+            read_operand(src2_kind, src2, constants))
+        instruction.target = target if target >= 0 else None
+        instruction.fault = ERROR_CODES[fault] if fault else None
+        instruction.source_opcode = constants[source_opcode] if source_opcode >= 0 else None
+        instructions.append(instruction)
+    return Program(constants[name] if name >= 0 else None, instructions, labels, variables)
+
+
+def read_operand(kind: int, value: int, constants: list):
+    if kind == NO_OPERAND:
+        return None
+    if kind == OPERAND_INVALID:
+        return (kind, ERROR_CODES[value])
+    if kind == OPERAND_VARIABLE:
+        return (kind, value)
+    return (kind, constants[value] if value != NO_CONSTANT else None)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Converts programs between the XML representation and the binary program format.')
+    parser.add_argument('program', help='XML or binary program file, the format is detected from the content.')
+    parser.add_argument('output', help='Output file, binary for an XML program and XML for a binary one.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    try:
+        if is_binary_program(args.program):
+            write_program(load_binary_program(args.program), args.output)
+        else:
+            save_program(load_program(args.program), args.output)
+    except ExceptionHandler as e:
+        sys.stderr.write(e.error_message + "\n")
+        sys.exit(e.error_code.value)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import glob
+import unittest
+import xml.etree.ElementTree as ET
+from decoder import Program, load_program, decode_program, OPERAND_VARIABLE
+from binary_format import dump_program, parse_program
+from encoder import program_to_xml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROGRAMS = sorted(glob.glob(os.path.join(HERE, 'tests', '*.xml')) +
+                  glob.glob(os.path.join(HERE, 'tests_example', '*.xml')))
+
+
+def described(program: Program) -> list:
+    # Everything an instruction is decoded to, with the variables by name
+    def operand(value):
+        if value is not None and value[0] == OPERAND_VARIABLE:
+            return ('variable', program.variables[value[1]])
+        return value
+    return [(instruction.opcode, instruction.order, operand(instruction.dst), operand(instruction.src1),
+             operand(instruction.src2), instruction.target, instruction.fault, instruction.source_opcode)
+            for instruction in program.instructions]
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_binary_round_trip(self):
+        for path in PROGRAMS:
+            with self.subTest(path=os.path.basename(path)):
+                program = load_program(path)
+                self.assertEqual(described(parse_program(dump_program(program))), described(program))
+
+    def test_binary_to_xml_round_trip(self):
+        for path in PROGRAMS:
+            with self.subTest(path=os.path.basename(path)):
+                program = load_program(path)
+                xml = program_to_xml(parse_program(dump_program(program)))
+                self.assertEqual(described(decode_program(ET.fromstring(xml))), described(program))
+
+    def test_xml_keeps_header_and_orders(self):
+        source = ('<program name="gaps"><tac opcode="PRINT" order="10"><src1 type="string">a</src1></tac>'
+                  '<tac opcode="RETURN" order="20"/></program>')
+        xml = program_to_xml(parse_program(dump_program(decode_program(ET.fromstring(source)))))
+        self.assertTrue(xml.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE program ['))
+        self.assertEqual([tac.get('order') for tac in ET.fromstring(xml)], ['10', '20'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from decoder import Program, OP_LABEL, OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_INVALID
+
+# Instructions after which a new basic block starts
+BLOCK_ENDS = (OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_INVALID)
+
+
+class BasicBlock:
+    __slots__ = ('id', 'start', 'end', 'successors', 'predecessors', 'is_return_site')
+
+    def __init__(self, block_id: int, start: int, end: int) -> None:
+        self.id = block_id
+        self.start = start  # Index of the first instruction
+        self.end = end  # Index one past the last instruction
+        self.successors: list = []
+        self.predecessors: list = []  # Without the RETURN blocks, see ControlFlowGraph.predecessors
+        self.is_return_site = False  # The block follows a CALL
+
+    def last(self) -> int:
+        return self.end - 1
+
+
+# Basic blocks of a program with their successor and predecessor edges.
+# A CALL only leads to the called label and every RETURN leads to every block following a CALL. To stay
+# linear all RETURN blocks share the return_sites list as successors, and the RETURN blocks are left out
+# of the predecessors of return sites, ControlFlowGraph.predecessors adds them back.
+class ControlFlowGraph:
+    def __init__(self, program: Program, blocks: list, block_of: list, return_sites: list, returns: list) -> None:
+        self.program = program
+        self.blocks = blocks
+        self.block_of = block_of  # Block id of every instruction
+        self.return_sites = return_sites
+        self.returns = returns
+
+    def entry(self) -> BasicBlock | None:
+        return self.blocks[0] if self.blocks else None
+
+    def block_at(self, index: int) -> BasicBlock:
+        return self.blocks[self.block_of[index]]
+
+    def predecessors(self, block: BasicBlock) -> list:
+        if block.is_return_site:
+            return block.predecessors + self.returns
+        return block.predecessors
+
+    def reverse_postorder(self) -> list:
+        # Blocks reachable from the entry, every block before its successors except along back edges
+        if not self.blocks:
+            return []
+        visited = [False] * len(self.blocks)
+        order = []
+        visited[0] = True
+        stack = [(self.blocks[0], iter(self.blocks[0].successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if not visited[successor]:
+                    visited[successor] = True
+                    stack.append((self.blocks[successor], iter(self.blocks[successor].successors)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+
+def find_leaders(instructions: list) -> list:
+    is_leader = [False] * len(instructions)
+    if instructions:
+        is_leader[0] = True
+    for i, instruction in enumerate(instructions):
+        if instruction.opcode == OP_LABEL:
+            is_leader[i] = True
+        elif instruction.opcode in BLOCK_ENDS and i + 1 < len(instructions):
+            is_leader[i + 1] = True
+        if instruction.target is not None:
+            is_leader[instruction.target] = True
+    return [i for i, leader in enumerate(is_leader) if leader]
+
+
+def build_cfg(program: Program) -> ControlFlowGraph:
+    instructions = program.instructions
+    leaders = find_leaders(instructions)
+    blocks = []
+    block_of = [0] * len(instructions)
+    for block_id, start in enumerate(leaders):
+        end = leaders[block_id + 1] if block_id + 1 < len(leaders) else len(instructions)
+        blocks.append(BasicBlock(block_id, start, end))
+        for i in range(start, end):
+            block_of[i] = block_id
+
+    return_sites: list = []
+    returns: list = []
+    for block in blocks:
+        last = instructions[block.last()]
+        fallthrough = block.id + 1 if block.id + 1 < len(blocks) else None
+        if last.opcode == OP_JUMP:
+            block.successors.append(block_of[last.target])
+        elif last.opcode in (OP_JUMPIFEQ, OP_JUMPIFLT):
+            block.successors.append(block_of[last.target])
+            if fallthrough is not None and fallthrough != block.successors[0]:
+                block.successors.append(fallthrough)
+        elif last.opcode == OP_CALL:
+            block.successors.append(block_of[last.target])
+            if fallthrough is not None:
+                return_sites.append(fallthrough)
+        elif last.opcode == OP_RETURN:
+            returns.append(block.id)
+        elif last.opcode != OP_INVALID and fallthrough is not None:
+            block.successors.append(fallthrough)
+
+    for block in blocks:
+        for successor in block.successors:
+            blocks[successor].predecessors.append(block.id)
+    for block_id in returns:
+        blocks[block_id].successors = return_sites
+    for site in return_sites:
+        blocks[site].is_return_site = True
+    return ControlFlowGraph(program, blocks, block_of, return_sites, returns)
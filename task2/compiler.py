@@ -0,0 +1,242 @@
+from exception_handler import ExceptionHandler, ErrorCodes
+from variable import TYPE_INTEGER, TYPE_STRING
+from cfg import build_cfg
+from limits import step_costs
+from type_analysis import TypeAnalysis, analyze_types, specialize_instructions
+from decoder import (Program, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_PRINT, OP_PRINTLN, OP_LABEL,
+                     OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP, OP_INVALID,
+                     OPERAND_INTEGER, OPERAND_STRING, OPERAND_VARIABLE, OPERAND_INVALID)
+
+ARITHMETIC = {OP_ADD: '+', OP_SUB: '-', OP_MUL: '*', OP_DIV: '//'}
+# Instructions translated to inline code, the others call the handler of the interpreter
+INLINED = (OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_PRINT, OP_PRINTLN, OP_LABEL,
+           OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP)
+
+
+# A program translated to Python source, every basic block is a function returning the id of the next block
+class CompiledProgram:
+    def __init__(self, program: Program, source: str, starts: list, block_of: list, instructions: list) -> None:
+        self.program = program
+        self.instructions = instructions  # Typed where proven, for the handlers called by the blocks
+        self.source = source
+        self.block_count = len(starts)
+        self.starts = starts  # Index of the first instruction of every block
+        self.block_of = block_of  # Block id of every instruction
+        self.code = compile(source, f'<3ac {program.name}>', 'exec')
+
+    def bind(self, interpreter) -> tuple:
+        namespace = {
+            'ExceptionHandler': ExceptionHandler,
+            'ErrorCodes': ErrorCodes,
+            'TYPE_INTEGER': TYPE_INTEGER,
+            'TYPE_STRING': TYPE_STRING,
+        }
+        exec(self.code, namespace)
+        return namespace['make_blocks'](
+            interpreter.values, interpreter.types, interpreter.call_stack, interpreter.data_stack,
+            interpreter.output.write, interpreter.dispatch, self.instructions)
+
+    def is_entry(self, pc: int) -> bool:
+        # Whether the dispatch loop can hand over to the block of pc, a jump lands after the LABEL it targets
+        start = self.starts[self.block_of[pc]]
+        return pc == start or (pc == start + 1 and self.program.instructions[start].opcode == OP_LABEL)
+
+    def block_after(self, index: int) -> int:
+        return self.block_of[index + 1] if index + 1 < len(self.block_of) else self.block_count
+
+    def enter(self, interpreter) -> int:
+        # Block to continue a run at, the call stack holds the blocks after the CALLs from then on.
+        # A run resumed between two entries executes the instructions up to the next one first.
+        instructions = self.program.instructions
+        while interpreter.pc < len(instructions) and not self.is_entry(interpreter.pc):
+            interpreter.step(instructions[interpreter.pc])
+        interpreter.call_stack[:] = [self.block_after(index) for index in interpreter.call_stack]
+        return self.block_of[interpreter.pc] if interpreter.pc < len(instructions) else self.block_count
+
+    def leave(self, interpreter, block: int) -> None:
+        # Back to the state of the dispatch loop before the block, the call stack holds the CALL indices
+        interpreter.pc = self.starts[block] if block < self.block_count else len(self.program.instructions)
+        interpreter.call_stack[:] = [(self.starts[after] if after < self.block_count else len(self.block_of)) - 1
+                                     for after in interpreter.call_stack]
+
+
+def run_compiled(interpreter, compiled: CompiledProgram) -> None:
+    blocks = compiled.bind(interpreter)
+    block = compiled.enter(interpreter)
+    end = len(blocks)
+    limits = interpreter.limits
+    if limits is None:
+        while block < end:
+            block = blocks[block]()
+    else:
+        # A whole block is counted when it is entered, blocks are only ever entered at their start or after
+        # their LABEL, which counts as no step
+        costs = step_costs(compiled.program.instructions)
+        starts = compiled.starts
+        sizes = [sum(costs[start:next_start])
+                 for start, next_start in zip(starts, starts[1:] + [len(compiled.block_of)])]
+        while block < end:
+            size = sizes[block]
+            if limits.steps + size > limits.checkpoint and not limits.renew(size):
+                # The block does not fit, its instructions run one at a time up to the limit
+                compiled.leave(interpreter, block)
+                interpreter.run_limited(compiled.program.instructions)
+                return
+            limits.steps += size
+            block = blocks[block]()
+    interpreter.pc = len(compiled.program.instructions)
+
+
+def compile_program(program: Program, analysis: TypeAnalysis | None = None) -> CompiledProgram:
+    instructions = program.instructions
+    cfg = build_cfg(program)
+    if analysis is None:
+        analysis = analyze_types(program, cfg)
+    typed = specialize_instructions(instructions, analysis)
+    lines = ['def make_blocks(values, types, call_stack, data_stack, write, dispatch, instructions):']
+    for i, instruction in enumerate(instructions):
+        if instruction.opcode not in INLINED:
+            lines.append(f'    h{i} = dispatch[{typed[i].opcode}]')
+            lines.append(f'    i{i} = instructions[{i}]')
+    for block in cfg.blocks:
+        lines.append(f'    def block_{block.id}():')
+        for i in range(block.start, block.end):
+            code = translate(instructions[i], i, cfg.block_of, block.id + 1, analysis)
+            lines.extend('        ' + line for line in code)
+            if always_fails(code):
+                # The instruction always fails, nothing after it is reached
+                break
+        else:
+            if instructions[block.last()].opcode not in (OP_JUMP, OP_CALL, OP_RETURN, OP_INVALID):
+                lines.append(f'        return {block.id + 1}')
+    lines.append('    return (' + ''.join(f'block_{block.id}, ' for block in cfg.blocks) + ')')
+    return CompiledProgram(program, '\n'.join(lines) + '\n', [block.start for block in cfg.blocks], cfg.block_of,
+                           typed)
+
+
+def translate(instruction, i: int, block_of: list, next_block: int, analysis: TypeAnalysis) -> list:
+    # Checks the type analysis proved unnecessary are left out
+    opcode = instruction.opcode
+    safe = analysis.safe[i]
+    if opcode in INLINED:
+        lines = read_until_invalid(instruction, safe)
+        if lines is not None:
+            return lines
+    if opcode == OP_MOV:
+        lines, value = read_operand(instruction.src1, 'a', safe)
+        return lines + store(instruction.dst[1], value, type_of(instruction.src1))
+    if opcode in ARITHMETIC:
+        lines, a = read_operand(instruction.src1, 'a', safe)
+        more, b = read_operand(instruction.src2, 'b', safe)
+        lines += more + ([] if safe else check_types(instruction, ('TYPE_INTEGER',)))
+        if always_fails(lines):
+            return lines
+        if opcode == OP_DIV:
+            # Check if the division by zero is attempted
+            lines.append(f'if {b} == 0: raise ExceptionHandler(ErrorCodes.DIVISION_BY_ZERO)')
+        return lines + store(instruction.dst[1], f'{a} {ARITHMETIC[opcode]} {b}', 'TYPE_INTEGER')
+    if opcode in (OP_PRINT, OP_PRINTLN):
+        lines, value = read_operand(instruction.src1, 'a', safe)
+        end = " + '\\n'" if opcode == OP_PRINTLN else ''
+        return lines + [f'write(str({value}){end})']
+    if opcode == OP_LABEL:
+        return []
+    if opcode == OP_JUMP:
+        return [f'return {block_of[instruction.target]}']
+    if opcode in (OP_JUMPIFEQ, OP_JUMPIFLT):
+        lines, a = read_operand(instruction.src1, 'a', safe)
+        more, b = read_operand(instruction.src2, 'b', safe)
+        lines += more + ([] if safe else check_types(instruction, ('TYPE_INTEGER', 'TYPE_STRING')))
+        if always_fails(lines):
+            return lines
+        compare = '==' if opcode == OP_JUMPIFEQ else '<'
+        return lines + [f'if {a} {compare} {b}: return {block_of[instruction.target]}']
+    if opcode == OP_CALL:
+        return [f'call_stack.append({next_block})', f'return {block_of[instruction.target]}']
+    if opcode == OP_PUSH:
+        lines, value = read_operand(instruction.src1, 'a', safe)
+        return lines + [f'data_stack.append({value})']
+    if opcode == OP_POP:
+        lines = ['if not data_stack: raise ExceptionHandler(ErrorCodes.POP_ERROR)', 'a = data_stack.pop()']
+        return lines + store(instruction.dst[1], 'a', 'TYPE_INTEGER if type(a) is int else TYPE_STRING')
+    if opcode == OP_RETURN:
+        return ['if not call_stack: raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)',
+                'return call_stack.pop()']
+    return [f'h{i}(i{i})']
+
+
+def read_operand(operand: tuple, name: str, assigned: bool = False) -> tuple:
+    kind, value = operand
+    if kind == OPERAND_VARIABLE:
+        if assigned:
+            return [], f'values[{value}]'
+        # An unassigned slot holds None, every assigned variable holds an int, a str or a StringBuilder
+        return [f'{name} = values[{value}]',
+                f'if {name} is None: raise ExceptionHandler(ErrorCodes.READ_ACCESS_ERROR)'], name
+    if kind == OPERAND_INVALID:
+        return [f'raise ExceptionHandler(ErrorCodes.{value.name})'], 'None'
+    return [], repr(value)
+
+
+def always_fails(lines: list) -> bool:
+    # Whether the code ends with an unconditional raise, code after it is never reached
+    return bool(lines) and lines[-1].startswith('raise ')
+
+
+def read_until_invalid(instruction, safe: bool) -> list | None:
+    # Code of an instruction reading an invalid operand, the operands read before it and the raise and nothing
+    # after, None if every operand is valid
+    lines = []
+    for operand, name in ((instruction.src1, 'a'), (instruction.src2, 'b')):
+        if operand is None:
+            continue
+        more, _ = read_operand(operand, name, safe)
+        lines += more
+        if operand[0] == OPERAND_INVALID:
+            return lines
+    return None
+
+
+def type_of(operand: tuple) -> str:
+    kind, value = operand
+    if kind == OPERAND_INTEGER:
+        return 'TYPE_INTEGER'
+    if kind == OPERAND_STRING:
+        return 'TYPE_STRING'
+    if kind != OPERAND_VARIABLE:
+        # Instructions reading an invalid operand are translated to its raise alone
+        raise ValueError(f'operand {operand} has no type')
+    return f'types[{value}]'
+
+
+def literal_type(operand: tuple) -> str | None:
+    if operand[0] == OPERAND_INTEGER:
+        return 'TYPE_INTEGER'
+    if operand[0] == OPERAND_STRING:
+        return 'TYPE_STRING'
+    return None
+
+
+def check_types(instruction, allowed: tuple) -> list:
+    # Both operands must have the same type out of allowed, literals are checked while compiling. Variables
+    # are checked by their type tags, a string can be a str or a StringBuilder.
+    type_a = literal_type(instruction.src1)
+    type_b = literal_type(instruction.src2)
+    incompatible = 'raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)'
+    if type_a is not None and type_b is not None:
+        return [] if type_a == type_b and type_a in allowed else [incompatible]
+    if type_a is not None or type_b is not None:
+        known = type_a if type_a is not None else type_b
+        if known not in allowed:
+            return [incompatible]
+        other = instruction.src2 if type_a is not None else instruction.src1
+        return [f'if {type_of(other)} != {known}: {incompatible}']
+    if allowed == ('TYPE_INTEGER',):
+        return [f'if {type_of(instruction.src1)} != TYPE_INTEGER or {type_of(instruction.src2)} != TYPE_INTEGER: '
+                f'{incompatible}']
+    # Variables only ever hold integers or strings, so equal types are always comparable
+    return [f'if {type_of(instruction.src1)} != {type_of(instruction.src2)}: {incompatible}']
+
+
+def store(slot: int, value: str, value_type: str) -> list:
+    return [f'values[{slot}] = {value}', f'types[{slot}] = {value_type}']
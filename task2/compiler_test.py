@@ -0,0 +1,124 @@
+import os
+import glob
+import unittest
+import xml.etree.ElementTree as ET
+import api
+from decoder import decode_program
+from compiler import compile_program
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROGRAMS = sorted(glob.glob(os.path.join(HERE, 'tests', '*.xml')) +
+                  glob.glob(os.path.join(HERE, 'tests_example', '*.xml')))
+# Options of every execution mode, compared with the dispatch loop without fusion
+MODES = {
+    'fusion': {},
+    'compiled': {'compiled': True},
+    'optimized': {'optimize': True},
+    'compiled optimized': {'compiled': True, 'optimize': True},
+    'compiled without fusion': {'compiled': True, 'fusion': False},
+}
+
+
+# Input of the programs that read from a terminal, the other programs get their .in file or no input
+TERMINAL_INPUT = {
+    'ex10.xml': ['9'],
+    'ex14.xml': ['7', '7'],
+    'ex15.xml': ['apple', 'pear'],
+}
+# Loops, calls, the stack and long strings, ending with a division by zero
+MIXED_PROGRAM = '''<program name="mixed">
+  <tac opcode="READINT" order="1"><dst type="variable">n</dst></tac>
+  <tac opcode="MOV" order="2"><dst type="variable">i</dst><src1 type="integer">0</src1></tac>
+  <tac opcode="MOV" order="3"><dst type="variable">text</dst><src1 type="string">start</src1></tac>
+  <tac opcode="LABEL" order="4"><dst type="label">@loop</dst></tac>
+  <tac opcode="PUSH" order="5"><src1 type="variable">i</src1></tac>
+  <tac opcode="CALL" order="6"><dst type="label">@square</dst></tac>
+  <tac opcode="POP" order="7"><dst type="variable">square</dst></tac>
+  <tac opcode="INTSTR" order="8"><dst type="variable">digits</dst><src1 type="variable">square</src1></tac>
+  <tac opcode="CONCAT" order="9"><dst type="variable">text</dst><src1 type="variable">text</src1>
+    <src2 type="variable">digits</src2></tac>
+  <tac opcode="ADD" order="10"><dst type="variable">i</dst><src1 type="variable">i</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="JUMPIFLT" order="11"><dst type="label">@loop</dst><src1 type="variable">i</src1>
+    <src2 type="variable">n</src2></tac>
+  <tac opcode="LEN" order="12"><dst type="variable">length</dst><src1 type="variable">text</src1></tac>
+  <tac opcode="PRINTLN" order="13"><src1 type="variable">length</src1></tac>
+  <tac opcode="SUB" order="14"><dst type="variable">last</dst><src1 type="variable">length</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="GETAT" order="15"><dst type="variable">char</dst><src1 type="variable">text</src1>
+    <src2 type="variable">last</src2></tac>
+  <tac opcode="STRINT" order="16"><dst type="variable">digit</dst><src1 type="variable">char</src1></tac>
+  <tac opcode="PRINTLN" order="17"><src1 type="variable">digit</src1></tac>
+  <tac opcode="DIV" order="18"><dst type="variable">zero</dst><src1 type="variable">digit</src1>
+    <src2 type="integer">0</src2></tac>
+  <tac opcode="LABEL" order="19"><dst type="label">@square</dst></tac>
+  <tac opcode="POP" order="20"><dst type="variable">x</dst></tac>
+  <tac opcode="MUL" order="21"><dst type="variable">x</dst><src1 type="variable">x</src1>
+    <src2 type="variable">x</src2></tac>
+  <tac opcode="PUSH" order="22"><src1 type="variable">x</src1></tac>
+  <tac opcode="RETURN" order="23"/>
+</program>'''
+# Instructions failing on a malformed or mistyped operand, each followed by code that is never reached
+FAILING_INSTRUCTIONS = [
+    '<tac opcode="MOV" order="1"><dst type="variable">a</dst><src1 type="integer">x1</src1></tac>',
+    '<tac opcode="ADD" order="1"><dst type="variable">a</dst><src1 type="integer">1</src1>'
+    '<src2 type="integer"></src2></tac>',
+    '<tac opcode="SUB" order="1"><dst type="variable">a</dst><src1 type="string">text</src1>'
+    '<src2 type="integer">1</src2></tac>',
+    '<tac opcode="READINT" order="1"><dst type="variable">a</dst></tac>'
+    '<tac opcode="JUMPIFEQ" order="2"><dst type="label">@end</dst><src1 type="variable">a</src1>'
+    '<src2 type="integer">2x</src2></tac>',
+    '<tac opcode="JUMPIFLT" order="1"><dst type="label">@end</dst><src1 type="variable">unset</src1>'
+    '<src2 type="integer">2x</src2></tac>',
+    '<tac opcode="PUSH" order="1"><src1 type="integer">-</src1></tac>',
+]
+
+
+def read_input(path: str) -> list:
+    if os.path.basename(path) in TERMINAL_INPUT:
+        return TERMINAL_INPUT[os.path.basename(path)]
+    input_path = path[:-len('.xml')] + '.in'
+    if not os.path.exists(input_path):
+        return []
+    with open(input_path, encoding='utf-8') as file:
+        return file.read().splitlines()
+
+
+def outcome(result: api.RunResult) -> tuple:
+    return result.exit_code, result.output
+
+
+class ExecutionModeTest(unittest.TestCase):
+    def test_modes_agree_with_plain_execution(self):
+        for path in PROGRAMS:
+            input_lines = read_input(path)
+            expected = outcome(api.load_file(path, fusion=False).run(input_lines))
+            for mode, options in MODES.items():
+                with self.subTest(path=os.path.basename(path), mode=mode):
+                    self.assertEqual(outcome(api.load_file(path, **options).run(input_lines)), expected)
+
+    def test_modes_agree_on_mixed_program(self):
+        for n in ('1', '7', '500'):
+            expected = outcome(api.load(MIXED_PROGRAM, fusion=False).run([n]))
+            self.assertEqual(expected[0], 25)
+            for mode, options in MODES.items():
+                with self.subTest(n=n, mode=mode):
+                    self.assertEqual(outcome(api.load(MIXED_PROGRAM, **options).run([n])), expected)
+
+
+class FailingInstructionTest(unittest.TestCase):
+    def test_no_code_after_the_raise(self):
+        for instruction in FAILING_INSTRUCTIONS:
+            source = (f'<program>{instruction}<tac opcode="PRINTLN" order="3"><src1 type="string">after</src1></tac>'
+                      '<tac opcode="LABEL" order="4"><dst type="label">@end</dst></tac></program>')
+            with self.subTest(instruction=instruction):
+                expected = outcome(api.load(source, fusion=False).run(['1']))
+                self.assertNotEqual(expected[0], 0)
+                self.assertEqual(outcome(api.load(source, compiled=True).run(['1'])), expected)
+                block = compile_program(decode_program(ET.fromstring(source))).source.split('def block_1')[0]
+                self.assertTrue(block.rstrip().splitlines()[-1].strip().startswith('raise '), block)
+                self.assertNotIn('[ErrorCodes', block)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import xml.etree.ElementTree as ET
+from exception_handler import ExceptionHandler, ErrorCodes
+
+# Bumped whenever decoding changes, so programs cached by an older version are decoded again
+DECODER_VERSION = 1
+
+# Opcode ids, the position in OPCODES is the id used by the dispatch tables
+OPCODES = (
+    "MOV", "ADD", "SUB", "MUL", "DIV", "READINT", "READSTR", "PRINT", "PRINTLN",
+    "LABEL", "JUMP", "JUMPIFEQ", "JUMPIFLT", "CALL", "RETURN", "PUSH", "POP",
+    "CONCAT", "GETAT", "LEN", "STRINT", "INTSTR", "INVALID", "FUSED", "INCREMENT_BRANCH",
+    "TYPED_ADD", "TYPED_SUB", "TYPED_MUL", "TYPED_DIV", "TYPED_MOV", "TYPED_JUMPIFEQ", "TYPED_JUMPIFLT",
+    "TYPED_CONCAT", "TYPED_GETAT", "TYPED_LEN"
+)
+(OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_READINT, OP_READSTR, OP_PRINT, OP_PRINTLN,
+ OP_LABEL, OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP,
+ OP_CONCAT, OP_GETAT, OP_LEN, OP_STRINT, OP_INTSTR, OP_INVALID, OP_FUSED, OP_INCREMENT_BRANCH,
+ OP_TYPED_ADD, OP_TYPED_SUB, OP_TYPED_MUL, OP_TYPED_DIV, OP_TYPED_MOV, OP_TYPED_JUMPIFEQ, OP_TYPED_JUMPIFLT,
+ OP_TYPED_CONCAT, OP_TYPED_GETAT, OP_TYPED_LEN) = range(len(OPCODES))
+# Opcodes from INVALID on are internal to the interpreter and never decoded from a program
+OPCODE_IDS = {name: i for i, name in enumerate(OPCODES[:OP_INVALID])}
+
+# Operand kinds, an operand is a (kind, value) tuple
+OPERAND_INTEGER = 0
+OPERAND_STRING = 1
+OPERAND_VARIABLE = 2  # value is the slot index of the variable
+OPERAND_LABEL = 3
+OPERAND_INVALID = 4  # value is the ErrorCodes raised when the operand is read
+
+# Operands each opcode needs, a missing one is an internal error when executed
+REQUIRED_OPERANDS = {
+    OP_MOV: ('dst', 'src1'),
+    OP_ADD: ('dst', 'src1', 'src2'),
+    OP_SUB: ('dst', 'src1', 'src2'),
+    OP_MUL: ('dst', 'src1', 'src2'),
+    OP_DIV: ('dst', 'src1', 'src2'),
+    OP_READINT: ('dst',),
+    OP_READSTR: ('dst',),
+    OP_PRINT: ('src1',),
+    OP_PRINTLN: ('src1',),
+    OP_LABEL: (),
+    OP_JUMP: ('dst',),
+    OP_JUMPIFEQ: ('dst', 'src1', 'src2'),
+    OP_JUMPIFLT: ('dst', 'src1', 'src2'),
+    OP_CALL: ('dst',),
+    OP_RETURN: (),
+    OP_PUSH: ('src1',),
+    OP_POP: ('dst',),
+    OP_CONCAT: ('dst', 'src1', 'src2'),
+    OP_GETAT: ('dst', 'src1', 'src2'),
+    OP_LEN: ('dst', 'src1'),
+    OP_STRINT: ('dst', 'src1'),
+    OP_INTSTR: ('dst', 'src1'),
+}
+JUMP_OPCODES = (OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL)
+LABEL_OPCODES = (OP_LABEL,) + JUMP_OPCODES
+
+
+class Instruction:
+    __slots__ = ('opcode', 'order', 'dst', 'src1', 'src2', 'target', 'fault', 'source_opcode', 'fused')
+
+    def __init__(self, opcode: int, order, dst=None, src1=None, src2=None) -> None:
+        self.opcode = opcode
+        self.order = order
+        self.dst = dst
+        self.src1 = src1
+        self.src2 = src2
+        self.target: int | None = None  # Index of the LABEL a jump/call lands on
+        self.fault: ErrorCodes | None = None  # Error raised by an INVALID instruction
+        self.source_opcode: str | None = None  # Opcode an INVALID instruction was decoded from
+        self.fused: tuple | None = None  # Instructions executed by a superinstruction
+
+
+class Program:
+    __slots__ = ('name', 'instructions', 'labels', 'variables')
+
+    def __init__(self, name, instructions: list, labels: dict, variables: list) -> None:
+        self.name = name
+        self.instructions = instructions
+        self.labels = labels
+        self.variables = variables  # Variable names indexed by slot
+
+
+class SlotAllocator:
+    def __init__(self) -> None:
+        self.slots: dict = {}
+
+    def resolve(self, name) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.slots)
+        return slot
+
+    def names(self) -> list:
+        return list(self.slots)
+
+
+def load_program(program_file) -> Program:
+    try:
+        root = ET.parse(program_file).getroot()
+    except Exception as exc:
+        raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from exc
+    return decode_program(root)
+
+
+def decode_program(root: ET.Element) -> Program:
+    slots = SlotAllocator()
+    instructions = [decode_instruction(command, slots) for command in root]
+    labels = read_labels(root)
+    for instruction in instructions:
+        if instruction.opcode in JUMP_OPCODES:
+            target = labels.get(instruction.dst[1])
+            if target is None:
+                make_invalid(instruction, ErrorCodes.JUMP_CALL_ERROR)
+            else:
+                instruction.target = target
+    return Program(root.get('name'), instructions, labels, slots.names())
+
+
+def read_labels(root: ET.Element) -> dict:
+    labels: dict = {}
+    for i, command in enumerate(root):
+        if command.get('opcode') == 'LABEL':
+            dst_element = command.find('dst')
+            if dst_element is None:
+                raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+            label_name = dst_element.text
+            if label_name in labels:
+                raise ExceptionHandler(ErrorCodes.SEMANTIC_ERROR)
+            labels[label_name] = i  # Store the index of the label
+    return labels
+
+
+def decode_instruction(command: ET.Element, slots: SlotAllocator) -> Instruction:
+    order = command.get('order')
+    opcode = command.get('opcode')
+    opcode_id = OPCODE_IDS.get(opcode.upper()) if opcode is not None else None
+    operands = {}
+    for element in command:
+        if element.tag in ('dst', 'src1', 'src2') and element.tag not in operands:
+            operands[element.tag] = element
+    if opcode_id is None:
+        instruction = Instruction(
+            OP_INVALID, order,
+            decode_destination(operands.get('dst'), OP_INVALID, slots),
+            decode_operand(operands.get('src1'), slots),
+            decode_operand(operands.get('src2'), slots))
+        instruction.source_opcode = opcode
+        return make_invalid(instruction, ErrorCodes.INTERNAL_ERROR)
+
+    instruction = Instruction(
+        opcode_id, order,
+        decode_destination(operands.get('dst'), opcode_id, slots),
+        decode_operand(operands.get('src1'), slots),
+        decode_operand(operands.get('src2'), slots))
+    for name in REQUIRED_OPERANDS[opcode_id]:
+        if name not in operands:
+            return make_invalid(instruction, ErrorCodes.INTERNAL_ERROR)
+    return instruction
+
+
+def make_invalid(instruction: Instruction, fault: ErrorCodes) -> Instruction:
+    if instruction.opcode != OP_INVALID:
+        instruction.source_opcode = OPCODES[instruction.opcode]
+    instruction.opcode = OP_INVALID
+    instruction.fault = fault
+    return instruction
+
+
+def decode_destination(element: ET.Element | None, opcode_id: int, slots: SlotAllocator):
+    if element is None:
+        return None
+    if opcode_id in LABEL_OPCODES or (opcode_id == OP_INVALID and element.get('type') == 'label'):
+        return (OPERAND_LABEL, element.text)
+    return (OPERAND_VARIABLE, slots.resolve(element.text))
+
+
+def decode_operand(element: ET.Element | None, slots: SlotAllocator):
+    if element is None:
+        return None
+    operand_type = element.get('type')
+    text = element.text
+    if operand_type == 'variable':
+        return (OPERAND_VARIABLE, slots.resolve(text))
+    if operand_type == 'string':
+        # An empty string literal is serialized as an empty element
+        return (OPERAND_STRING, text if text is not None else '')
+    if operand_type == 'integer':
+        # A malformed literal fails whenever the instruction reads it, a MOV or PUSH of it included, not
+        # only once the variable it was copied to is used (tests/ex23, tests/ex24)
+        if text is None:
+            return (OPERAND_INVALID, ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
+        try:
+            return (OPERAND_INTEGER, int(text))
+        except ValueError:
+            return (OPERAND_INVALID, ErrorCodes.INTERNAL_ERROR)
+    if operand_type is None:
+        return (OPERAND_INVALID, ErrorCodes.INTERNAL_ERROR)
+    return (OPERAND_INVALID, ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
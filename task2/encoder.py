@@ -0,0 +1,75 @@
+import xml.etree.ElementTree as ET
+from exception_handler import ErrorCodes
+from decoder import (Program, OPCODES, OP_INVALID, OPERAND_INTEGER, OPERAND_STRING, OPERAND_VARIABLE,
+                     OPERAND_LABEL, OPERAND_INVALID)
+
+# Same header as the XML written by task1, so converted programs conform to the same DTD
+HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+DTD = '''<!DOCTYPE program [ 
+  <!ELEMENT program (tac+)>
+  <!ELEMENT tac (dst?,src1?,src2?)>
+  <!ELEMENT dst (#PCDATA)>
+  <!ELEMENT src1 (#PCDATA)>
+  <!ELEMENT src2 (#PCDATA)>
+  <!ATTLIST program name CDATA #IMPLIED>
+  <!ATTLIST tac opcode CDATA #REQUIRED>
+  <!ATTLIST tac order CDATA #REQUIRED>  
+  <!ATTLIST dst type (integer|string|variable|label) #REQUIRED>
+  <!ATTLIST src1 type (integer|string|variable) #REQUIRED>
+  <!ATTLIST src2 type (integer|string|variable) #REQUIRED>
+  <!ENTITY language "IPPeCode">
+  <!ENTITY eol "&#xA;">
+  <!ENTITY lt "&lt;">
+  <!ENTITY gt "&gt;">
+]>'''
+
+
+def encode_program(program: Program) -> ET.Element:
+    root = ET.Element('program')
+    if program.name is not None:
+        root.set('name', program.name)
+    for position, instruction in enumerate(program.instructions, start=1):
+        if instruction.opcode == OP_INVALID:
+            opcode = instruction.source_opcode if instruction.source_opcode is not None else 'INVALID'
+        else:
+            opcode = OPCODES[instruction.opcode]
+        # The order of the source is kept, only an instruction without one is numbered by its position
+        order = instruction.order if instruction.order is not None else position
+        tac = ET.SubElement(root, 'tac', {'opcode': opcode, 'order': str(order)})
+        for tag in ('dst', 'src1', 'src2'):
+            operand = getattr(instruction, tag)
+            if operand is not None:
+                encode_operand(ET.SubElement(tac, tag), operand, program.variables)
+    return root
+
+
+def encode_operand(element: ET.Element, operand: tuple, variables: list) -> None:
+    kind, value = operand
+    if kind == OPERAND_VARIABLE:
+        element.set('type', 'variable')
+        element.text = variables[value]
+    elif kind == OPERAND_LABEL:
+        element.set('type', 'label')
+        element.text = value
+    elif kind == OPERAND_INTEGER:
+        element.set('type', 'integer')
+        element.text = str(value)
+    elif kind == OPERAND_STRING:
+        element.set('type', 'string')
+        element.text = value
+    elif kind == OPERAND_INVALID:
+        # Written so that decoding it again raises the same error when the operand is read
+        element.set('type', 'integer')
+        if value != ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR:
+            element.text = 'invalid'
+
+
+def program_to_xml(program: Program) -> str:
+    root = encode_program(program)
+    ET.indent(root)
+    return HEADER + DTD + '\n' + ET.tostring(root, encoding='unicode') + '\n'
+
+
+def write_program(program: Program, path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(program_to_xml(program))
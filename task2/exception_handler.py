@@ -1,5 +1,4 @@
 from enum import Enum
-import sys
 
 
 class ErrorCodes(Enum):
@@ -12,6 +11,8 @@ class ErrorCodes(Enum):
     INCOMPATIBLE_OPERANDS_ERROR = 27
     POP_ERROR = 28
     RUNTIME_ERROR = 30
+    STEP_LIMIT_ERROR = 31
+    TIME_LIMIT_ERROR = 32
     INTERNAL_ERROR = 99
 
 
@@ -36,7 +37,11 @@ class ExceptionHandler(Exception):
             self.error_message = "Run-time Error: Pop from the empty (data/call) stack is forbidden."
         elif error_code == ErrorCodes.RUNTIME_ERROR:
             self.error_message = "Other run-time errors."
+        elif error_code == ErrorCodes.STEP_LIMIT_ERROR:
+            self.error_message = "Execution stopped: the instruction budget is exhausted."
+        elif error_code == ErrorCodes.TIME_LIMIT_ERROR:
+            self.error_message = "Execution stopped: the time limit is exceeded."
         elif error_code == ErrorCodes.INTERNAL_ERROR:
             self.error_message = "Internal errors."
-
-        sys.stderr.write(self.error_message + "\n")
+        # Whoever handles the error reports the message, e.g. taci.py writes it to stderr
+        super().__init__(self.error_message)
@@ -0,0 +1,45 @@
+from decoder import (Instruction, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_PRINT, OP_PRINTLN, OP_LABEL,
+                     OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP, OP_FUSED,
+                     OP_INCREMENT_BRANCH, OPERAND_INTEGER, OPERAND_VARIABLE)
+
+# Pairs of opcodes executed by one superinstruction
+FUSED_PAIRS = {
+    (OP_ADD, OP_JUMPIFLT), (OP_ADD, OP_JUMPIFEQ), (OP_SUB, OP_JUMPIFLT), (OP_SUB, OP_JUMPIFEQ),
+    (OP_MUL, OP_JUMPIFLT), (OP_MUL, OP_JUMPIFEQ), (OP_DIV, OP_JUMPIFLT), (OP_DIV, OP_JUMPIFEQ),
+    (OP_MOV, OP_PRINT), (OP_MOV, OP_PRINTLN), (OP_MOV, OP_MOV), (OP_ADD, OP_MOV),
+    (OP_PUSH, OP_CALL), (OP_PUSH, OP_RETURN), (OP_POP, OP_POP), (OP_PUSH, OP_PUSH),
+}
+
+
+# Returns the instructions for the dispatch loop with recognised pairs fused. The superinstruction takes the
+# place of the first instruction and skips the second one, which stays in place so indices do not change.
+def fuse_instructions(instructions: list) -> list:
+    fused = list(instructions)
+    i = 0
+    while i + 1 < len(instructions):
+        first = instructions[i]
+        second = instructions[i + 1]
+        # After a LABEL or a CALL the second instruction is also entered by a jump or a return
+        if first.opcode in (OP_LABEL, OP_CALL) or (first.opcode, second.opcode) not in FUSED_PAIRS:
+            i += 1
+            continue
+        fused[i] = fuse(first, second)
+        i += 2
+    return fused
+
+
+def fuse(first: Instruction, second: Instruction) -> Instruction:
+    if is_increment(first) and second.opcode in (OP_JUMPIFEQ, OP_JUMPIFLT):
+        instruction = Instruction(OP_INCREMENT_BRANCH, first.order)
+        # ADD/SUB of an integer literal to the variable itself, followed by the conditional jump
+        step = first.src2[1] if first.opcode == OP_ADD else -first.src2[1]
+        instruction.fused = (first, second, first.dst[1], step)
+    else:
+        instruction = Instruction(OP_FUSED, first.order)
+        instruction.fused = (first, second)
+    return instruction
+
+
+def is_increment(instruction: Instruction) -> bool:
+    return instruction.opcode in (OP_ADD, OP_SUB) and instruction.src1 == (OPERAND_VARIABLE, instruction.dst[1]) \
+        and instruction.src2[0] == OPERAND_INTEGER
@@ -0,0 +1,56 @@
+import sys
+from exception_handler import ErrorCodes
+
+
+# Hands out READINT/READSTR input one line at a time, consuming the source only as far as the program reads
+class InputReader:
+    def __init__(self, lines, strip: bool = False, eof_error: ErrorCodes | None = ErrorCodes.INTERNAL_ERROR,
+                 interactive: bool = False, source=None) -> None:
+        self.lines = iter(lines)
+        self.strip = strip
+        # Error of a read past the end of input, None lets READINT/READSTR report their own error
+        self.eof_error = eof_error
+        self.interactive = interactive
+        self.source = source
+        self.position: int = 0
+
+    def read_line(self) -> str | None:
+        line = next(self.lines, None)
+        if line is None:
+            return None
+        self.position += 1
+        return line.strip() if self.strip else line
+
+    def skip(self, count: int) -> bool:
+        # Reads past the first count lines, e.g. the ones a resumed run read before, False if there are fewer
+        while self.position < count:
+            if next(self.lines, None) is None:
+                return False
+            self.position += 1
+        return True
+
+    def close(self) -> None:
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+def stdin_lines():
+    while True:
+        try:
+            yield input()
+        except EOFError:
+            return
+
+
+def open_input(input_file) -> InputReader:
+    if isinstance(input_file, InputReader):
+        return input_file
+    if input_file is False or input_file is None or input_file == sys.stdin:
+        # Lines typed on stdin are stripped, an exhausted stdin is a READINT/READSTR error
+        return InputReader(stdin_lines(), strip=True, eof_error=None, interactive=True)
+    if isinstance(input_file, str):
+        # Lines read from a file keep their line ending, like the lines returned by readlines()
+        source = open(input_file, 'r', encoding='utf-8')
+        return InputReader(source, source=source)
+    return InputReader(input_file)
@@ -1,157 +1,306 @@
-import sys
-import xml.etree.ElementTree as ET
 from exception_handler import ExceptionHandler, ErrorCodes
-from variable import Variable
+from variable import Variable, TYPE_INTEGER, TYPE_STRING
+from input_reader import open_input
+from compiler import CompiledProgram, compile_program, run_compiled
+from fusion import fuse_instructions
+from type_analysis import TypeAnalysis, analyze_types, specialize_instructions
+from optimizer import optimize_program, OptimizationReport
+from output_writer import OutputWriter, DEFAULT_BUFFER_SIZE
+from binary_format import is_binary_program, load_binary_program
+from program_cache import ProgramCache
+from profiler import Profiler
+from limits import ExecutionLimits, step_costs
+from snapshot import Snapshot, program_digest
+from string_builder import STRING_TYPES, concat, plain_value
+from decoder import (Program, Instruction, load_program, OPCODES, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV,
+                     OP_READINT, OP_READSTR, OP_PRINT, OP_PRINTLN, OP_LABEL, OP_JUMP, OP_JUMPIFEQ,
+                     OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP, OP_CONCAT, OP_GETAT, OP_LEN,
+                     OP_STRINT, OP_INTSTR, OP_INVALID, OP_FUSED, OP_INCREMENT_BRANCH, OP_TYPED_ADD,
+                     OP_TYPED_SUB, OP_TYPED_MUL, OP_TYPED_DIV, OP_TYPED_MOV, OP_TYPED_JUMPIFEQ,
+                     OP_TYPED_JUMPIFLT, OP_TYPED_CONCAT, OP_TYPED_GETAT, OP_TYPED_LEN,
+                     OPERAND_INTEGER, OPERAND_VARIABLE, OPERAND_INVALID)
 
 
 class Interpreter:
-    def __init__(self, program_file, input_file, output_file) -> None:
+    def __init__(self, program_file, input_file, output_file,
+                 output_buffer_size: int = DEFAULT_BUFFER_SIZE, compiled: bool = False,
+                 optimize: bool = False, fusion: bool = True, cache: ProgramCache | None = None,
+                 profiler: Profiler | None = None, limits: ExecutionLimits | None = None,
+                 resume: Snapshot | None = None, check: bool = False) -> None:
         self.pc: int = 0
-        self.variables: dict = {}
+        # Variables live in preallocated slots, types[slot] is None until the variable is assigned
+        self.variable_names: list = []
+        self.values: list = []
+        self.types: list = []
         self.labels: dict = {}
         self.data_stack: list = []
         self.call_stack: list = []
         self.program_file = program_file
         self.input_file = input_file
         self.output_file = output_file
-        self.input_file_index = 0
+        self.input = open_input(input_file)
+        self.output = OutputWriter(output_file, output_buffer_size)
+        self.compiled = compiled  # Run the program translated to Python code instead of the dispatch loop
+        self.optimize = optimize
+        self.fusion = fusion  # Execute common instruction pairs as one superinstruction
+        self.optimization_report: OptimizationReport | None = None
+        self.cache = cache  # Decoded programs reused across runs
+        self.profiler = profiler  # Records where the time goes, runs every instruction on its own
+        self.limits = limits  # Instruction budget and time limit, checked between instructions
+        self.resume = resume  # Snapshot of a stopped run to continue from
+        self.program = None
+        self.previous_steps: int = 0  # Instructions executed by the runs before the resumed snapshot
+        self.check = check  # Do not run a program with instructions that fail whenever they are executed
+        self.type_analysis: TypeAnalysis | None = None
         self.opcode_handler = {
-            "MOV": self.handle_mov_op,
-            "ADD": self.handle_add_op,
-            "SUB": self.handle_sub_op,
-            "MUL": self.handle_mul_op,
-            "DIV": self.handle_div_op,
-            "READINT": self.handle_readint_op,
-            "READSTR": self.handle_readstr_op,
-            "PRINT": self.handle_print_op,
-            "PRINTLN": self.handle_println_op,
-            "LABEL": self.handle_label_op,
-            "JUMP": self.handle_jump_op,
-            "JUMPIFEQ": self.handle_jumpifeq_op,
-            "JUMPIFLT": self.handle_jumpiflt_op,
-            "CALL": self.handle_call_op,
-            "RETURN": self.handle_return_op,
-            "PUSH": self.handle_push_op,
-            "POP": self.handle_pop_op,
-            "CONCAT": self.handle_concat_op,
-            "GETAT": self.handle_getat_op,
-            "LEN": self.handle_len_op,
-            "STRINT": self.handle_strint_op,
-            "INTSTR": self.handle_intstr_op
+            OP_MOV: self.handle_mov_op,
+            OP_ADD: self.handle_add_op,
+            OP_SUB: self.handle_sub_op,
+            OP_MUL: self.handle_mul_op,
+            OP_DIV: self.handle_div_op,
+            OP_READINT: self.handle_readint_op,
+            OP_READSTR: self.handle_readstr_op,
+            OP_PRINT: self.handle_print_op,
+            OP_PRINTLN: self.handle_println_op,
+            OP_LABEL: self.handle_label_op,
+            OP_JUMP: self.handle_jump_op,
+            OP_JUMPIFEQ: self.handle_jumpifeq_op,
+            OP_JUMPIFLT: self.handle_jumpiflt_op,
+            OP_CALL: self.handle_call_op,
+            OP_RETURN: self.handle_return_op,
+            OP_PUSH: self.handle_push_op,
+            OP_POP: self.handle_pop_op,
+            OP_CONCAT: self.handle_concat_op,
+            OP_GETAT: self.handle_getat_op,
+            OP_LEN: self.handle_len_op,
+            OP_STRINT: self.handle_strint_op,
+            OP_INTSTR: self.handle_intstr_op,
+            OP_INVALID: self.handle_invalid_op,
+            OP_FUSED: self.handle_fused_op,
+            OP_INCREMENT_BRANCH: self.handle_increment_branch_op,
+            OP_TYPED_ADD: self.handle_typed_add_op,
+            OP_TYPED_SUB: self.handle_typed_sub_op,
+            OP_TYPED_MUL: self.handle_typed_mul_op,
+            OP_TYPED_DIV: self.handle_typed_div_op,
+            OP_TYPED_MOV: self.handle_typed_mov_op,
+            OP_TYPED_JUMPIFEQ: self.handle_typed_jumpifeq_op,
+            OP_TYPED_JUMPIFLT: self.handle_typed_jumpiflt_op,
+            OP_TYPED_CONCAT: self.handle_typed_concat_op,
+            OP_TYPED_GETAT: self.handle_typed_getat_op,
+            OP_TYPED_LEN: self.handle_typed_len_op
         }
+        # Handlers indexed by opcode id, used by the dispatch loop
+        self.dispatch = [self.opcode_handler[i] for i in range(len(OPCODES))]
 
     def start(self) -> None:
         try:
-            program = ET.parse(self.program_file).getroot()
-        except Exception as exc:
-            raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from exc
-        program_len = len(program)
-        self.read_labels(program)
+            program = self.load_program()
+            if self.optimize:
+                self.optimization_report = optimize_program(program)
+            analysis = self.type_analysis = analyze_types(program)
+            if self.check and analysis.errors:
+                raise ExceptionHandler(analysis.errors[0].error_code)
+            if self.profiler is not None:
+                self.execute(program, program.instructions, None)
+            elif self.compiled:
+                self.execute(program, program.instructions, compile_program(program, analysis))
+            elif self.fusion:
+                self.execute(program, specialize_instructions(fuse_instructions(program.instructions), analysis), None)
+            else:
+                self.execute(program, specialize_instructions(program.instructions, analysis), None)
+        finally:
+            # Whatever was printed before an error still reaches the output
+            self.input.close()
+            self.output.close()
+
+    def execute(self, program: Program, instructions: list, compiled: CompiledProgram | None) -> None:
+        # Runs a decoded program, which is not modified, so it can be executed by many interpreters at once.
+        # instructions are the ones of the dispatch loop, fused or not, compiled is set to run compiled.
+        self.prepare(program)
+        if self.profiler is not None:
+            self.profiler.run(self, program.instructions)
+        elif compiled is not None:
+            run_compiled(self, compiled)
+        else:
+            self.run(instructions)
+
+    def prepare(self, program: Program) -> None:
+        # State of a run of the program before its first instruction, or of the resumed snapshot
+        self.program = program
+        self.labels = program.labels
+        self.allocate_slots(program.variables)
+        if self.resume is not None:
+            self.restore(self.resume)
+        if self.limits is not None:
+            self.limits.start()
+
+    def load_program(self):
+        if is_binary_program(self.program_file):
+            return load_binary_program(self.program_file)
+        if self.cache is not None and isinstance(self.program_file, str):
+            return self.cache.load(self.program_file, load_program)
+        return load_program(self.program_file)
+
+    def allocate_slots(self, variable_names: list) -> None:
+        self.variable_names = variable_names
+        self.values = [None] * len(variable_names)
+        self.types = [None] * len(variable_names)
+
+    @property
+    def variables(self) -> dict:
+        # Name keyed view of the defined variables, for inspection only
+        return {name: Variable(self.types[slot], plain_value(self.values[slot]))
+                for slot, name in enumerate(self.variable_names) if self.types[slot] is not None}
+
+    def snapshot(self) -> Snapshot:
+        # State after a run stopped by its limits, pc is the next instruction to execute
+        variables = {name: (self.types[slot], plain_value(self.values[slot]))
+                     for slot, name in enumerate(self.variable_names) if self.types[slot] is not None}
+        steps = self.previous_steps + (self.limits.steps if self.limits is not None else 0)
+        data_stack = [plain_value(value) for value in self.data_stack]
+        return Snapshot(program_digest(self.program.instructions), self.pc, variables, data_stack,
+                        list(self.call_stack), self.input.position, self.output.offset, steps)
+
+    def restore(self, snapshot: Snapshot) -> None:
+        instructions = self.program.instructions
+        if snapshot.program != program_digest(instructions) or not 0 <= snapshot.pc <= len(instructions) \
+                or any(not 0 <= index < len(instructions) for index in snapshot.call_stack):
+            # Taken from another program, or the same one decoded or optimized differently
+            raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+        slots = {name: slot for slot, name in enumerate(self.variable_names)}
+        for name, (value_type, value) in snapshot.variables.items():
+            if name not in slots:
+                raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+            self.values[slots[name]] = value
+            self.types[slots[name]] = value_type
+        self.pc = snapshot.pc
+        self.data_stack = list(snapshot.data_stack)
+        self.call_stack = list(snapshot.call_stack)
+        if not self.input.skip(snapshot.input_position):
+            raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+        self.output.flushed = snapshot.output_offset
+        self.previous_steps = snapshot.steps
+
+    def run(self, instructions: list) -> None:
+        if self.limits is not None:
+            self.run_limited(instructions)
+            return
+        dispatch = self.dispatch
+        program_len = len(instructions)
         while self.pc < program_len:
-            command = program[self.pc]
-            opcode = command.get('opcode')
-            if opcode is None:
-                raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-            self.opcode_handler[opcode.upper()](command)
+            instruction = instructions[self.pc]
+            dispatch[instruction.opcode](instruction)
             self.pc += 1
 
-    def read_labels(self, program: ET.Element) -> None:
-        for i, command in enumerate(program):
-            opcode = command.get('opcode')
-            if opcode == 'LABEL':
-                dst_element = command.find('dst')
-                if dst_element is not None:
-                    label_name = dst_element.text
-                else:
-                    raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-                if label_name in self.labels:
-                    raise ExceptionHandler(ErrorCodes.SEMANTIC_ERROR)
-                self.labels[label_name] = i  # Store the index of the label
-
-    def handle_mov_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src_element = command.find('src1')
-        if dst_element is None or src_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if src_element.attrib['type'] == 'integer' or src_element.attrib['type'] == 'string':
-            self.variables[dst_element.text] = Variable(
-                src_element.attrib['type'], src_element.text)
-        elif src_element.attrib['type'] == 'variable':
-            if src_element.text not in self.variables:
+    def run_limited(self, instructions: list) -> None:
+        # The dispatch loop counting steps, stops before the instruction that would exceed a limit
+        limits = self.limits
+        dispatch = self.dispatch
+        costs = step_costs(instructions)
+        program_len = len(instructions)
+        while self.pc < program_len:
+            instruction = instructions[self.pc]
+            cost = costs[self.pc]
+            if limits.steps + cost > limits.checkpoint and not limits.renew(cost):
+                instruction = limits.split(instruction)
+                cost = 1
+            limits.steps += cost
+            dispatch[instruction.opcode](instruction)
+            self.pc += 1
+
+    def step(self, instruction: Instruction) -> None:
+        # Executes the instruction at pc on its own, within the limits if there are any
+        limits = self.limits
+        if limits is not None and instruction.opcode != OP_LABEL:
+            if limits.steps + 1 > limits.checkpoint and not limits.renew(1):
+                raise limits.exceeded()
+            limits.steps += 1
+        self.dispatch[instruction.opcode](instruction)
+        self.pc += 1
+
+    def handle_invalid_op(self, instruction: Instruction) -> None:
+        # Unknown opcodes, missing operands and jumps to non-existing labels are found by the decoder
+        raise ExceptionHandler(instruction.fault)
+
+    def handle_fused_op(self, instruction: Instruction) -> None:
+        first, second = instruction.fused[0], instruction.fused[1]
+        self.dispatch[first.opcode](first)
+        # The second instruction runs at its own index, e.g. a CALL has to return after itself
+        self.pc += 1
+        self.dispatch[second.opcode](second)
+
+    def handle_increment_branch_op(self, instruction: Instruction) -> None:
+        first, second, slot, step = instruction.fused
+        value = self.values[slot]
+        if type(value) is not int:
+            # Unassigned or a string, the plain handlers report the error
+            self.handle_fused_op(instruction)
+            return
+        self.values[slot] = value + step
+        self.pc += 1
+        self.dispatch[second.opcode](second)
+
+    def handle_mov_op(self, instruction: Instruction) -> None:
+        kind, value = instruction.src1
+        dst = instruction.dst[1]
+        if kind == OPERAND_VARIABLE:
+            if self.types[value] is None:
                 raise ExceptionHandler(ErrorCodes.READ_ACCESS_ERROR)
             # Copy the value of the src variable to the dst variable
-            self.variables[dst_element.text] = Variable(
-                self.variables[src_element.text].var_type, self.variables[src_element.text].value)
+            self.values[dst] = self.values[value]
+            self.types[dst] = self.types[value]
+        elif kind == OPERAND_INVALID:
+            raise ExceptionHandler(value)
         else:
-            raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
-
-    def handle_add_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+            self.values[dst] = value
+            self.types[dst] = TYPE_INTEGER if kind == OPERAND_INTEGER else TYPE_STRING
 
+    def handle_add_op(self, instruction: Instruction) -> None:
         # Get the values of src1 and src2
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are integers
         if not isinstance(src1_value, int) or not isinstance(src2_value, int):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
 
         # Perform the addition and store the result in the dst variable
-        self.variables[dst_element.text] = Variable(
-            'integer', int(src1_value) + int(src2_value))
-
-    def handle_sub_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+        dst = instruction.dst[1]
+        self.values[dst] = src1_value + src2_value
+        self.types[dst] = TYPE_INTEGER
 
+    def handle_sub_op(self, instruction: Instruction) -> None:
         # Get the values of src1 and src2
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are integers
         if not isinstance(src1_value, int) or not isinstance(src2_value, int):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
 
         # Perform the subtraction and store the result in the dst variable
-        self.variables[dst_element.text] = Variable(
-            'integer', int(src1_value) - int(src2_value))
-
-    def handle_mul_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+        dst = instruction.dst[1]
+        self.values[dst] = src1_value - src2_value
+        self.types[dst] = TYPE_INTEGER
 
+    def handle_mul_op(self, instruction: Instruction) -> None:
         # Get the values of src1 and src2
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are integers
         if not isinstance(src1_value, int) or not isinstance(src2_value, int):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
 
         # Perform the multiplication and store the result in the dst variable
-        self.variables[dst_element.text] = Variable(
-            'integer', int(src1_value) * int(src2_value))
-
-    def handle_div_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+        dst = instruction.dst[1]
+        self.values[dst] = src1_value * src2_value
+        self.types[dst] = TYPE_INTEGER
 
+    def handle_div_op(self, instruction: Instruction) -> None:
         # Get the values of src1 and src2
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are integers
         if not isinstance(src1_value, int) or not isinstance(src2_value, int):
@@ -162,240 +311,272 @@ class Interpreter:
             raise ExceptionHandler(ErrorCodes.DIVISION_BY_ZERO)
 
         # Perform the division and store the result in the dst variable. Use floor division '//'
-        self.variables[dst_element.text] = Variable(
-            'integer', int(src1_value) // int(src2_value))
-
-    def handle_readint_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        if dst_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+        dst = instruction.dst[1]
+        self.values[dst] = src1_value // src2_value
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_readint_op(self, instruction: Instruction) -> None:
+        # Read an integer from the input file or stdin
+        line = self.read_input_line()
+        if line is None:
+            raise ExceptionHandler(self.input.eof_error or ErrorCodes.READINT_ERROR)
         try:
-            # Read an integer from the input file or stdin
-            if self.input_file is False:
-                value = int(input().strip())
-            elif self.input_file is not False and self.input_file is not None and len(self.input_file) > 0 and \
-                    self.input_file_index < len(self.input_file):
-                value = int(self.input_file[self.input_file_index])
-                self.input_file_index += 1
-        except Exception as exc:
+            value = int(line)
+        except ValueError as exc:
             raise ExceptionHandler(ErrorCodes.READINT_ERROR) from exc
         # Store the value in the dst variable
-        self.variables[dst_element.text] = Variable('integer', value)
-
-    def handle_readstr_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        if dst_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        try:
-            # Read a string from the input file or stdin
-            if self.input_file is not False and self.input_file is not None:
-                if len(self.input_file) > 0 and \
-                        self.input_file_index < len(self.input_file):
-                    value = self.input_file[self.input_file_index]
-                    self.input_file_index += 1
-            else:
-                value = input().strip()
-        except Exception as exc:
-            raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR) from exc
+        dst = instruction.dst[1]
+        self.values[dst] = value
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_readstr_op(self, instruction: Instruction) -> None:
+        # Read a string from the input file or stdin
+        value = self.read_input_line()
+        if value is None:
+            raise ExceptionHandler(self.input.eof_error or ErrorCodes.RUNTIME_ERROR)
         # Store the value in the dst variable
-        self.variables[dst_element.text] = Variable('string', value)
-
-    def handle_print_op(self, command: ET.Element) -> None:
-        src_element = command.find('src1')
-        if src_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        value = self.get_value(src_element)
-        if self.output_file == sys.stdout:
-            print(value, end='')
-        else:
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                f.write(str(value))
-
-    def handle_println_op(self, command: ET.Element) -> None:
-        src_element = command.find('src1')
-        if src_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        value = self.get_value(src_element)
-        if self.output_file == sys.stdout:
-            print(value)
-        else:
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                f.write(str(value) + '\n')
+        dst = instruction.dst[1]
+        self.values[dst] = value
+        self.types[dst] = TYPE_STRING
+
+    def handle_print_op(self, instruction: Instruction) -> None:
+        self.output.write(str(self.get_value(instruction.src1)))
 
-    def handle_label_op(self, command) -> None:
+    def handle_println_op(self, instruction: Instruction) -> None:
+        self.output.write(str(self.get_value(instruction.src1)) + '\n')
+
+    def handle_label_op(self, instruction: Instruction) -> None:
         pass
 
-    def handle_jump_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        if dst_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if dst_element.text not in self.labels:
-            raise ExceptionHandler(ErrorCodes.JUMP_CALL_ERROR)
-        self.pc = self.labels[dst_element.text]
-
-    def handle_jumpifeq_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if dst_element.text not in self.labels:
-            raise ExceptionHandler(ErrorCodes.JUMP_CALL_ERROR)
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+    def handle_jump_op(self, instruction: Instruction) -> None:
+        self.pc = instruction.target
+
+    def handle_jumpifeq_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are either integers or strings
         if isinstance(src1_value, int) and isinstance(src2_value, int):
-            if int(src1_value) == int(src2_value):
-                self.pc = self.labels[dst_element.text]
-        elif isinstance(src1_value, str) and isinstance(src2_value, str):
             if src1_value == src2_value:
-                self.pc = self.labels[dst_element.text]
+                self.pc = instruction.target
+        elif isinstance(src1_value, STRING_TYPES) and isinstance(src2_value, STRING_TYPES):
+            if src1_value == src2_value:
+                self.pc = instruction.target
         else:
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
 
-    def handle_jumpiflt_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if dst_element.text not in self.labels:
-            raise ExceptionHandler(ErrorCodes.JUMP_CALL_ERROR)
-
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
+    def handle_jumpiflt_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
 
         # Check that both src1_value and src2_value are either integers or strings
         if isinstance(src1_value, int) and isinstance(src2_value, int):
-            if int(src1_value) < int(src2_value):
-                self.pc = self.labels[dst_element.text]
-        elif isinstance(src1_value, str) and isinstance(src2_value, str):
             if src1_value < src2_value:
-                self.pc = self.labels[dst_element.text]
+                self.pc = instruction.target
+        elif isinstance(src1_value, STRING_TYPES) and isinstance(src2_value, STRING_TYPES):
+            if src1_value < src2_value:
+                self.pc = instruction.target
         else:
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
 
-    def handle_call_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        if dst_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if dst_element.text not in self.labels:
-            raise ExceptionHandler(ErrorCodes.JUMP_CALL_ERROR)
+    def handle_call_op(self, instruction: Instruction) -> None:
         self.call_stack.append(self.pc)
-        self.pc = self.labels[dst_element.text]
+        self.pc = instruction.target
 
-    def handle_return_op(self, command: ET.Element) -> None:
+    def handle_return_op(self, instruction: Instruction) -> None:
         if len(self.call_stack) == 0:
             raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
-        popped_value = self.call_stack.pop()
-        if not isinstance(popped_value, int):
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        self.pc = popped_value
-
-    def handle_push_op(self, command: ET.Element) -> None:
-        src_element = command.find('src1')
-        if src_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        if src_element.attrib['type'] == 'integer' or src_element.attrib['type'] == 'string':
-            self.data_stack.append(src_element.text)
-        elif src_element.attrib['type'] == 'variable':
-            if src_element.text not in self.variables:
+        self.pc = self.call_stack.pop()
+
+    def handle_push_op(self, instruction: Instruction) -> None:
+        kind, value = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            if self.types[value] is None:
                 raise ExceptionHandler(ErrorCodes.READ_ACCESS_ERROR)
-            self.data_stack.append(self.variables[src_element.text].value)
+            self.data_stack.append(self.values[value])
+        elif kind == OPERAND_INVALID:
+            raise ExceptionHandler(value)
         else:
-            raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
+            self.data_stack.append(value)
 
-    def handle_pop_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        if dst_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
+    def handle_pop_op(self, instruction: Instruction) -> None:
         if len(self.data_stack) == 0:
             raise ExceptionHandler(ErrorCodes.POP_ERROR)
+        # Values keep the type they were pushed with, an int is an integer and anything else a string
         popped_value = self.data_stack.pop()
-        try:
-            popped_value = int(popped_value)
-        except ValueError:
-            pass
-        if isinstance(popped_value, int):
-            self.variables[dst_element.text] = Variable(
-                'integer', popped_value)
-        elif isinstance(popped_value, str):
-            self.variables[dst_element.text] = Variable('string', popped_value)
-        else:
-            raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
-
-    def handle_concat_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
-        if not isinstance(src1_value, str) or not isinstance(src2_value, str):
+        dst = instruction.dst[1]
+        self.values[dst] = popped_value
+        self.types[dst] = TYPE_INTEGER if type(popped_value) is int else TYPE_STRING
+
+    def handle_concat_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
+        if not isinstance(src1_value, STRING_TYPES) or not isinstance(src2_value, STRING_TYPES):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
-        self.variables[dst_element.text] = Variable(
-            'string', src1_value + src2_value)
-
-    def handle_getat_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        src2_element = command.find('src2')
-        if dst_element is None or src1_element is None or src2_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        src1_value = self.get_value(src1_element)
-        src2_value = self.get_value(src2_element)
-        if not isinstance(src1_value, str) or not isinstance(src2_value, int):
+        dst = instruction.dst[1]
+        # Long results are StringBuilders, so building a string piece by piece does not copy it every time
+        self.values[dst] = concat(src1_value, src2_value)
+        self.types[dst] = TYPE_STRING
+
+    def handle_getat_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        src2_value = self.get_value(instruction.src2)
+        if not isinstance(src1_value, STRING_TYPES) or not isinstance(src2_value, int):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
         if src2_value < 0 or src2_value >= len(src1_value):
             raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
-        self.variables[dst_element.text] = Variable(
-            'string', src1_value[src2_value])
-
-    def handle_len_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        if dst_element is None or src1_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        src1_value = self.get_value(src1_element)
-        if not isinstance(src1_value, str):
+        dst = instruction.dst[1]
+        self.values[dst] = src1_value[src2_value]
+        self.types[dst] = TYPE_STRING
+
+    def handle_len_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        if not isinstance(src1_value, STRING_TYPES):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
-        self.variables[dst_element.text] = Variable('integer', len(src1_value))
-
-    def handle_strint_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        if dst_element is None or src1_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        src1_value = self.get_value(src1_element)
-        if not isinstance(src1_value, str):
+        dst = instruction.dst[1]
+        self.values[dst] = len(src1_value)
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_strint_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
+        if not isinstance(src1_value, STRING_TYPES):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
         try:
-            self.variables[dst_element.text] = Variable(
-                'integer', int(src1_value))
+            value = int(str(src1_value))
         except ValueError as exc:
             raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR) from exc
+        dst = instruction.dst[1]
+        self.values[dst] = value
+        self.types[dst] = TYPE_INTEGER
 
-    def handle_intstr_op(self, command: ET.Element) -> None:
-        dst_element = command.find('dst')
-        src1_element = command.find('src1')
-        if dst_element is None or src1_element is None:
-            raise ExceptionHandler(ErrorCodes.INTERNAL_ERROR)
-        src1_value = self.get_value(src1_element)
+    def handle_intstr_op(self, instruction: Instruction) -> None:
+        src1_value = self.get_value(instruction.src1)
         if not isinstance(src1_value, int):
             raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
-        self.variables[dst_element.text] = Variable('string', str(src1_value))
-
-    def get_value(self, element: ET.Element):
-        if element.attrib['type'] == 'integer' and element.text is not None:
-            return int(element.text)
-        if element.attrib['type'] == 'string' and element.text is not None:
-            return element.text
-        if element.attrib['type'] == 'variable':
-            if element.text not in self.variables:
+        dst = instruction.dst[1]
+        self.values[dst] = str(src1_value)
+        self.types[dst] = TYPE_STRING
+
+    # Handlers of the typed opcodes. The type analysis proved that their variable operands are assigned and
+    # have the types the instruction needs, so they are read without the checks of get_value.
+
+    def handle_typed_add_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        dst = instruction.dst[1]
+        self.values[dst] = a + b
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_typed_sub_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        dst = instruction.dst[1]
+        self.values[dst] = a - b
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_typed_mul_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        dst = instruction.dst[1]
+        self.values[dst] = a * b
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_typed_div_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        if b == 0:
+            raise ExceptionHandler(ErrorCodes.DIVISION_BY_ZERO)
+        dst = instruction.dst[1]
+        self.values[dst] = a // b
+        self.types[dst] = TYPE_INTEGER
+
+    def handle_typed_mov_op(self, instruction: Instruction) -> None:
+        # Only a MOV of a variable is typed
+        src = instruction.src1[1]
+        dst = instruction.dst[1]
+        self.values[dst] = self.values[src]
+        self.types[dst] = self.types[src]
+
+    def handle_typed_jumpifeq_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        if a == b:
+            self.pc = instruction.target
+
+    def handle_typed_jumpiflt_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        if a < b:
+            self.pc = instruction.target
+
+    def handle_typed_concat_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        dst = instruction.dst[1]
+        self.values[dst] = concat(a, b)
+        self.types[dst] = TYPE_STRING
+
+    def handle_typed_getat_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        kind, b = instruction.src2
+        if kind == OPERAND_VARIABLE:
+            b = self.values[b]
+        if b < 0 or b >= len(a):
+            raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+        dst = instruction.dst[1]
+        self.values[dst] = a[b]
+        self.types[dst] = TYPE_STRING
+
+    def handle_typed_len_op(self, instruction: Instruction) -> None:
+        kind, a = instruction.src1
+        if kind == OPERAND_VARIABLE:
+            a = self.values[a]
+        dst = instruction.dst[1]
+        self.values[dst] = len(a)
+        self.types[dst] = TYPE_INTEGER
+
+    def read_input_line(self) -> str | None:
+        if self.input.interactive:
+            self.output.flush()  # Show pending output before waiting on stdin
+        return self.input.read_line()
+
+    def get_value(self, operand: tuple):
+        kind, value = operand
+        if kind == OPERAND_VARIABLE:
+            if self.types[value] is None:
                 raise ExceptionHandler(ErrorCodes.READ_ACCESS_ERROR)
-            if self.variables[element.text].var_type == 'integer':
-                return int(self.variables[element.text].value)
-            return str(self.variables[element.text].value)
-        raise ExceptionHandler(ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)
+            # Values are stored already converted, integers as int and strings as str
+            return self.values[value]
+        if kind == OPERAND_INVALID:
+            raise ExceptionHandler(value)
+        return value
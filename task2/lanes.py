@@ -0,0 +1,303 @@
+# Runs one program over many independent inputs at once. Every lane is the run of one input: integer
+# variables are NumPy arrays with an element per lane, and every step executes the instruction at the lowest
+# pc among the lanes for all lanes that are there, so lanes that took different branches of a JUMPIFEQ/
+# JUMPIFLT continue separately and run together again once their pcs meet.
+# Only integers are vectorised. A lane that reaches anything else (a string, a READSTR, an error, a value
+# that does not fit 64 bits) is left to the scalar interpreter, which runs its input again from the start,
+# so every lane ends exactly like its input run on its own. Without NumPy every lane runs that way.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from decoder import (Program, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_READINT, OP_PRINT, OP_PRINTLN,
+                     OP_LABEL, OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_RETURN, OP_PUSH, OP_POP,
+                     OPERAND_INTEGER, OPERAND_STRING, OPERAND_VARIABLE)
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# Products at least this large are left to the scalar interpreter, checked in floating point with a margin
+PRODUCT_LIMIT = 2.0 ** 62
+# Below this many lanes a step costs more than running them on the scalar interpreter. The run stops when
+# fewer are left, and lanes that execute in a group this small for STRAGGLER_STEPS steps in a row while the
+# others wait for them, e.g. in a loop the others have left, are run on their own.
+MIN_LANES = 64
+STRAGGLER_STEPS = 1000
+# Initial depth of the call and data stacks of every lane, doubled when a lane needs more
+STACK_DEPTH = 16
+
+
+# Outcome of the vectorised lanes, the lanes in fallback have to be run by the scalar interpreter
+class LaneResults:
+    def __init__(self, outputs: list, input_lines: list, steps: list | None, fallback: list) -> None:
+        self.outputs = outputs  # Printed text of every lane
+        self.input_lines = input_lines  # Input lines read by every lane
+        self.steps = steps  # Instructions executed by every lane, only counted with max_steps
+        self.fallback = fallback  # Whether the lane left the vectorised run
+
+
+class LaneRun:
+    def __init__(self, program: Program, inputs: list, max_steps: int | None = None) -> None:
+        lanes = len(inputs)
+        self.instructions = program.instructions
+        # A lane that would execute more instructions is stopped by the scalar interpreter
+        self.max_steps = max_steps
+        self.steps = np.zeros(lanes, dtype=np.int64) if max_steps is not None else None
+        self.values = np.zeros((len(program.variables), lanes), dtype=np.int64)
+        self.assigned = np.zeros((len(program.variables), lanes), dtype=bool)
+        self.pcs = np.zeros(lanes, dtype=np.int64)
+        self.fallback = np.zeros(lanes, dtype=bool)
+        self.outputs = [[] for _ in range(lanes)]
+        self.numbers, self.valid = parse_inputs(inputs)
+        self.positions = np.zeros(lanes, dtype=np.int64)  # Next input line of every lane
+        self.call_stack = np.zeros((lanes, STACK_DEPTH), dtype=np.int64)
+        self.call_depth = np.zeros(lanes, dtype=np.int64)
+        self.data_stack = np.zeros((lanes, STACK_DEPTH), dtype=np.int64)
+        self.data_depth = np.zeros(lanes, dtype=np.int64)
+        # Handlers return the lanes that go on to the next instruction, pcs of jumping lanes are set to the
+        # index of their target first, like the pc of the interpreter
+        self.handlers = {
+            OP_MOV: self.handle_mov_op,
+            OP_ADD: self.handle_arithmetic_op,
+            OP_SUB: self.handle_arithmetic_op,
+            OP_MUL: self.handle_arithmetic_op,
+            OP_DIV: self.handle_arithmetic_op,
+            OP_READINT: self.handle_readint_op,
+            OP_PRINT: self.handle_print_op,
+            OP_PRINTLN: self.handle_print_op,
+            OP_LABEL: self.handle_label_op,
+            OP_JUMP: self.handle_jump_op,
+            OP_JUMPIFEQ: self.handle_jumpif_op,
+            OP_JUMPIFLT: self.handle_jumpif_op,
+            OP_CALL: self.handle_call_op,
+            OP_RETURN: self.handle_return_op,
+            OP_PUSH: self.handle_push_op,
+            OP_POP: self.handle_pop_op,
+        }
+
+    def run(self) -> LaneResults:
+        end = len(self.instructions)
+        live = np.arange(len(self.pcs))
+        small_steps = 0
+        while len(live) >= MIN_LANES:
+            pcs = self.pcs[live]
+            pc = int(pcs.min())
+            if pc >= end:
+                break
+            at_pc = pcs == pc
+            lanes = live if at_pc.all() else live[at_pc]
+            if len(lanes) < MIN_LANES:
+                small_steps += 1
+                if small_steps > STRAGGLER_STEPS:
+                    self.leave(lanes)
+                    live = live[~self.fallback[live]]
+                    small_steps = 0
+                    continue
+            else:
+                small_steps = 0
+            instruction = self.instructions[pc]
+            executing = lanes
+            if self.steps is not None and instruction.opcode != OP_LABEL:
+                steps = self.steps[lanes] + 1
+                self.steps[lanes] = steps
+                executing = self.leave(lanes, steps > self.max_steps)
+            handler = self.handlers.get(instruction.opcode)
+            going_on = self.leave(executing) if handler is None else handler(instruction, executing)
+            self.pcs[going_on] += 1
+            if len(going_on) != len(lanes):
+                live = live[~self.fallback[live]]
+            if pc == end - 1 or instruction.opcode == OP_RETURN:
+                # Lanes past the last instruction have finished
+                live = live[self.pcs[live] < end]
+        # The last lanes, e.g. the longest running ones, are run on their own
+        self.leave(live[self.pcs[live] < end])
+        return LaneResults([''.join(output) for output in self.outputs], self.positions.tolist(),
+                           self.steps.tolist() if self.steps is not None else None, self.fallback.tolist())
+
+    def leave(self, lanes, bad=None):
+        # The lanes (where bad) go to the scalar interpreter, returns the others
+        if bad is None:
+            self.fallback[lanes] = True
+            return lanes[:0]
+        if bad.any():
+            self.fallback[lanes[bad]] = True
+            return lanes[~bad]
+        return lanes
+
+    def read(self, operand: tuple, lanes) -> tuple:
+        # Values of the operand in the lanes and the lanes where it cannot be read as an integer, None if
+        # there are none. A string, an invalid operand or an unassigned variable is an error or a string
+        # operation of the scalar interpreter.
+        kind, value = operand
+        if kind == OPERAND_VARIABLE:
+            assigned = self.assigned[value, lanes]
+            return self.values[value, lanes], None if assigned.all() else ~assigned
+        if kind == OPERAND_INTEGER and INT64_MIN <= value <= INT64_MAX:
+            return np.full(len(lanes), value, dtype=np.int64), None
+        return None, np.ones(len(lanes), dtype=bool)
+
+    def read_pair(self, instruction, lanes) -> tuple:
+        # The lanes where both operands are integers and their values there, the other lanes leave
+        a, bad_a = self.read(instruction.src1, lanes)
+        b, bad_b = self.read(instruction.src2, lanes)
+        if a is None or b is None:
+            return self.leave(lanes), None, None
+        bad = bad_a if bad_b is None else bad_b if bad_a is None else bad_a | bad_b
+        if bad is not None and bad.any():
+            self.leave(lanes, bad)
+            good = ~bad
+            return lanes[good], a[good], b[good]
+        return lanes, a, b
+
+    def store(self, slot: int, lanes, values) -> None:
+        self.values[slot, lanes] = values
+        self.assigned[slot, lanes] = True
+
+    def handle_mov_op(self, instruction, lanes):
+        values, bad = self.read(instruction.src1, lanes)
+        if values is None:
+            return self.leave(lanes)
+        if bad is not None:
+            lanes = self.leave(lanes, bad)
+            values = values[~bad]
+        self.store(instruction.dst[1], lanes, values)
+        return lanes
+
+    def handle_arithmetic_op(self, instruction, lanes):
+        going_on, a, b = self.read_pair(instruction, lanes)
+        if a is None:
+            return going_on
+        opcode = instruction.opcode
+        # Lanes whose result does not fit 64 bits, or that divide by zero, run on the scalar interpreter
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            if opcode == OP_ADD:
+                result = a + b
+                bad = ((a ^ result) & (b ^ result)) < 0
+            elif opcode == OP_SUB:
+                result = a - b
+                bad = ((a ^ b) & (a ^ result)) < 0
+            elif opcode == OP_MUL:
+                bad = np.abs(a.astype(np.float64) * b.astype(np.float64)) >= PRODUCT_LIMIT
+                result = a * b
+            else:
+                bad = (b == 0) | ((a == INT64_MIN) & (b == -1))
+                result = a // np.where(bad, 1, b)
+        if bad.any():
+            going_on = self.leave(going_on, bad)
+            result = result[~bad]
+        self.store(instruction.dst[1], going_on, result)
+        return going_on
+
+    def handle_readint_op(self, instruction, lanes):
+        if not self.numbers.shape[1]:
+            return self.leave(lanes)
+        positions = self.positions[lanes]
+        readable = positions < self.numbers.shape[1]
+        columns = np.where(readable, positions, 0)
+        valid = readable & self.valid[lanes, columns]
+        values = self.numbers[lanes, columns]
+        if not valid.all():
+            lanes = self.leave(lanes, ~valid)
+            values = values[valid]
+        self.positions[lanes] += 1
+        self.store(instruction.dst[1], lanes, values)
+        return lanes
+
+    def handle_print_op(self, instruction, lanes):
+        end = '\n' if instruction.opcode == OP_PRINTLN else ''
+        kind, value = instruction.src1
+        if kind in (OPERAND_INTEGER, OPERAND_STRING):
+            text = str(value) + end
+            for lane in lanes.tolist():
+                self.outputs[lane].append(text)
+            return lanes
+        values, bad = self.read(instruction.src1, lanes)
+        if values is None:
+            return self.leave(lanes)
+        if bad is not None:
+            lanes = self.leave(lanes, bad)
+            values = values[~bad]
+        outputs = self.outputs
+        for lane, value in zip(lanes.tolist(), values.tolist()):
+            outputs[lane].append(str(value) + end)
+        return lanes
+
+    def handle_label_op(self, instruction, lanes):
+        return lanes
+
+    def handle_jump_op(self, instruction, lanes):
+        self.pcs[lanes] = instruction.target
+        return lanes
+
+    def handle_jumpif_op(self, instruction, lanes):
+        # Integers are only ever compared to integers, anything else is left to the scalar interpreter
+        lanes, a, b = self.read_pair(instruction, lanes)
+        if a is None:
+            return lanes
+        taken = a == b if instruction.opcode == OP_JUMPIFEQ else a < b
+        self.pcs[lanes[taken]] = instruction.target
+        return lanes
+
+    def handle_call_op(self, instruction, lanes):
+        self.call_stack = push(self.call_stack, self.call_depth, lanes, self.pcs[lanes])
+        self.pcs[lanes] = instruction.target
+        return lanes
+
+    def handle_return_op(self, instruction, lanes):
+        depth = self.call_depth[lanes]
+        lanes = self.leave(lanes, depth == 0)
+        self.call_depth[lanes] -= 1
+        self.pcs[lanes] = self.call_stack[lanes, self.call_depth[lanes]]
+        return lanes
+
+    def handle_push_op(self, instruction, lanes):
+        values, bad = self.read(instruction.src1, lanes)
+        if values is None:
+            return self.leave(lanes)
+        if bad is not None:
+            lanes = self.leave(lanes, bad)
+            values = values[~bad]
+        self.data_stack = push(self.data_stack, self.data_depth, lanes, values)
+        return lanes
+
+    def handle_pop_op(self, instruction, lanes):
+        depth = self.data_depth[lanes]
+        lanes = self.leave(lanes, depth == 0)
+        self.data_depth[lanes] -= 1
+        self.store(instruction.dst[1], lanes, self.data_stack[lanes, self.data_depth[lanes]])
+        return lanes
+
+
+def push(stack, depths, lanes, values):
+    # Pushes values on the stacks of the lanes, returns the stack array, grown if it was full
+    depth = depths[lanes]
+    if len(lanes) and int(depth.max()) >= stack.shape[1]:
+        stack = np.concatenate((stack, np.zeros_like(stack)), axis=1)
+    stack[lanes, depth] = values
+    depths[lanes] = depth + 1
+    return stack
+
+
+def parse_inputs(inputs: list) -> tuple:
+    # Input lines of every lane as READINT reads them, valid is False for a line READINT fails on or whose
+    # value does not fit 64 bits
+    width = max((len(lines) for lines in inputs), default=0)
+    numbers = np.zeros((len(inputs), width), dtype=np.int64)
+    valid = np.zeros((len(inputs), width), dtype=bool)
+    for lane, lines in enumerate(inputs):
+        for column, line in enumerate(lines):
+            try:
+                value = int(line)
+            except ValueError:
+                continue
+            if INT64_MIN <= value <= INT64_MAX:
+                numbers[lane, column] = value
+                valid[lane, column] = True
+    return numbers, valid
+
+
+def run_lanes(program: Program, inputs: list, max_steps: int | None = None) -> LaneResults:
+    # inputs are the input lines of every lane. The program is not modified.
+    if np is None:
+        return LaneResults([''] * len(inputs), [0] * len(inputs), None, [True] * len(inputs))
+    return LaneRun(program, inputs, max_steps).run()
@@ -0,0 +1,105 @@
+import random
+import unittest
+import api
+from lanes import MIN_LANES, np, run_lanes
+
+# Steps of the Collatz sequence from the input to 1, an input of 0 never gets there
+COLLATZ = '''<program name="collatz">
+  <tac opcode="READINT" order="1"><dst type="variable">n</dst></tac>
+  <tac opcode="MOV" order="2"><dst type="variable">steps</dst><src1 type="integer">0</src1></tac>
+  <tac opcode="LABEL" order="3"><dst type="label">@loop</dst></tac>
+  <tac opcode="JUMPIFEQ" order="4"><dst type="label">@end</dst><src1 type="variable">n</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="ADD" order="5"><dst type="variable">steps</dst><src1 type="variable">steps</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="DIV" order="6"><dst type="variable">half</dst><src1 type="variable">n</src1>
+    <src2 type="integer">2</src2></tac>
+  <tac opcode="MUL" order="7"><dst type="variable">even</dst><src1 type="variable">half</src1>
+    <src2 type="integer">2</src2></tac>
+  <tac opcode="JUMPIFEQ" order="8"><dst type="label">@even</dst><src1 type="variable">even</src1>
+    <src2 type="variable">n</src2></tac>
+  <tac opcode="MUL" order="9"><dst type="variable">n</dst><src1 type="variable">n</src1>
+    <src2 type="integer">3</src2></tac>
+  <tac opcode="ADD" order="10"><dst type="variable">n</dst><src1 type="variable">n</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="JUMP" order="11"><dst type="label">@loop</dst></tac>
+  <tac opcode="LABEL" order="12"><dst type="label">@even</dst></tac>
+  <tac opcode="MOV" order="13"><dst type="variable">n</dst><src1 type="variable">half</src1></tac>
+  <tac opcode="JUMP" order="14"><dst type="label">@loop</dst></tac>
+  <tac opcode="LABEL" order="15"><dst type="label">@end</dst></tac>
+  <tac opcode="PRINT" order="16"><src1 type="string">steps </src1></tac>
+  <tac opcode="PRINTLN" order="17"><src1 type="variable">steps</src1></tac>
+</program>'''
+# Recursive factorial through CALL/RETURN and the data stack, 21! and more do not fit 64 bits
+FACTORIAL = '''<program name="factorial">
+  <tac opcode="READINT" order="1"><dst type="variable">n</dst></tac>
+  <tac opcode="CALL" order="2"><dst type="label">@factorial</dst></tac>
+  <tac opcode="POP" order="3"><dst type="variable">result</dst></tac>
+  <tac opcode="PRINTLN" order="4"><src1 type="variable">result</src1></tac>
+  <tac opcode="JUMP" order="5"><dst type="label">@end</dst></tac>
+  <tac opcode="LABEL" order="6"><dst type="label">@factorial</dst></tac>
+  <tac opcode="JUMPIFLT" order="7"><dst type="label">@base</dst><src1 type="variable">n</src1>
+    <src2 type="integer">2</src2></tac>
+  <tac opcode="PUSH" order="8"><src1 type="variable">n</src1></tac>
+  <tac opcode="SUB" order="9"><dst type="variable">n</dst><src1 type="variable">n</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="CALL" order="10"><dst type="label">@factorial</dst></tac>
+  <tac opcode="POP" order="11"><dst type="variable">result</dst></tac>
+  <tac opcode="POP" order="12"><dst type="variable">n</dst></tac>
+  <tac opcode="MUL" order="13"><dst type="variable">result</dst><src1 type="variable">result</src1>
+    <src2 type="variable">n</src2></tac>
+  <tac opcode="PUSH" order="14"><src1 type="variable">result</src1></tac>
+  <tac opcode="RETURN" order="15"/>
+  <tac opcode="LABEL" order="16"><dst type="label">@base</dst></tac>
+  <tac opcode="PUSH" order="17"><src1 type="integer">1</src1></tac>
+  <tac opcode="RETURN" order="18"/>
+  <tac opcode="LABEL" order="19"><dst type="label">@end</dst></tac>
+</program>'''
+
+
+def outcome(result: api.RunResult) -> tuple:
+    return result.exit_code, result.output, result.input_lines, result.error_message
+
+
+class LaneTest(unittest.TestCase):
+    def assert_lanes_match_scalar_runs(self, source: str, inputs: list, max_steps: int | None = None) -> None:
+        program = api.load(source)
+        results = program.run_lanes(inputs, max_steps)
+        self.assertEqual(len(results), len(inputs))
+        for lines, result in zip(inputs, results):
+            with self.subTest(input=lines):
+                self.assertEqual(outcome(result), outcome(program.run(lines, max_steps=max_steps)))
+                if max_steps is not None:
+                    self.assertEqual(result.steps, program.run(lines, max_steps=max_steps).steps)
+
+    def test_collatz(self):
+        generator = random.Random(1)
+        inputs = [[str(generator.randint(1, 10 ** 6))] for _ in range(300)]
+        self.assert_lanes_match_scalar_runs(COLLATZ, inputs)
+
+    def test_lanes_that_fail_or_overflow(self):
+        # Bad input, no input, a value that overflows 64 bits and a run stopped by its instruction budget
+        generator = random.Random(2)
+        inputs = [[str(generator.randint(1, 1000))] for _ in range(200)]
+        inputs += [['abc'], [], [str(2 ** 62)], ['0'], ['7', 'extra']]
+        self.assert_lanes_match_scalar_runs(COLLATZ, inputs, max_steps=10000)
+
+    def test_calls_and_stack(self):
+        generator = random.Random(3)
+        inputs = [[str(generator.randint(-3, 30))] for _ in range(200)]
+        self.assert_lanes_match_scalar_runs(FACTORIAL, inputs)
+
+    def test_few_lanes(self):
+        self.assert_lanes_match_scalar_runs(COLLATZ, [['27'], ['1']])
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_integer_lanes_are_vectorised(self):
+        inputs = [[str(n)] for n in range(1, 2 * MIN_LANES + 1)]
+        lanes = run_lanes(api.load(COLLATZ).program, inputs)
+        # Only the lanes left running with fewer than MIN_LANES others go to the scalar interpreter
+        self.assertLess(sum(lanes.fallback), MIN_LANES)
+        self.assertEqual(lanes.outputs[26], 'steps 111\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
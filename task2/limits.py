@@ -0,0 +1,61 @@
+import math
+import time
+from exception_handler import ExceptionHandler, ErrorCodes
+from decoder import OP_LABEL
+
+# Instructions executed between two looks at the clock when only a time limit is set
+CLOCK_INTERVAL = 4096
+
+
+# Instruction budget and wall-clock limit of one run. The execution loops count the executed instructions
+# in steps and only call renew once steps would pass checkpoint, which keeps the check to one comparison.
+class ExecutionLimits:
+    def __init__(self, max_steps: int | None = None, time_limit: float | None = None) -> None:
+        self.max_steps = max_steps
+        self.time_limit = time_limit  # Seconds
+        self.steps = 0  # Instructions executed in this run, see step_costs
+        self.deadline: float | None = None
+        self.checkpoint: float = 0
+        self.error_code: ErrorCodes | None = None  # Limit the run was stopped by
+
+    def start(self) -> None:
+        self.steps = 0
+        self.error_code = None
+        self.deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.checkpoint = self.next_checkpoint()
+
+    def next_checkpoint(self) -> float:
+        checkpoint = self.steps + CLOCK_INTERVAL if self.deadline is not None else math.inf
+        if self.max_steps is not None:
+            checkpoint = min(checkpoint, self.max_steps)
+        return checkpoint
+
+    def renew(self, cost: int) -> bool:
+        # Whether cost more instructions may run, moves the checkpoint past them if so
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.error_code = ErrorCodes.TIME_LIMIT_ERROR
+            self.checkpoint = self.steps
+            return False
+        if self.max_steps is not None and self.steps + cost > self.max_steps:
+            self.error_code = ErrorCodes.STEP_LIMIT_ERROR
+            return False
+        self.checkpoint = self.next_checkpoint()
+        return True
+
+    def split(self, instruction):
+        # Called when a superinstruction does not fit, returns its first instruction to run on its own if that
+        # one does. So a fused run stops after the same instruction as an unfused one and a run resumed with
+        # a budget of one instruction still makes progress.
+        if instruction.fused is None or not self.renew(1):
+            raise self.exceeded()
+        return instruction.fused[0]
+
+    def exceeded(self) -> ExceptionHandler:
+        return ExceptionHandler(self.error_code)
+
+
+def step_costs(instructions: list) -> list:
+    # Steps every instruction counts as: a superinstruction the two it replaces and a LABEL none, it does
+    # nothing and whether it is executed depends on how it was reached, after a jump to it it is not
+    return [0 if instruction.opcode == OP_LABEL else 1 if instruction.fused is None else 2
+            for instruction in instructions]
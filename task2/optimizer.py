@@ -0,0 +1,372 @@
+import sys
+import argparse
+from exception_handler import ExceptionHandler
+from decoder import (Program, load_program, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_READINT, OP_READSTR,
+                     OP_LABEL, OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL, OP_POP, OP_CONCAT, OP_GETAT,
+                     OP_LEN, OP_STRINT, OP_INTSTR, OPERAND_INTEGER, OPERAND_STRING, OPERAND_VARIABLE,
+                     OPERAND_INVALID)
+from cfg import build_cfg
+from encoder import write_program
+
+# Instructions that assign their dst variable
+WRITES_DST = (OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_READINT, OP_READSTR, OP_POP,
+              OP_CONCAT, OP_GETAT, OP_LEN, OP_STRINT, OP_INTSTR)
+MAX_ROUNDS = 10
+
+
+class OptimizationReport:
+    def __init__(self, original_size: int) -> None:
+        self.original_size = original_size
+        self.optimized_size = original_size
+        self.folded = 0  # Instructions computed while optimizing and replaced by a MOV of the result
+        self.propagated = 0  # Operands replaced by a constant or by the variable they were copied from
+        self.dead_stores = 0
+        self.self_moves = 0
+        self.unreachable = 0
+        self.jumps_threaded = 0
+        self.jumps_removed = 0
+        self.labels_removed = 0
+
+    @property
+    def removed(self) -> int:
+        return self.original_size - self.optimized_size
+
+    def __str__(self) -> str:
+        return (f"Optimizer removed {self.removed} of {self.original_size} instructions "
+                f"(folded {self.folded}, propagated {self.propagated}, dead stores {self.dead_stores}, "
+                f"self moves {self.self_moves}, unreachable {self.unreachable}, "
+                f"jumps threaded {self.jumps_threaded}, jumps removed {self.jumps_removed}, "
+                f"labels removed {self.labels_removed})")
+
+
+# Rewrites the program in place. PRINT output, input consumption and runtime errors stay the same:
+# only instructions that cannot fail are removed and only operations on known operands that succeed are folded.
+def optimize_program(program: Program) -> OptimizationReport:
+    report = OptimizationReport(len(program.instructions))
+    for _ in range(MAX_ROUNDS):
+        changes = propagate_and_fold(program, report)
+        changes += thread_jumps(program, report)
+        changes += remove_unused_labels(program, report)
+        changes += remove_unreachable(program, report)
+        changes += remove_dead_stores(program, report)
+        if changes == 0:
+            break
+    report.optimized_size = len(program.instructions)
+    return report
+
+
+def propagate_and_fold(program: Program, report: OptimizationReport) -> int:
+    changes = 0
+    cfg = build_cfg(program)
+    instructions = program.instructions
+    for block in cfg.blocks:
+        # Operand every variable is known to hold inside the block, a literal or another variable
+        known: dict = {}
+        for i in range(block.start, block.end):
+            instruction = instructions[i]
+            for name in ('src1', 'src2'):
+                operand = getattr(instruction, name)
+                if operand is not None and operand[0] == OPERAND_VARIABLE and operand[1] in known:
+                    setattr(instruction, name, known[operand[1]])
+                    report.propagated += 1
+                    changes += 1
+            if instruction.opcode in (OP_JUMPIFEQ, OP_JUMPIFLT):
+                changes += fold_branch(instructions, i, report)
+                continue
+            if instruction.opcode not in WRITES_DST:
+                continue
+            if instruction.opcode != OP_MOV:
+                result = fold(instruction)
+                if result is not None:
+                    instruction.opcode = OP_MOV
+                    instruction.src1 = result
+                    instruction.src2 = None
+                    report.folded += 1
+                    changes += 1
+            dst = instruction.dst[1]
+            known.pop(dst, None)
+            for slot in [slot for slot, operand in known.items() if operand == (OPERAND_VARIABLE, dst)]:
+                del known[slot]
+            if instruction.opcode == OP_MOV and instruction.src1 != (OPERAND_VARIABLE, dst) and \
+                    instruction.src1[0] in (OPERAND_INTEGER, OPERAND_STRING, OPERAND_VARIABLE):
+                known[dst] = instruction.src1
+    if None in instructions:
+        compact(program, instructions)
+    return changes
+
+
+def fold(instruction):
+    # Result operand of an instruction whose operands are literals, None when it has to run
+    a = literal_value(instruction.src1)
+    b = literal_value(instruction.src2)
+    opcode = instruction.opcode
+    if opcode in (OP_ADD, OP_SUB, OP_MUL, OP_DIV):
+        if type(a) is not int or type(b) is not int:
+            return None
+        if opcode == OP_ADD:
+            return (OPERAND_INTEGER, a + b)
+        if opcode == OP_SUB:
+            return (OPERAND_INTEGER, a - b)
+        if opcode == OP_MUL:
+            return (OPERAND_INTEGER, a * b)
+        # Division by zero is left to fail when it is executed
+        return (OPERAND_INTEGER, a // b) if b != 0 else None
+    if opcode == OP_CONCAT and type(a) is str and type(b) is str:
+        return (OPERAND_STRING, a + b)
+    if opcode == OP_GETAT and type(a) is str and type(b) is int and 0 <= b < len(a):
+        return (OPERAND_STRING, a[b])
+    if opcode == OP_LEN and type(a) is str:
+        return (OPERAND_INTEGER, len(a))
+    if opcode == OP_INTSTR and type(a) is int:
+        return (OPERAND_STRING, str(a))
+    if opcode == OP_STRINT and type(a) is str:
+        try:
+            return (OPERAND_INTEGER, int(a))
+        except ValueError:
+            return None
+    return None
+
+
+def literal_value(operand):
+    if operand is not None and operand[0] in (OPERAND_INTEGER, OPERAND_STRING):
+        return operand[1]
+    return None
+
+
+def fold_branch(instructions: list, i: int, report: OptimizationReport) -> int:
+    instruction = instructions[i]
+    a = literal_value(instruction.src1)
+    b = literal_value(instruction.src2)
+    if a is None or b is None or type(a) is not type(b):
+        return 0
+    taken = a == b if instruction.opcode == OP_JUMPIFEQ else a < b
+    if taken:
+        instruction.opcode = OP_JUMP
+        instruction.src1 = instruction.src2 = None
+    else:
+        instructions[i] = None
+    report.folded += 1
+    return 1
+
+
+def thread_jumps(program: Program, report: OptimizationReport) -> int:
+    changes = 0
+    instructions = program.instructions
+    label_names = {index: name for name, index in program.labels.items()}
+    for i, instruction in enumerate(instructions):
+        if instruction is None or instruction.opcode not in (OP_JUMP, OP_JUMPIFEQ, OP_JUMPIFLT, OP_CALL):
+            continue
+        # Follow labels that are directly followed by an unconditional JUMP
+        seen = set()
+        target = instruction.target
+        while target not in seen:
+            seen.add(target)
+            following = first_after_labels(instructions, target)
+            if following is None or instructions[following].opcode != OP_JUMP:
+                break
+            target = instructions[following].target
+        if target != instruction.target and target in label_names:
+            instruction.target = target
+            instruction.dst = (instruction.dst[0], label_names[target])
+            report.jumps_threaded += 1
+            changes += 1
+        if instruction.opcode == OP_JUMP and instruction.target >= i and \
+                all(instructions[k].opcode == OP_LABEL for k in range(i + 1, instruction.target + 1)):
+            # A jump over nothing but labels just falls through
+            instructions[i] = None
+            report.jumps_removed += 1
+            changes += 1
+    if changes:
+        compact(program, instructions)
+    return changes
+
+
+def first_after_labels(instructions: list, index: int) -> int | None:
+    index += 1
+    while index < len(instructions) and (instructions[index] is None or instructions[index].opcode == OP_LABEL):
+        index += 1
+    return index if index < len(instructions) else None
+
+
+def remove_unused_labels(program: Program, report: OptimizationReport) -> int:
+    # A label no jump or call refers to only splits basic blocks
+    targets = {instruction.target for instruction in program.instructions if instruction.target is not None}
+    changes = 0
+    for name, index in list(program.labels.items()):
+        if index not in targets:
+            program.instructions[index] = None
+            del program.labels[name]
+            report.labels_removed += 1
+            changes += 1
+    if changes:
+        compact(program, program.instructions)
+    return changes
+
+
+def remove_unreachable(program: Program, report: OptimizationReport) -> int:
+    cfg = build_cfg(program)
+    reachable = [False] * len(cfg.blocks)
+    for block in cfg.reverse_postorder():
+        reachable[block.id] = True
+    changes = 0
+    for block in cfg.blocks:
+        if reachable[block.id]:
+            continue
+        for i in range(block.start, block.end):
+            # Labels stay, their indices are what jumps and the label table refer to
+            if program.instructions[i].opcode != OP_LABEL:
+                program.instructions[i] = None
+                report.unreachable += 1
+                changes += 1
+    if changes:
+        compact(program, program.instructions)
+    return changes
+
+
+def remove_dead_stores(program: Program, report: OptimizationReport) -> int:
+    cfg = build_cfg(program)
+    instructions = program.instructions
+    defined_in = definitely_assigned(cfg)
+    live_out = live_variables(cfg)
+    changes = 0
+    for block in cfg.blocks:
+        # Walk the block backwards from the variables live at its end
+        live = live_out[block.id]
+        defined = defined_before(instructions, block, defined_in[block.id])
+        for i in range(block.end - 1, block.start - 1, -1):
+            instruction = instructions[i]
+            if instruction.opcode == OP_MOV:
+                dst = instruction.dst[1]
+                source = instruction.src1
+                # Reading an unassigned variable or a malformed literal is an error, such a MOV has to stay
+                can_fail = source[0] == OPERAND_INVALID or \
+                    source[0] == OPERAND_VARIABLE and not defined[i - block.start] >> source[1] & 1
+                if not can_fail and source == (OPERAND_VARIABLE, dst):
+                    instructions[i] = None
+                    report.self_moves += 1
+                    changes += 1
+                    continue
+                if not can_fail and not live >> dst & 1:
+                    instructions[i] = None
+                    report.dead_stores += 1
+                    changes += 1
+                    continue
+            live = transfer_live(instruction, live)
+    if changes:
+        compact(program, instructions)
+    return changes
+
+
+def defined_before(instructions: list, block, defined: int) -> list:
+    # Variables definitely assigned before every instruction of the block, as bit sets
+    before = []
+    for i in range(block.start, block.end):
+        before.append(defined)
+        instruction = instructions[i]
+        if instruction.opcode in WRITES_DST:
+            defined |= 1 << instruction.dst[1]
+    return before
+
+
+def definitely_assigned(cfg) -> list:
+    # Forward must analysis, a variable is in the set when every path to the block assigns it
+    instructions = cfg.program.instructions
+    universe = (1 << len(cfg.program.variables)) - 1
+    generated = []
+    for block in cfg.blocks:
+        defined = 0
+        for i in range(block.start, block.end):
+            if instructions[i].opcode in WRITES_DST:
+                defined |= 1 << instructions[i].dst[1]
+        generated.append(defined)
+    defined_in = [universe] * len(cfg.blocks)
+    defined_out = [universe] * len(cfg.blocks)
+    order = cfg.reverse_postorder()
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            if block.id == 0:
+                incoming = 0
+            else:
+                incoming = universe
+                for predecessor in cfg.predecessors(block):
+                    incoming &= defined_out[predecessor]
+            outgoing = incoming | generated[block.id]
+            if incoming != defined_in[block.id] or outgoing != defined_out[block.id]:
+                defined_in[block.id] = incoming
+                defined_out[block.id] = outgoing
+                changed = True
+    return defined_in
+
+
+def live_variables(cfg) -> list:
+    # Backward may analysis, the variables read on some path after the end of each block
+    instructions = cfg.program.instructions
+    live_in = [0] * len(cfg.blocks)
+    live_out = [0] * len(cfg.blocks)
+    order = list(reversed(cfg.blocks))
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            outgoing = 0
+            for successor in block.successors:
+                outgoing |= live_in[successor]
+            incoming = outgoing
+            for i in range(block.end - 1, block.start - 1, -1):
+                incoming = transfer_live(instructions[i], incoming)
+            if outgoing != live_out[block.id] or incoming != live_in[block.id]:
+                live_out[block.id] = outgoing
+                live_in[block.id] = incoming
+                changed = True
+    return live_out
+
+
+def transfer_live(instruction, live: int) -> int:
+    if instruction.opcode in WRITES_DST and instruction.dst is not None:
+        live &= ~(1 << instruction.dst[1])
+    for operand in (instruction.src1, instruction.src2):
+        if operand is not None and operand[0] == OPERAND_VARIABLE:
+            live |= 1 << operand[1]
+    return live
+
+
+def compact(program: Program, instructions: list) -> None:
+    # Drops removed instructions and moves jump targets and labels to the new indices
+    new_index = []
+    kept = []
+    for instruction in instructions:
+        new_index.append(len(kept))
+        if instruction is not None:
+            kept.append(instruction)
+    for instruction in kept:
+        if instruction.target is not None:
+            instruction.target = new_index[instruction.target]
+    program.labels = {name: new_index[index] for name, index in program.labels.items()}
+    program.instructions = kept
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Optimizes the XML representation of an IPPeCode program, e.g. the output of task1/parser.py.')
+    parser.add_argument('program', help='Program file with XML representation of an IPPeCode source code.')
+    parser.add_argument('output', nargs='?', help='Optional. Output file for the optimized program, '
+                                                  'the program file is rewritten when omitted.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    try:
+        program = load_program(args.program)
+        report = optimize_program(program)
+        write_program(program, args.output if args.output is not None else args.program)
+    except ExceptionHandler as e:
+        sys.stderr.write(e.error_message + "\n")
+        sys.exit(e.error_code.value)
+    sys.stderr.write(str(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import unittest
+import xml.etree.ElementTree as ET
+import api
+from decoder import decode_program, OP_MOV
+from optimizer import optimize_program
+
+
+def program_xml(*instructions: str) -> str:
+    tacs = ''.join(f'<tac order="{i}" {body}</tac>' for i, body in enumerate(instructions, 1))
+    return f'<program>{tacs}</program>'
+
+
+# A MOV of a malformed literal whose result is never read
+DEAD_BAD_LITERAL = program_xml(
+    'opcode="MOV"><dst type="variable">x</dst><src1 type="integer">1a</src1>',
+    'opcode="PRINT"><src1 type="string">ok</src1>')
+DEAD_EMPTY_LITERAL = program_xml(
+    'opcode="MOV"><dst type="variable">x</dst><src1 type="integer"></src1>',
+    'opcode="PRINT"><src1 type="string">ok</src1>')
+DEAD_UNASSIGNED_READ = program_xml(
+    'opcode="MOV"><dst type="variable">x</dst><src1 type="variable">y</src1>',
+    'opcode="PRINT"><src1 type="string">ok</src1>')
+DEAD_STORE = program_xml(
+    'opcode="MOV"><dst type="variable">x</dst><src1 type="integer">1</src1>',
+    'opcode="PRINT"><src1 type="string">ok</src1>')
+
+
+class DeadStoreTest(unittest.TestCase):
+    def assert_same_exit_code(self, source: str, exit_code: int) -> None:
+        self.assertEqual(api.load(source).run().exit_code, exit_code)
+        self.assertEqual(api.load(source, optimize=True).run().exit_code, exit_code)
+        self.assertEqual(api.load(source, optimize=True, compiled=True).run().exit_code, exit_code)
+
+    def test_dead_mov_of_malformed_literal_keeps_error(self):
+        self.assert_same_exit_code(DEAD_BAD_LITERAL, 99)
+
+    def test_dead_mov_of_empty_literal_keeps_error(self):
+        self.assert_same_exit_code(DEAD_EMPTY_LITERAL, 27)
+
+    def test_dead_mov_of_unassigned_variable_keeps_error(self):
+        self.assert_same_exit_code(DEAD_UNASSIGNED_READ, 24)
+
+    def test_dead_mov_that_cannot_fail_is_removed(self):
+        program = decode_program(ET.fromstring(DEAD_STORE))
+        report = optimize_program(program)
+        self.assertEqual(report.dead_stores, 1)
+        self.assertNotIn(OP_MOV, [instruction.opcode for instruction in program.instructions])
+        self.assertEqual(api.load(DEAD_STORE, optimize=True).run().output, 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+# Collects PRINT/PRINTLN output and writes it to the output in chunks of buffer_size characters
+class OutputWriter:
+    def __init__(self, output_file, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.output_file = output_file
+        self.buffer_size = buffer_size
+        self.chunks: list = []
+        self.pending: int = 0
+        self.flushed: int = 0  # Characters written to the stream so far
+        self.stream = None
+        self.owns_stream = False
+
+    def write(self, text: str) -> None:
+        self.chunks.append(text)
+        self.pending += len(text)
+        if self.pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.chunks:
+            stream = self.stream if self.stream is not None else self.open_stream()
+            stream.write(''.join(self.chunks))
+            self.flushed += self.pending
+            self.chunks.clear()
+            self.pending = 0
+        if self.stream is not None:
+            self.stream.flush()
+
+    @property
+    def offset(self) -> int:
+        # Characters printed so far, flushed or not
+        return self.flushed + self.pending
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self.owns_stream and self.stream is not None:
+                self.stream.close()
+            self.stream = None
+            self.owns_stream = False
+
+    def open_stream(self):
+        # The output file is opened on the first flush, a program that prints nothing does not touch it
+        if self.output_file is None or self.output_file == sys.stdout:
+            self.stream = sys.stdout
+        elif hasattr(self.output_file, 'write'):
+            self.stream = self.output_file
+        else:
+            self.stream = open(self.output_file, 'a', encoding='utf-8')
+            self.owns_stream = True
+        return self.stream
@@ -0,0 +1,126 @@
+import time
+from decoder import OPCODES, OP_CALL, OP_RETURN, OP_LABEL
+
+# Frame of the code outside any CALL in the collapsed stacks
+MAIN_FRAME = 'main'
+HOT_INSTRUCTIONS = 20
+
+
+# Execution profile of one run. Interpreter runs its program through Profiler.run instead of the dispatch
+# loop when a profiler is given, without fusion or compilation so every instruction is counted on its own.
+class Profiler:
+    def __init__(self) -> None:
+        self.instructions: list = []
+        self.counts: list = []  # Executions of every instruction, by index
+        self.times: list = []  # Nanoseconds spent in every instruction, by index
+        self.call_counts: dict = {}  # Calls of every CALL target label
+        self.call_times: dict = {}  # Nanoseconds from the outermost CALL of every label to its RETURN
+        self.active_calls: dict = {}  # Frames of every label on the call stack, recursive calls are timed once
+        self.stack_times: dict = {}  # Nanoseconds spent in instructions under every stack of CALL targets
+        self.max_depth = 0
+        self.total_time = 0
+
+    def run(self, interpreter, instructions: list) -> None:
+        self.instructions = instructions
+        self.counts = [0] * len(instructions)
+        self.times = [0] * len(instructions)
+        counts = self.counts
+        times = self.times
+        stack_times = self.stack_times
+        frames = []  # (label, start) of the CALLs not returned from yet
+        stack = (MAIN_FRAME,)
+        dispatch = interpreter.dispatch
+        limits = interpreter.limits
+        clock = time.perf_counter_ns
+        program_len = len(instructions)
+        run_start = clock()
+        try:
+            while interpreter.pc < program_len:
+                pc = interpreter.pc
+                instruction = instructions[pc]
+                if limits is not None and instruction.opcode != OP_LABEL:
+                    if limits.steps + 1 > limits.checkpoint and not limits.renew(1):
+                        raise limits.exceeded()
+                    limits.steps += 1
+                start = clock()
+                try:
+                    dispatch[instruction.opcode](instruction)
+                finally:
+                    elapsed = clock() - start
+                    counts[pc] += 1
+                    times[pc] += elapsed
+                    stack_times[stack] = stack_times.get(stack, 0) + elapsed
+                if instruction.opcode == OP_CALL:
+                    label = instruction.dst[1]
+                    frames.append((label, clock()))
+                    self.active_calls[label] = self.active_calls.get(label, 0) + 1
+                    stack = stack + (label,)
+                    self.max_depth = max(self.max_depth, len(frames))
+                elif instruction.opcode == OP_RETURN and frames:
+                    self.end_call(*frames.pop())
+                    stack = stack[:-1]
+                interpreter.pc += 1
+        finally:
+            # Calls still running when the program ends or fails
+            while frames:
+                self.end_call(*frames.pop())
+            self.total_time = clock() - run_start
+
+    def end_call(self, label: str, start: int) -> None:
+        self.call_counts[label] = self.call_counts.get(label, 0) + 1
+        self.active_calls[label] -= 1
+        if not self.active_calls[label]:
+            self.call_times[label] = self.call_times.get(label, 0) + time.perf_counter_ns() - start
+
+    def opcode_totals(self) -> list:
+        # (opcode, executions, nanoseconds) of every executed opcode, the most time first
+        totals: dict = {}
+        for instruction, count, spent in zip(self.instructions, self.counts, self.times):
+            if count:
+                name = OPCODES[instruction.opcode]
+                executed, total = totals.get(name, (0, 0))
+                totals[name] = (executed + count, total + spent)
+        return sorted(((name, count, spent) for name, (count, spent) in totals.items()),
+                      key=lambda total: total[2], reverse=True)
+
+    def report(self) -> str:
+        executed = sum(self.counts)
+        lines = [f"Executed {executed} instructions in {self.total_time / 1e6:.3f} ms, "
+                 f"maximum call depth {self.max_depth}", ""]
+
+        lines.append(f"{'order':>8} {'opcode':<10} {'count':>12} {'time ms':>12} {'time %':>7}")
+        hot = sorted(range(len(self.instructions)), key=lambda i: self.times[i], reverse=True)
+        for i in hot[:HOT_INSTRUCTIONS]:
+            if not self.counts[i]:
+                break
+            instruction = self.instructions[i]
+            lines.append(f"{str(instruction.order):>8} {OPCODES[instruction.opcode]:<10} {self.counts[i]:>12} "
+                         f"{self.times[i] / 1e6:>12.3f} {self.percent(self.times[i]):>7.1f}")
+
+        lines += ["", f"{'opcode':<10} {'count':>12} {'time ms':>12} {'ns each':>10} {'time %':>7}"]
+        for name, count, spent in self.opcode_totals():
+            lines.append(f"{name:<10} {count:>12} {spent / 1e6:>12.3f} {spent / count:>10.0f} "
+                         f"{self.percent(spent):>7.1f}")
+
+        if self.call_counts:
+            lines += ["", f"{'label':<20} {'calls':>10} {'inclusive ms':>14} {'time %':>7}"]
+            for label in sorted(self.call_counts, key=lambda label: self.call_times.get(label, 0), reverse=True):
+                spent = self.call_times.get(label, 0)
+                lines.append(f"{label:<20} {self.call_counts[label]:>10} {spent / 1e6:>14.3f} "
+                             f"{self.percent(spent):>7.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def percent(self, spent: int) -> float:
+        return 100 * spent / self.total_time if self.total_time else 0.0
+
+    def collapsed_stacks(self) -> str:
+        # One "main;@caller;@callee nanoseconds" line per stack, the format flamegraph.pl reads
+        return ''.join(f"{';'.join(stack)} {spent}\n" for stack, spent in sorted(self.stack_times.items()))
+
+    def write(self, report_file: str | None, stacks_file: str | None) -> None:
+        if report_file is not None:
+            with open(report_file, 'w', encoding='utf-8') as file:
+                file.write(self.report())
+        if stacks_file is not None:
+            with open(stacks_file, 'w', encoding='utf-8') as file:
+                file.write(self.collapsed_stacks())
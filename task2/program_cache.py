@@ -0,0 +1,99 @@
+import os
+import hashlib
+import tempfile
+from decoder import Program, DECODER_VERSION
+from binary_format import VERSION as FORMAT_VERSION, READ_ERRORS, dump_program, read_binary_program
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+SUFFIX = '.tacb'
+
+
+# Directory of decoded programs in the binary format, named by a hash of the XML file and the decoder and
+# format versions. Entries are written to a temporary file and renamed into place, so other processes
+# either see a whole entry or none. Reading an entry touches it, the least recently used entries are
+# removed once the directory grows over max_size bytes.
+class ProgramCache:
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: bytes) -> str:
+        digest = hashlib.sha256(f'3AC {DECODER_VERSION} {FORMAT_VERSION}\n'.encode('ascii'))
+        digest.update(source)
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, program_file: str, decode) -> Program:
+        # Returns the cached program, or decodes the file with decode(program_file) and stores the result
+        try:
+            with open(program_file, 'rb') as file:
+                source = file.read()
+        except OSError:
+            # Left to decode to report
+            return decode(program_file)
+        path = self.entry_path(self.key(source))
+        try:
+            program = read_binary_program(path)
+            os.utime(path)
+            self.hits += 1
+            return program
+        except READ_ERRORS:
+            # Missing, evicted meanwhile by another process, or unreadable, all decoded again
+            pass
+        self.misses += 1
+        program = decode(program_file)
+        self.store(path, program)
+        return program
+
+    def store(self, path: str, program: Program) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(dump_program(program))
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+            self.evict()
+        except OSError:
+            # The cache only saves time, a program still runs when it cannot be written
+            pass
+
+    def entries(self) -> list:
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> None:
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        # Oldest first, removed until the rest fits
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,95 @@
+import os
+import time
+import tempfile
+import unittest
+from decoder import load_program
+from exception_handler import ExceptionHandler, ErrorCodes
+from binary_format import dump_program
+from program_cache import ProgramCache, SUFFIX
+
+PROGRAM = '''<program name="cached">
+  <tac opcode="MOV" order="1"><dst type="variable">x</dst><src1 type="integer">{}</src1></tac>
+  <tac opcode="PRINTLN" order="2"><src1 type="variable">x</src1></tac>
+</program>'''
+
+
+class ProgramCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.program_file = os.path.join(directory.name, 'program.xml')
+        self.cache_directory = os.path.join(directory.name, 'cache')
+        self.write_program(1)
+        self.decoded = []
+
+    def write_program(self, value: int) -> None:
+        with open(self.program_file, 'w', encoding='utf-8') as file:
+            file.write(PROGRAM.format(value))
+
+    def decode(self, path: str):
+        self.decoded.append(path)
+        return load_program(path)
+
+    def entries(self) -> list:
+        return [name for name in os.listdir(self.cache_directory) if name.endswith(SUFFIX)]
+
+    def test_second_load_is_a_hit(self):
+        cache = ProgramCache(self.cache_directory)
+        first = cache.load(self.program_file, self.decode)
+        second = cache.load(self.program_file, self.decode)
+        self.assertEqual((cache.hits, cache.misses, len(self.decoded)), (1, 1, 1))
+        self.assertEqual(dump_program(second), dump_program(first))
+        # Another process sees the entry too
+        other = ProgramCache(self.cache_directory)
+        other.load(self.program_file, self.decode)
+        self.assertEqual((other.hits, len(self.decoded)), (1, 1))
+
+    def test_changed_file_is_decoded_again(self):
+        cache = ProgramCache(self.cache_directory)
+        cache.load(self.program_file, self.decode)
+        self.write_program(2)
+        program = cache.load(self.program_file, self.decode)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(program.instructions[0].src1, load_program(self.program_file).instructions[0].src1)
+        self.assertEqual(len(self.entries()), 2)
+
+    def test_corrupt_entry_is_decoded_again(self):
+        cache = ProgramCache(self.cache_directory)
+        expected = dump_program(cache.load(self.program_file, self.decode))
+        for entry in self.entries():
+            with open(os.path.join(self.cache_directory, entry), 'r+b') as file:
+                file.truncate(10)
+        program = cache.load(self.program_file, self.decode)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(dump_program(program), expected)
+        # The entry was written again
+        cache.load(self.program_file, self.decode)
+        self.assertEqual(cache.hits, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ProgramCache(self.cache_directory)
+        cache.load(self.program_file, self.decode)
+        entry_size = os.path.getsize(os.path.join(self.cache_directory, self.entries()[0]))
+        cache.max_size = 2 * entry_size
+        for value in (2, 3):
+            # Modification times can be too coarse to order entries written right after each other
+            time.sleep(0.05)
+            self.write_program(value)
+            cache.load(self.program_file, self.decode)
+        self.assertEqual(len(self.entries()), 2)
+        self.write_program(1)
+        cache.load(self.program_file, self.decode)
+        self.assertEqual(cache.misses, 4)
+
+    def test_missing_program_is_left_to_decode(self):
+        cache = ProgramCache(self.cache_directory)
+        missing = os.path.join(os.path.dirname(self.program_file), 'missing.xml')
+        with self.assertRaises(ExceptionHandler) as raised:
+            cache.load(missing, self.decode)
+        self.assertEqual(raised.exception.error_code, ErrorCodes.PARSING_ERROR)
+        self.assertEqual(self.decoded, [missing])
+        self.assertFalse(os.path.exists(self.cache_directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+# Long running interpreter server. Programs are decoded once and kept warm, so a request costs neither the
+# Python startup nor parsing the XML. The server listens on a Unix domain socket or a localhost TCP port,
+# worker processes accept the connections, every worker serves one connection at a time. A connection that
+# sends no request for --idle-timeout seconds is closed, so idle clients do not hold the workers.
+#
+# The protocol is one JSON object per line in both directions, UTF-8 encoded. A request:
+#   {"id": 1, "program": "path/to/program.xml", "input": ["5", "hello"], "max_steps": 100000}
+# "xml" instead of "program" gives the program inline. Optional fields: "input" as a list of lines or a
+# string, "max_steps", "time_limit", "resume" with the snapshot of an earlier response. A request line
+# longer than --max-request-bytes is answered with BAD_REQUEST and closes the connection.
+# Responses, with the id of the request:
+#   {"id": 1, "output": "..."}  zero or more, the output of the program as it is printed
+#   {"id": 1, "exit_code": 0, "error": null, "message": null, "input_lines": 2, "output_length": 10,
+#    "steps": null, "seconds": 0.0001}  once the run is over, with "snapshot" if its limits stopped it
+#   {"id": 1, "exit_code": null, "error": "BAD_REQUEST", "message": "..."}  for a request that cannot be run
+import os
+import sys
+import json
+import stat
+import socket
+import signal
+import hashlib
+import argparse
+import multiprocessing
+import multiprocessing.connection
+from collections import OrderedDict
+import api
+from exception_handler import ExceptionHandler, ErrorCodes
+from output_writer import DEFAULT_BUFFER_SIZE
+from program_cache import ProgramCache, DEFAULT_CACHE_SIZE
+from snapshot import Snapshot
+
+BAD_REQUEST = 'BAD_REQUEST'
+# Loaded programs every worker keeps in memory
+DEFAULT_PROGRAM_COUNT = 256
+# Seconds a worker waits for the next request of a connection before it closes it
+DEFAULT_IDLE_TIMEOUT = 60.0
+# Bytes of the longest request line read by default, without its newline, a longer one is answered with
+# BAD_REQUEST and closes the connection
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+# Sends the output of a run to the client as it is flushed by the interpreter
+class OutputStream:
+    def __init__(self, connection: socket.socket, request_id) -> None:
+        self.connection = connection
+        self.request_id = request_id
+
+    def write(self, text: str) -> None:
+        send(self.connection, {'id': self.request_id, 'output': text})
+
+    def flush(self) -> None:
+        pass
+
+
+# Programs loaded by one worker, least recently used ones are dropped. Programs from files are also kept
+# decoded in the cache directory shared by all workers.
+class LoadedPrograms:
+    def __init__(self, options: dict, cache: ProgramCache | None, max_count: int) -> None:
+        self.options = options
+        self.cache = cache
+        self.max_count = max_count
+        self.programs: OrderedDict = OrderedDict()
+
+    def get(self, request: dict) -> api.LoadedProgram:
+        if 'xml' in request:
+            source = request['xml'].encode('utf-8')
+            key = ('xml', hashlib.sha256(source).hexdigest())
+        else:
+            path = request['program']
+            try:
+                status = os.stat(path)
+            except OSError as exc:
+                # Like taci.py, a program file that cannot be opened is a parsing error
+                raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from exc
+            # A changed file is loaded again
+            key = ('program', os.path.abspath(path), status.st_mtime_ns, status.st_size)
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            return program
+        if key[0] == 'xml':
+            program = api.load(source, **self.options)
+        else:
+            program = api.load_file(path, self.cache, **self.options)
+        self.programs[key] = program
+        if len(self.programs) > self.max_count:
+            self.programs.popitem(last=False)
+        return program
+
+
+def send(connection: socket.socket, message: dict) -> None:
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def handle_request(connection: socket.socket, programs: LoadedPrograms, line: bytes, limits: dict) -> None:
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        if not isinstance(request, dict) or ('program' in request) == ('xml' in request):
+            raise ValueError('a request needs either "program" or "xml"')
+        resume = Snapshot.from_dict(request['resume']) if request.get('resume') is not None else None
+        input_lines = request.get('input', ())
+        # Iterating a JSON object would give its keys, so only a string or a list is accepted
+        if not isinstance(input_lines, (str, list, tuple)) or \
+                not isinstance(input_lines, str) and not all(isinstance(line, str) for line in input_lines):
+            raise ValueError('"input" must be a string or a list of strings')
+        max_steps = request.get('max_steps', limits['max_steps'])
+        if max_steps is not None and (type(max_steps) is not int or max_steps < 0):
+            raise ValueError('"max_steps" must be a non-negative integer')
+        time_limit = request.get('time_limit', limits['time_limit'])
+        if time_limit is not None and (type(time_limit) not in (int, float) or time_limit < 0):
+            raise ValueError('"time_limit" must be a non-negative number of seconds')
+        program = programs.get(request)
+    except ExceptionHandler as e:
+        # The program cannot be decoded, answered like a run that failed before its first instruction
+        send(connection, {'id': request_id, 'exit_code': e.error_code.value, 'error': e.error_code.name,
+                          'message': e.error_message})
+        return
+    except (ValueError, TypeError, KeyError, AttributeError, OSError) as e:
+        send(connection, {'id': request_id, 'exit_code': None, 'error': BAD_REQUEST, 'message': str(e)})
+        return
+    result = program.run(input_lines, OutputStream(connection, request_id), max_steps, time_limit, resume)
+    response = {
+        'id': request_id, 'exit_code': result.exit_code,
+        'error': result.error.name if result.error is not None else None, 'message': result.error_message,
+        'input_lines': result.input_lines, 'output_length': result.output_length, 'steps': result.steps,
+        'seconds': result.seconds,
+    }
+    if result.snapshot is not None:
+        response['snapshot'] = result.snapshot.to_dict()
+    send(connection, response)
+
+
+def serve_connection(connection: socket.socket, programs: LoadedPrograms, limits: dict,
+                     max_request_bytes: int = MAX_REQUEST_BYTES) -> None:
+    with connection, connection.makefile('rb') as requests:
+        while True:
+            line = requests.readline(max_request_bytes + 1)
+            if not line:
+                return
+            if len(line) > max_request_bytes and not line.endswith(b'\n'):
+                # The rest of the line is not read, so the next request cannot be found
+                send(connection, {'id': None, 'exit_code': None, 'error': BAD_REQUEST,
+                                  'message': f'a request line is longer than {max_request_bytes} bytes'})
+                return
+            if line.strip():
+                handle_request(connection, programs, line, limits)
+
+
+def worker(listener: socket.socket, options: dict, cache_dir: str | None, cache_size: int, program_count: int,
+           limits: dict, idle_timeout: float | None, max_request_bytes: int) -> None:
+    # The server process stops the workers, an interrupt of the terminal is left to it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cache = ProgramCache(cache_dir, cache_size) if cache_dir else None
+    programs = LoadedPrograms(options, cache, program_count)
+    while True:
+        connection, _ = listener.accept()
+        # An idle client would hold the worker forever, reading its next request times out
+        connection.settimeout(idle_timeout)
+        try:
+            serve_connection(connection, programs, limits, max_request_bytes)
+        except OSError:
+            pass  # The client went away or was idle, the worker carries on with the next connection
+
+
+def create_listener(socket_path: str | None, host: str, port: int | None) -> socket.socket:
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            # A socket left behind by an earlier server is replaced, any other file is not ours to remove
+            if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                raise FileExistsError(f"{socket_path} exists and is not a socket")
+            os.unlink(socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(socket_path)
+    else:
+        listener = socket.create_server((host, port))
+    listener.listen(128)
+    return listener
+
+
+def serve(listener: socket.socket, workers: int, worker_args: tuple) -> None:
+    # Workers that die are replaced, the server runs until it is interrupted or terminated
+    processes = []
+
+    def start_worker():
+        process = multiprocessing.Process(target=worker, args=(listener, *worker_args), daemon=True)
+        process.start()
+        processes.append(process)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for _ in range(workers):
+            start_worker()
+        while True:
+            multiprocessing.connection.wait([process.sentinel for process in processes])
+            for process in [process for process in processes if not process.is_alive()]:
+                processes.remove(process)
+                start_worker()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Runs 3-AC programs sent as JSON lines over a local socket.')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket', dest='socket_path', help='Unix domain socket to listen on.')
+    address.add_argument('--port', type=int, help='TCP port to listen on.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address of the TCP port, localhost by default.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes, each serves one connection at a time.')
+    parser.add_argument('--compile', dest='compiled', action='store_true',
+                        help='Translate the programs to Python code when they are loaded.')
+    parser.add_argument('--optimize', action='store_true', help='Optimize the programs when they are loaded.')
+    parser.add_argument('--no-fusion', dest='fusion', action='store_false',
+                        help='Execute every instruction on its own instead of fusing common pairs.')
+    parser.add_argument('--output-buffer-size', dest='output_buffer_size', type=int, default=DEFAULT_BUFFER_SIZE,
+                        help='Number of characters printed before they are sent to the client, 0 sends every PRINT.')
+    parser.add_argument('--cache-dir', dest='cache_dir', default=os.environ.get('TACI_CACHE_DIR'),
+                        help='Directory where decoded programs are kept for all workers and later servers.')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Size in bytes the cache directory is kept under.')
+    parser.add_argument('--programs', dest='program_count', type=int, default=DEFAULT_PROGRAM_COUNT,
+                        help='Number of loaded programs every worker keeps in memory.')
+    parser.add_argument('--max-steps', dest='max_steps', type=int, default=None,
+                        help='Instruction budget of a request that does not set its own.')
+    parser.add_argument('--time-limit', dest='time_limit', type=float, default=None,
+                        help='Seconds a request that does not set its own may run.')
+    parser.add_argument('--idle-timeout', dest='idle_timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='Seconds a connection may wait between requests before it is closed, 0 for no limit.')
+    parser.add_argument('--max-request-bytes', dest='max_request_bytes', type=int, default=MAX_REQUEST_BYTES,
+                        help='Bytes of the longest request line, a longer one closes the connection.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    options = {'optimize': args.optimize, 'compiled': args.compiled, 'fusion': args.fusion,
+               'output_buffer_size': args.output_buffer_size}
+    limits = {'max_steps': args.max_steps, 'time_limit': args.time_limit}
+    idle_timeout = args.idle_timeout if args.idle_timeout > 0 else None
+    try:
+        listener = create_listener(args.socket_path, args.host, args.port)
+    except OSError as e:
+        sys.stderr.write(f"Error: {e}\n")
+        sys.exit(ErrorCodes.INTERNAL_ERROR.value)
+    sys.stderr.write(f"Listening on {listener.getsockname()}\n")
+    try:
+        serve(listener, args.workers,
+              (options, args.cache_dir, args.cache_size, args.program_count, limits, idle_timeout,
+               args.max_request_bytes))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if args.socket_path is not None and os.path.exists(args.socket_path) and \
+                stat.S_ISSOCK(os.stat(args.socket_path).st_mode):
+            os.unlink(args.socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import unittest
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROGRAM = '<program><tac opcode="PRINTLN" order="1"><src1 type="string">hello</src1></tac></program>'
+
+
+def start_server(socket_path: str, *options: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, os.path.join(HERE, 'server.py'), '--socket', socket_path,
+                             '--workers', '1', *options], stderr=subprocess.PIPE, cwd=HERE)
+
+
+def connect(socket_path: str) -> socket.socket:
+    for _ in range(100):
+        try:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(socket_path)
+            connection.settimeout(10)
+            return connection
+        except (FileNotFoundError, ConnectionRefusedError):
+            connection.close()
+            time.sleep(0.05)
+    raise AssertionError('the server did not start')
+
+
+def request(connection: socket.socket, message: dict) -> list:
+    # The responses to the message up to the one with the exit code
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+    responses = []
+    with connection.makefile('rb') as lines:
+        for line in lines:
+            responses.append(json.loads(line))
+            if 'exit_code' in responses[-1]:
+                break
+    return responses
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'taci.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def serve(self, *options: str) -> socket.socket:
+        server = start_server(self.socket_path, *options)
+
+        def stop():
+            server.terminate()
+            server.wait()
+            server.stderr.close()
+        self.addCleanup(stop)
+        connection = connect(self.socket_path)
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_runs_inline_program(self):
+        connection = self.serve()
+        responses = request(connection, {'id': 1, 'xml': PROGRAM})
+        self.assertEqual(''.join(response.get('output', '') for response in responses), 'hello\n')
+        self.assertEqual(responses[-1]['exit_code'], 0)
+
+    def test_missing_program_file_is_parsing_error(self):
+        connection = self.serve()
+        path = os.path.join(self.directory.name, 'missing.xml')
+        response = request(connection, {'id': 1, 'program': path})[-1]
+        self.assertEqual((response['exit_code'], response['error']), (20, 'PARSING_ERROR'))
+
+    def test_invalid_limits_are_bad_requests(self):
+        connection = self.serve()
+        for limits in ({'max_steps': '10'}, {'max_steps': -1}, {'max_steps': 1.5}, {'time_limit': 'soon'}):
+            response = request(connection, {'id': 1, 'xml': PROGRAM, **limits})[-1]
+            self.assertEqual((response['exit_code'], response['error']), (None, 'BAD_REQUEST'), limits)
+        # The connection is still served
+        self.assertEqual(request(connection, {'id': 2, 'xml': PROGRAM, 'max_steps': 10})[-1]['exit_code'], 0)
+
+    def test_input_must_be_string_or_list_of_strings(self):
+        connection = self.serve()
+        for input_lines in ({'5': 1}, ['5', 1], 5, None):
+            response = request(connection, {'id': 1, 'xml': PROGRAM, 'input': input_lines})[-1]
+            self.assertEqual((response['exit_code'], response['error']), (None, 'BAD_REQUEST'), input_lines)
+        for input_lines in ('5\n', ['5']):
+            self.assertEqual(request(connection, {'id': 2, 'xml': PROGRAM, 'input': input_lines})[-1]['exit_code'], 0)
+
+    def test_oversized_request_line_is_rejected(self):
+        connection = self.serve('--max-request-bytes', '1000')
+        self.assertEqual(request(connection, {'id': 1, 'xml': PROGRAM + ' ' * 700})[-1]['exit_code'], 0)
+        response = request(connection, {'id': 2, 'xml': PROGRAM + ' ' * 1000})[-1]
+        self.assertEqual((response['exit_code'], response['error']), (None, 'BAD_REQUEST'))
+        # The rest of the line is not read, the connection is closed
+        self.assertEqual(connection.recv(1), b'')
+
+    def test_idle_connection_is_closed(self):
+        connection = self.serve('--idle-timeout', '0.2')
+        self.assertEqual(connection.recv(1), b'')
+        # The worker serves the next client
+        with connect(self.socket_path) as other:
+            self.assertEqual(request(other, {'id': 1, 'xml': PROGRAM})[-1]['exit_code'], 0)
+
+    def test_does_not_remove_a_regular_file(self):
+        with open(self.socket_path, 'w', encoding='utf-8') as file:
+            file.write('data')
+        server = start_server(self.socket_path)
+        _, errors = server.communicate(timeout=30)
+        self.assertEqual(server.returncode, 99)
+        self.assertIn(b'not a socket', errors)
+        with open(self.socket_path, encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'data')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+from exception_handler import ExceptionHandler, ErrorCodes
+from variable import TYPE_INTEGER, TYPE_STRING
+
+SNAPSHOT_VERSION = 1
+
+
+# Machine state of a run stopped between two instructions, from which a later run continues.
+# Variables are kept by name and the program by a digest of its instructions, a snapshot is only resumed
+# with the program it was taken from.
+class Snapshot:
+    def __init__(self, program: str, pc: int, variables: dict, data_stack: list, call_stack: list,
+                 input_position: int, output_offset: int, steps: int) -> None:
+        self.program = program  # Digest of the instructions, see program_digest
+        self.pc = pc  # Index of the next instruction to execute
+        self.variables = variables  # Name: (type, value) of every assigned variable
+        self.data_stack = data_stack
+        self.call_stack = call_stack  # Indices of the CALLs to return after
+        self.input_position = input_position  # Input lines read so far
+        self.output_offset = output_offset  # Characters printed so far
+        self.steps = steps  # Instructions executed by all runs so far
+
+    def to_dict(self) -> dict:
+        return {
+            'version': SNAPSHOT_VERSION, 'program': self.program, 'pc': self.pc,
+            'variables': {name: list(variable) for name, variable in self.variables.items()},
+            'data_stack': self.data_stack, 'call_stack': self.call_stack,
+            'input_position': self.input_position, 'output_offset': self.output_offset, 'steps': self.steps,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Snapshot':
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {data.get('version')}")
+        variables = {}
+        for name, (value_type, value) in data['variables'].items():
+            if (value_type, type(value)) not in ((TYPE_INTEGER, int), (TYPE_STRING, str)):
+                raise ValueError(f"invalid value of variable {name}")
+            variables[name] = (value_type, value)
+        for value in data['data_stack']:
+            if type(value) not in (int, str):
+                raise ValueError("invalid value on the data stack")
+        return cls(data['program'], int(data['pc']), variables, list(data['data_stack']),
+                   [int(index) for index in data['call_stack']], int(data['input_position']),
+                   int(data['output_offset']), int(data['steps']))
+
+
+def program_digest(instructions: list) -> str:
+    digest = hashlib.sha256()
+    for instruction in instructions:
+        digest.update(repr((instruction.opcode, instruction.dst, instruction.src1, instruction.src2,
+                            instruction.target)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_snapshot(snapshot: Snapshot, path: str) -> None:
+    # Written next to the target and renamed over it, an interrupted save keeps the previous snapshot
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(snapshot.to_dict(), file)
+        file.write('\n')
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str) -> Snapshot:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return Snapshot.from_dict(json.load(file))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ExceptionHandler(ErrorCodes.PARSING_ERROR) from e
+
+
+def truncate_output(path: str, offset: int) -> None:
+    # Drops whatever was printed after the snapshot, e.g. by a run resumed from it before, so the resumed
+    # run appends to exactly the output the snapshot was taken with
+    try:
+        with open(path, 'r+', encoding='utf-8', newline='') as file:
+            if len(file.read(offset)) < offset:
+                raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
+            # The position after reading a UTF-8 file is its byte offset
+            file.truncate(file.tell())
+    except FileNotFoundError:
+        if offset:
+            raise ExceptionHandler(ErrorCodes.RUNTIME_ERROR)
@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+import api
+from snapshot import load_snapshot, save_snapshot
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Counts down from the input, printing every number and the strings built on the way to the stack
+COUNTDOWN = '''<program name="countdown">
+  <tac opcode="READINT" order="1"><dst type="variable">n</dst></tac>
+  <tac opcode="MOV" order="2"><dst type="variable">text</dst><src1 type="string">go</src1></tac>
+  <tac opcode="LABEL" order="3"><dst type="label">@loop</dst></tac>
+  <tac opcode="PRINTLN" order="4"><src1 type="variable">n</src1></tac>
+  <tac opcode="CONCAT" order="5"><dst type="variable">text</dst><src1 type="variable">text</src1>
+    <src2 type="string">!</src2></tac>
+  <tac opcode="PUSH" order="6"><src1 type="variable">text</src1></tac>
+  <tac opcode="SUB" order="7"><dst type="variable">n</dst><src1 type="variable">n</src1>
+    <src2 type="integer">1</src2></tac>
+  <tac opcode="JUMPIFLT" order="8"><dst type="label">@loop</dst><src1 type="integer">0</src1>
+    <src2 type="variable">n</src2></tac>
+  <tac opcode="POP" order="9"><dst type="variable">last</dst></tac>
+  <tac opcode="READSTR" order="10"><dst type="variable">name</dst></tac>
+  <tac opcode="PRINT" order="11"><src1 type="variable">name</src1></tac>
+  <tac opcode="PRINTLN" order="12"><src1 type="variable">last</src1></tac>
+</program>'''
+INPUT = ['20', 'liftoff']
+MODES = {'dispatch': {}, 'without fusion': {'fusion': False}, 'compiled': {'compiled': True}}
+
+
+class ResumeTest(unittest.TestCase):
+    def test_resumed_runs_continue_where_they_stopped(self):
+        for mode, options in MODES.items():
+            program = api.load(COUNTDOWN, **options)
+            expected = program.run(INPUT)
+            for max_steps in (1, 7, 50):
+                with self.subTest(mode=mode, max_steps=max_steps):
+                    result = program.run(INPUT, max_steps=max_steps)
+                    output = result.output
+                    while result.snapshot is not None:
+                        self.assertEqual(result.exit_code, 31)
+                        result = program.run(INPUT, max_steps=max_steps, resume=result.snapshot)
+                        output += result.output
+                    self.assertEqual((result.exit_code, output), (expected.exit_code, expected.output))
+
+    def test_snapshot_file_round_trip(self):
+        snapshot = api.load(COUNTDOWN).run(INPUT, max_steps=30).snapshot
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.json')
+            save_snapshot(snapshot, path)
+            self.assertEqual(load_snapshot(path).to_dict(), snapshot.to_dict())
+
+    def test_snapshot_of_another_program_is_rejected(self):
+        snapshot = api.load(COUNTDOWN).run(INPUT, max_steps=30).snapshot
+        other = COUNTDOWN.replace('<src2 type="integer">1</src2>', '<src2 type="integer">2</src2>')
+        self.assertEqual(api.load(other).run(INPUT, resume=snapshot).exit_code, 30)
+
+    def test_taci_resumes_into_the_same_output_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program = os.path.join(directory, 'countdown.xml')
+            input_file = os.path.join(directory, 'countdown.in')
+            output = os.path.join(directory, 'countdown.txt')
+            snapshot = os.path.join(directory, 'countdown.json')
+            with open(program, 'w', encoding='utf-8') as file:
+                file.write(COUNTDOWN)
+            with open(input_file, 'w', encoding='utf-8') as file:
+                file.write('\n'.join(INPUT) + '\n')
+            command = [sys.executable, os.path.join(HERE, 'taci.py'), program, output, '--input', input_file,
+                       '--max-steps', '40', '--snapshot', snapshot]
+            run = subprocess.run(command, capture_output=True, cwd=HERE)
+            runs = 1
+            while run.returncode == 31:
+                run = subprocess.run(command + ['--resume', snapshot], capture_output=True, cwd=HERE)
+                runs += 1
+            self.assertEqual(run.returncode, 0)
+            self.assertGreater(runs, 2)
+            # Compared with a run without limits, strings read from an input file keep their newline
+            full_output = os.path.join(directory, 'full.txt')
+            subprocess.run(command[:3] + [full_output, '--input', input_file], capture_output=True, cwd=HERE)
+            with open(output, encoding='utf-8') as file, open(full_output, encoding='utf-8') as full:
+                self.assertEqual(file.read(), full.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+from bisect import bisect_right
+
+# Length from which CONCAT builds a StringBuilder instead of a new str
+BUILDER_THRESHOLD = 1024
+# Characters appended to the tail of a builder before it is moved to the chunks as one piece
+CHUNK_SIZE = 256
+
+
+# A string value built by CONCAT without copying what was built before. A builder is immutable like a str:
+# append returns a new builder, which shares the chunks list with the one it was appended to. Only the
+# builder at the end of the list appends to it, the others see the prefix of count chunks they were made
+# with, and copy it on their first append. So CONCAT s s c in a loop is linear, also when an earlier value
+# of s is kept in another variable.
+class StringBuilder:
+    __slots__ = ('chunks', 'ends', 'count', 'tail', 'length', 'flat')
+
+    def __init__(self, chunks: list, ends: list, count: int, tail: str, length: int) -> None:
+        self.chunks = chunks  # Strings of at least CHUNK_SIZE characters
+        self.ends = ends  # Offset after every chunk, for indexing
+        self.count = count  # Chunks of the shared list that belong to this value
+        self.tail = tail  # Characters after the chunks, shorter than CHUNK_SIZE
+        self.length = length
+        self.flat: str | None = None  # The whole string, once something needed it
+
+    @classmethod
+    def from_str(cls, text: str) -> 'StringBuilder':
+        return cls([text], [len(text)], 1, '', len(text))
+
+    def append(self, text: str) -> 'StringBuilder':
+        tail = self.tail + text
+        length = self.length + len(text)
+        if len(tail) < CHUNK_SIZE:
+            return StringBuilder(self.chunks, self.ends, self.count, tail, length)
+        chunks = self.chunks
+        ends = self.ends
+        if self.count != len(chunks):
+            # Another value was appended to this one before, its chunks are not ours to extend
+            chunks = chunks[:self.count]
+            ends = ends[:self.count]
+        chunks.append(tail)
+        ends.append(length)
+        return StringBuilder(chunks, ends, self.count + 1, '', length)
+
+    def flatten(self) -> str:
+        if self.flat is None:
+            self.flat = ''.join(self.chunks[:self.count]) + self.tail
+        return self.flat
+
+    def __str__(self) -> str:
+        return self.flatten()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> str:
+        # A single character, found without flattening
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('string index out of range')
+        if self.flat is not None:
+            return self.flat[index]
+        chunk = bisect_right(self.ends, index, 0, self.count)
+        if chunk == self.count:
+            return self.tail[index - (self.ends[chunk - 1] if chunk else 0)]
+        return self.chunks[chunk][index - (self.ends[chunk - 1] if chunk else 0)]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return len(self) == len(other) and self.flatten() == str(other)
+        return NotImplemented
+
+    def __lt__(self, other) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return self.flatten() < str(other)
+        return NotImplemented
+
+    def __gt__(self, other) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return self.flatten() > str(other)
+        return NotImplemented
+
+    def __le__(self, other) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return self.flatten() <= str(other)
+        return NotImplemented
+
+    def __ge__(self, other) -> bool:
+        if isinstance(other, (str, StringBuilder)):
+            return self.flatten() >= str(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.flatten())
+
+    def __repr__(self) -> str:
+        return f"StringBuilder({self.flatten()!r})"
+
+
+# Python types of a string value
+STRING_TYPES = (str, StringBuilder)
+
+
+def concat(first, second):
+    # first + second for strings and builders, a builder once the result is long
+    if type(first) is StringBuilder:
+        return first.append(str(second))
+    if len(first) + len(second) < BUILDER_THRESHOLD:
+        return first + str(second)
+    return StringBuilder.from_str(first).append(str(second))
+
+
+def plain_value(value):
+    # The value as an int or a str, for anything that keeps or shows it outside the interpreter
+    return value.flatten() if type(value) is StringBuilder else value
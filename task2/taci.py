@@ -3,10 +3,22 @@ Matas Stankaitis | xstankm00
 VUT FIT IPPe
 """
 import os
+import time
 import argparse
 import sys
 from interpreter import Interpreter
-from exception_handler import ExceptionHandler
+from input_reader import open_input
+from output_writer import DEFAULT_BUFFER_SIZE
+from program_cache import ProgramCache, DEFAULT_CACHE_SIZE
+from profiler import Profiler
+from limits import ExecutionLimits
+from snapshot import load_snapshot, save_snapshot, truncate_output
+from batch import (discover_cases, run_batch, summarize, print_summary, write_json_report,
+                   write_junit_report, PASSED)
+from exception_handler import ExceptionHandler, ErrorCodes
+
+# Codes of a run stopped by its limits, the state it stopped in is saved with --snapshot
+LIMIT_ERRORS = (ErrorCodes.STEP_LIMIT_ERROR, ErrorCodes.TIME_LIMIT_ERROR)
 
 
 def write_rc_file(path: str, code: int):
@@ -19,34 +31,124 @@ def parse_arguments():
     parser = argparse.ArgumentParser(
         description='3-AC instructions interpreter.')
     parser.add_argument(
-        'program', help='Program file with XML representation of an IPPeCode source code.')
+        'program', nargs='?', help='Program file with XML or binary representation of an IPPeCode source code.')
     parser.add_argument('--input', dest='input_file', default=sys.stdin,
                         help='Input file with data for READINT and READSTR instructions in the program.')
     parser.add_argument('output', nargs='?', default=sys.stdout,
                         help='Optional. Output file for the texts output by PRINT instructions.')
-    return parser.parse_args()
+    parser.add_argument('--output-buffer-size', dest='output_buffer_size', type=int, default=DEFAULT_BUFFER_SIZE,
+                        help='Number of characters buffered before PRINT output is written, 0 writes through.')
+    parser.add_argument('--compile', dest='compiled', action='store_true',
+                        help='Translate the program to Python code before running it, faster for long running programs.')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Run constant folding, copy propagation, dead store elimination and jump threading first.')
+    parser.add_argument('--no-fusion', dest='fusion', action='store_false',
+                        help='Execute every instruction on its own instead of fusing common pairs, for debugging.')
+    parser.add_argument('--check', action='store_true',
+                        help='Report the instructions that fail whenever they are executed, found by the type '
+                             'analysis, and exit with the code of the first one instead of running the program.')
+    parser.add_argument('--cache-dir', dest='cache_dir', default=os.environ.get('TACI_CACHE_DIR'),
+                        help='Directory where decoded programs are kept, so repeated runs skip parsing the XML.')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Size in bytes the cache directory is kept under by removing least recently used programs.')
+    parser.add_argument('--profile', dest='profile_report',
+                        help='Write a table of the hottest instructions, opcodes and called labels to this file. '
+                             'The program runs slower, without compilation or fusion.')
+    parser.add_argument('--profile-stacks', dest='profile_stacks',
+                        help='Write the time spent under every stack of called labels in the collapsed stack '
+                             'format of flame graph tools to this file.')
+    parser.add_argument('--max-steps', dest='max_steps', type=int, default=None,
+                        help=f'Stop with code {ErrorCodes.STEP_LIMIT_ERROR.value} before executing more instructions '
+                             'than this, LABELs are not counted.')
+    parser.add_argument('--time-limit', dest='time_limit', type=float, default=None,
+                        help=f'Stop with code {ErrorCodes.TIME_LIMIT_ERROR.value} once the program has run for this '
+                             'many seconds, checked between instructions.')
+    parser.add_argument('--snapshot', help='Save the state of a run stopped by --max-steps or --time-limit to '
+                                           'this file.')
+    parser.add_argument('--resume', help='Continue the run saved in this snapshot file, with the same program, '
+                                         'input and output.')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='Run every program in the directories, matching the globs or listed, with its .in input '
+                             'and compare the output and code with its .out and .rc files.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes running a batch, 1 runs it in this process. Default: CPU count.')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Seconds a program of a batch may run before it counts as timed out.')
+    parser.add_argument('--json-report', dest='json_report', help='Write the results of a batch to this JSON file.')
+    parser.add_argument('--junit-report', dest='junit_report', help='Write the results of a batch as JUnit XML.')
+    args = parser.parse_args()
+    if args.program is None and args.batch is None:
+        parser.error('the program or --batch is required')
+    return args
+
+
+def run_batch_mode(args) -> None:
+    cache = ProgramCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    options = {'output_buffer_size': args.output_buffer_size, 'compiled': args.compiled,
+               'optimize': args.optimize, 'fusion': args.fusion, 'cache': cache, 'limits': make_limits(args)}
+    start = time.perf_counter()
+    results = run_batch(discover_cases(args.batch), options, args.workers, args.timeout)
+    summary = summarize(results, time.perf_counter() - start)
+    if args.json_report:
+        write_json_report(args.json_report, results, summary)
+    if args.junit_report:
+        write_junit_report(args.junit_report, results, summary)
+    print_summary(results, summary)
+    sys.exit(0 if summary[PASSED] == summary['cases'] else 1)
+
+
+def make_limits(args) -> ExecutionLimits | None:
+    if args.max_steps is None and args.time_limit is None:
+        return None
+    return ExecutionLimits(args.max_steps, args.time_limit)
 
 
 def main():
     args = parse_arguments()
-    if args.input_file != sys.stdin:
-        with open(args.input_file, 'r', encoding='utf-8') as f:
-            args.input_file = f.readlines()
-    else:
-        args.input_file = False
+    if args.batch is not None:
+        run_batch_mode(args)
+    # The input file is opened here and read line by line as READINT/READSTR consume it
+    input_reader = open_input(args.input_file)
 
-    if args.output != sys.stdout:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write('')
+    try:
+        resume = load_snapshot(args.resume) if args.resume is not None else None
+        if args.output != sys.stdout:
+            if resume is not None:
+                # The resumed run appends to the output printed before the snapshot
+                truncate_output(args.output, resume.output_offset)
+            else:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write('')
+    except ExceptionHandler as e:
+        sys.stderr.write(e.error_message + "\n")
+        write_rc_file(args.program, e.error_code.value)
+        sys.exit(e.error_code.value)
 
+    cache = ProgramCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    profiler = Profiler() if args.profile_report or args.profile_stacks else None
     interpreter = Interpreter(
-        args.program, args.input_file, args.output)
+        args.program, input_reader, args.output, args.output_buffer_size, args.compiled,
+        args.optimize, args.fusion, cache, profiler, make_limits(args), resume, args.check)
 
     try:
-        interpreter.start()
+        try:
+            interpreter.start()
+        except ExceptionHandler as e:
+            if e.error_code in LIMIT_ERRORS and args.snapshot is not None:
+                save_snapshot(interpreter.snapshot(), args.snapshot)
+            raise
+        finally:
+            if interpreter.optimization_report is not None:
+                sys.stderr.write(str(interpreter.optimization_report) + "\n")
+            if args.check and interpreter.type_analysis is not None:
+                for error in interpreter.type_analysis.errors:
+                    sys.stderr.write(str(error) + "\n")
+            if profiler is not None:
+                profiler.write(args.profile_report, args.profile_stacks)
         write_rc_file(args.program, 0)
         sys.exit(0)
     except ExceptionHandler as e:
+        sys.stderr.write(e.error_message + "\n")
         write_rc_file(args.program, e.error_code.value)
         sys.exit(e.error_code.value)
     except Exception as e:
@@ -0,0 +1,275 @@
+import sys
+import argparse
+from exception_handler import ExceptionHandler, ErrorCodes
+from cfg import build_cfg
+from decoder import (Program, Instruction, load_program, OPCODES, OP_MOV, OP_ADD, OP_SUB, OP_MUL, OP_DIV,
+                     OP_READINT, OP_READSTR, OP_JUMPIFEQ, OP_JUMPIFLT, OP_POP, OP_CONCAT, OP_GETAT, OP_LEN,
+                     OP_STRINT, OP_INTSTR, OP_INVALID, OP_FUSED, OP_INCREMENT_BRANCH, OP_TYPED_ADD, OP_TYPED_SUB,
+                     OP_TYPED_MUL, OP_TYPED_DIV, OP_TYPED_MOV, OP_TYPED_JUMPIFEQ, OP_TYPED_JUMPIFLT,
+                     OP_TYPED_CONCAT, OP_TYPED_GETAT, OP_TYPED_LEN, OPERAND_INTEGER, OPERAND_STRING,
+                     OPERAND_VARIABLE, OPERAND_INVALID)
+
+# Types a variable may have at a point of the program, as bits of a mask
+UNASSIGNED = 1
+INTEGER = 2
+STRING = 4
+
+# Type assigned to the dst variable, MOV copies the type of its src1 and POP may give either
+RESULT_TYPES = {
+    OP_MOV: None, OP_ADD: INTEGER, OP_SUB: INTEGER, OP_MUL: INTEGER, OP_DIV: INTEGER, OP_READINT: INTEGER,
+    OP_READSTR: STRING, OP_POP: INTEGER | STRING, OP_CONCAT: STRING, OP_GETAT: STRING, OP_LEN: INTEGER,
+    OP_STRINT: INTEGER, OP_INTSTR: STRING,
+}
+# Types the operands must have, the operands of JUMPIFEQ/JUMPIFLT only have to be of the same type
+OPERAND_TYPES = {
+    OP_ADD: (INTEGER, INTEGER), OP_SUB: (INTEGER, INTEGER), OP_MUL: (INTEGER, INTEGER), OP_DIV: (INTEGER, INTEGER),
+    OP_CONCAT: (STRING, STRING), OP_GETAT: (STRING, INTEGER), OP_LEN: (STRING,), OP_STRINT: (STRING,),
+    OP_INTSTR: (INTEGER,),
+}
+COMPARISONS = (OP_JUMPIFEQ, OP_JUMPIFLT)
+# Handlers without the checks the analysis proved unnecessary
+TYPED_OPCODES = {
+    OP_ADD: OP_TYPED_ADD, OP_SUB: OP_TYPED_SUB, OP_MUL: OP_TYPED_MUL, OP_DIV: OP_TYPED_DIV, OP_MOV: OP_TYPED_MOV,
+    OP_JUMPIFEQ: OP_TYPED_JUMPIFEQ, OP_JUMPIFLT: OP_TYPED_JUMPIFLT, OP_CONCAT: OP_TYPED_CONCAT,
+    OP_GETAT: OP_TYPED_GETAT, OP_LEN: OP_TYPED_LEN,
+}
+
+
+# An instruction that fails with error_code whenever it is executed
+class StaticError:
+    def __init__(self, index: int, order, opcode: str, error_code: ErrorCodes) -> None:
+        self.index = index
+        self.order = order
+        self.opcode = opcode
+        self.error_code = error_code
+
+    def __str__(self) -> str:
+        return f"Instruction {self.order} ({self.opcode}): {ExceptionHandler(self.error_code).error_message}"
+
+
+# Types of the operands of every instruction, over all runs of the program
+class TypeAnalysis:
+    def __init__(self, operand_types: list, safe: list, errors: list) -> None:
+        self.operand_types = operand_types  # Masks of src1 and src2, None for an unreachable instruction
+        self.safe = safe  # Reading the operands cannot fail and they have the types the instruction needs
+        self.errors = errors  # StaticErrors in program order
+
+    def assigned(self, index: int, operand: int) -> bool:
+        # Whether operand 0 (src1) or 1 (src2) of the instruction is a value that can be read
+        types = self.operand_types[index]
+        return types is not None and types[operand] != 0 and not types[operand] & UNASSIGNED
+
+
+# Forward may analysis over the control flow graph: for every variable the types it may have, UNASSIGNED
+# included, as three bit sets over the variable slots. RETURN leads to every block after a CALL, so what a
+# subroutine leaves behind is merged over all of its callers. An instruction that certainly fails ends the
+# path, the instructions only reachable through it are unreachable.
+def analyze_types(program: Program, cfg=None) -> TypeAnalysis:
+    if cfg is None:
+        cfg = build_cfg(program)
+    instructions = program.instructions
+    states = [None] * len(cfg.blocks)  # (unassigned, integer, string) at the start of every block
+    if cfg.blocks:
+        states[0] = ((1 << len(program.variables)) - 1, 0, 0)
+    pending = [0] if cfg.blocks else []
+    queued = [False] * len(cfg.blocks)
+    while pending:
+        block = cfg.blocks[pending.pop()]
+        queued[block.id] = False
+        state = states[block.id]
+        for i in range(block.start, block.end):
+            if state is None:
+                break
+            state = transfer(instructions[i], state)
+        if state is None:
+            continue
+        for successor in block.successors:
+            merged = join(states[successor], state)
+            if merged != states[successor]:
+                states[successor] = merged
+                if not queued[successor]:
+                    queued[successor] = True
+                    pending.append(successor)
+
+    operand_types = [None] * len(instructions)
+    safe = [False] * len(instructions)
+    errors = []
+    for block in cfg.blocks:
+        state = states[block.id]
+        for i in range(block.start, block.end):
+            if state is None:
+                break
+            instruction = instructions[i]
+            types = (type_of(instruction.src1, state), type_of(instruction.src2, state))
+            operand_types[i] = types
+            safe[i] = is_safe(instruction, types)
+            error = certain_error(instruction, types)
+            if error is not None:
+                errors.append(StaticError(i, instruction.order, instruction_name(instruction), error))
+            state = transfer(instruction, state)
+    return TypeAnalysis(operand_types, safe, errors)
+
+
+def join(first: tuple | None, second: tuple) -> tuple:
+    if first is None:
+        return second
+    return (first[0] | second[0], first[1] | second[1], first[2] | second[2])
+
+
+def type_of(operand: tuple | None, state: tuple) -> int:
+    if operand is None:
+        return 0
+    kind, value = operand
+    if kind == OPERAND_INTEGER:
+        return INTEGER
+    if kind == OPERAND_STRING:
+        return STRING
+    if kind == OPERAND_VARIABLE:
+        unassigned, integer, string = state
+        return (unassigned >> value & 1) | (integer >> value & 1) << 1 | (string >> value & 1) << 2
+    return 0
+
+
+def transfer(instruction: Instruction, state: tuple) -> tuple | None:
+    # State after the instruction succeeded, None if it cannot succeed
+    types = (type_of(instruction.src1, state), type_of(instruction.src2, state))
+    if certain_error(instruction, types) is not None:
+        return None
+    unassigned, integer, string = state
+    opcode = instruction.opcode
+    required = OPERAND_TYPES.get(opcode, ())
+    if opcode in COMPARISONS:
+        # Compared with a value of a known type, the other operand has the same type
+        required = (types[1] if types[1] in (INTEGER, STRING) else 0,
+                    types[0] if types[0] in (INTEGER, STRING) else 0)
+    for position, operand in enumerate((instruction.src1, instruction.src2)):
+        if operand is not None and operand[0] == OPERAND_VARIABLE:
+            # The operand was read, so it is assigned, and checked to have the type the instruction needs
+            bit = 1 << operand[1]
+            unassigned &= ~bit
+            needed = required[position] if position < len(required) else 0
+            if needed == INTEGER:
+                string &= ~bit
+            elif needed == STRING:
+                integer &= ~bit
+    if opcode in RESULT_TYPES and instruction.dst is not None and instruction.dst[0] == OPERAND_VARIABLE:
+        result = RESULT_TYPES[opcode]
+        if result is None:
+            result = type_of(instruction.src1, (unassigned, integer, string))
+        bit = 1 << instruction.dst[1]
+        unassigned &= ~bit
+        integer = integer | bit if result & INTEGER else integer & ~bit
+        string = string | bit if result & STRING else string & ~bit
+    return (unassigned, integer, string)
+
+
+def certain_error(instruction: Instruction, types: tuple) -> ErrorCodes | None:
+    # Error the instruction raises whenever it is executed, None if it may succeed or fail differently.
+    # The handlers read src1, then src2 and then check the types.
+    opcode = instruction.opcode
+    if opcode == OP_INVALID:
+        return instruction.fault
+    may_fail = False
+    for operand, mask in zip((instruction.src1, instruction.src2), types):
+        if operand is None or operand[0] not in (OPERAND_VARIABLE, OPERAND_INVALID):
+            continue
+        if operand[0] == OPERAND_INVALID:
+            return None if may_fail else operand[1]
+        if mask == UNASSIGNED:
+            return ErrorCodes.READ_ACCESS_ERROR
+        if mask & UNASSIGNED:
+            may_fail = True
+    if may_fail:
+        return None
+    required = OPERAND_TYPES.get(opcode)
+    if required is not None:
+        if any(not mask & needed for mask, needed in zip(types, required)):
+            return ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR
+        if opcode == OP_DIV and instruction.src2 == (OPERAND_INTEGER, 0) and types[0] == INTEGER:
+            return ErrorCodes.DIVISION_BY_ZERO
+    elif opcode in COMPARISONS and not types[0] & types[1]:
+        return ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR
+    return None
+
+
+def is_safe(instruction: Instruction, types: tuple) -> bool:
+    for operand, mask in zip((instruction.src1, instruction.src2), types):
+        if operand is not None and (operand[0] == OPERAND_INVALID or mask & UNASSIGNED):
+            return False
+    required = OPERAND_TYPES.get(instruction.opcode)
+    if required is not None:
+        return all(mask == needed for mask, needed in zip(types, required))
+    if instruction.opcode in COMPARISONS:
+        return types[0] == types[1] and types[0] in (INTEGER, STRING)
+    return True
+
+
+def instruction_name(instruction: Instruction) -> str:
+    if instruction.opcode == OP_INVALID and instruction.source_opcode is not None:
+        return instruction.source_opcode
+    return OPCODES[instruction.opcode]
+
+
+def specialize_instructions(instructions: list, analysis: TypeAnalysis) -> list:
+    # Instructions for the dispatch loop, fused or not, with the typed opcodes where the analysis proved the
+    # checks unnecessary. The decoded instructions are not modified, specialized ones are copies.
+    specialized = list(instructions)
+    for i, instruction in enumerate(instructions):
+        if instruction.opcode == OP_FUSED:
+            first, second = instruction.fused
+            first = specialize(first, i, analysis)
+            second = specialize(second, i + 1, analysis)
+            if first is not instruction.fused[0] or second is not instruction.fused[1]:
+                specialized[i] = copy_instruction(instruction, OP_FUSED)
+                specialized[i].fused = (first, second)
+        elif instruction.opcode == OP_INCREMENT_BRANCH:
+            first, second, slot, step = instruction.fused
+            typed = specialize(second, i + 1, analysis)
+            if typed is not second:
+                specialized[i] = copy_instruction(instruction, OP_INCREMENT_BRANCH)
+                specialized[i].fused = (first, typed, slot, step)
+        else:
+            specialized[i] = specialize(instruction, i, analysis)
+    return specialized
+
+
+def specialize(instruction: Instruction, index: int, analysis: TypeAnalysis) -> Instruction:
+    typed = TYPED_OPCODES.get(instruction.opcode)
+    if typed is None or not analysis.safe[index]:
+        return instruction
+    if instruction.opcode == OP_MOV and instruction.src1[0] != OPERAND_VARIABLE:
+        return instruction  # MOV of a literal has nothing to check
+    return copy_instruction(instruction, typed)
+
+
+def copy_instruction(instruction: Instruction, opcode: int) -> Instruction:
+    copy = Instruction(opcode, instruction.order, instruction.dst, instruction.src1, instruction.src2)
+    copy.target = instruction.target
+    copy.fault = instruction.fault
+    copy.source_opcode = instruction.source_opcode
+    copy.fused = instruction.fused
+    return copy
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Reports the instructions of an IPPeCode program that fail whenever they are executed.')
+    parser.add_argument('program', help='Program file with XML representation of an IPPeCode source code.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    try:
+        program = load_program(args.program)
+    except ExceptionHandler as e:
+        sys.stderr.write(e.error_message + "\n")
+        sys.exit(e.error_code.value)
+    errors = analyze_types(program).errors
+    for error in errors:
+        sys.stderr.write(str(error) + "\n")
+    sys.exit(errors[0].error_code.value if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
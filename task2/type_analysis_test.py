@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+import xml.etree.ElementTree as ET
+from decoder import decode_program, OP_ADD, OP_TYPED_ADD
+from exception_handler import ErrorCodes
+from type_analysis import analyze_types, specialize_instructions
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def program_xml(*instructions: str) -> str:
+    tacs = ''.join(f'<tac order="{i}" {body}</tac>' for i, body in enumerate(instructions, 1))
+    return f'<program>{tacs}</program>'
+
+
+def static_errors(source: str) -> list:
+    analysis = analyze_types(decode_program(ET.fromstring(source)))
+    return [(error.order, error.error_code) for error in analysis.errors]
+
+
+ADD_STRING = program_xml(
+    'opcode="MOV"><dst type="variable">s</dst><src1 type="string">text</src1>',
+    'opcode="PRINTLN"><src1 type="string">before</src1>',
+    'opcode="ADD"><dst type="variable">x</dst><src1 type="variable">s</src1><src2 type="integer">1</src2>',
+    # Only reached after the ADD, which always fails
+    'opcode="PRINTLN"><src1 type="variable">undefined</src1>')
+CONDITIONAL_ASSIGNMENT = program_xml(
+    'opcode="READINT"><dst type="variable">n</dst>',
+    'opcode="JUMPIFEQ"><dst type="label">@skip</dst><src1 type="variable">n</src1><src2 type="integer">0</src2>',
+    'opcode="MOV"><dst type="variable">x</dst><src1 type="integer">1</src1>',
+    'opcode="LABEL"><dst type="label">@skip</dst>',
+    'opcode="PRINTLN"><src1 type="variable">x</src1>')
+TYPED_LOOP = program_xml(
+    'opcode="MOV"><dst type="variable">i</dst><src1 type="integer">0</src1>',
+    'opcode="LABEL"><dst type="label">@loop</dst>',
+    'opcode="ADD"><dst type="variable">i</dst><src1 type="variable">i</src1><src2 type="integer">3</src2>',
+    'opcode="JUMPIFLT"><dst type="label">@loop</dst><src1 type="variable">i</src1><src2 type="integer">10</src2>',
+    'opcode="PRINTLN"><src1 type="variable">i</src1>')
+
+
+class StaticErrorTest(unittest.TestCase):
+    def test_incompatible_operands(self):
+        self.assertEqual(static_errors(ADD_STRING), [('3', ErrorCodes.INCOMPATIBLE_OPERANDS_ERROR)])
+
+    def test_unassigned_variable(self):
+        source = program_xml('opcode="PRINTLN"><src1 type="variable">x</src1>')
+        self.assertEqual(static_errors(source), [('1', ErrorCodes.READ_ACCESS_ERROR)])
+
+    def test_division_by_literal_zero(self):
+        source = program_xml(
+            'opcode="READINT"><dst type="variable">n</dst>',
+            'opcode="DIV"><dst type="variable">x</dst><src1 type="variable">n</src1><src2 type="integer">0</src2>')
+        self.assertEqual(static_errors(source), [('2', ErrorCodes.DIVISION_BY_ZERO)])
+
+    def test_instruction_that_may_succeed_is_not_reported(self):
+        self.assertEqual(static_errors(CONDITIONAL_ASSIGNMENT), [])
+
+    def test_check_does_not_run_the_program(self):
+        # taci.py writes the .rc file next to the program
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.xml')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(ADD_STRING)
+            run = subprocess.run([sys.executable, os.path.join(HERE, 'taci.py'), path, '--check'],
+                                 capture_output=True, text=True, stdin=subprocess.DEVNULL, cwd=HERE)
+        self.assertEqual(run.returncode, 27)
+        self.assertEqual(run.stdout, '')
+        self.assertIn('Instruction 3 (ADD)', run.stderr)
+
+
+class SpecializationTest(unittest.TestCase):
+    def test_proven_instructions_are_typed(self):
+        program = decode_program(ET.fromstring(TYPED_LOOP))
+        instructions = specialize_instructions(program.instructions, analyze_types(program))
+        self.assertEqual(instructions[2].opcode, OP_TYPED_ADD)
+        # The decoded program is left as it was
+        self.assertEqual(program.instructions[2].opcode, OP_ADD)
+
+    def test_unproven_instructions_keep_their_checks(self):
+        program = decode_program(ET.fromstring(CONDITIONAL_ASSIGNMENT))
+        analysis = analyze_types(program)
+        self.assertFalse(analysis.safe[4])
+        self.assertFalse(analysis.assigned(4, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,8 @@
+# Type tags of a variable slot, None marks a variable that was not assigned yet
+TYPE_INTEGER = 'integer'
+TYPE_STRING = 'string'
+
+
 class Variable:
     def __init__(self, var_type: str, value: int | str | None) -> None:
         self.var_type = var_type